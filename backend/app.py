@@ -1,45 +1,36 @@
 import streamlit as st
-import pandas as pd
 from pathlib import Path
-from sqlalchemy import text
 
-# Local imports
+# Local imports. Page modules (and their plotting, PDF and LLM dependencies)
+# are imported in their page's branch below, the first time the page opens.
 from config import engine
-from utils.preprocessing import preprocess_startup_data
-from models.regression_model import GrowthPredictor
-from models.growth_classifier import GrowthClassifier
-from models.clustering_model import StartupClustering
-from utils.strategy_engine import generate_strategy
-from utils.nlp_summarizer import summarize_insights
-from utils.report_generator import show_reports
-from dashboard import show_dashboard
-from utils.gemini_helper import ask_gemini
+from models.model_store import load_models
+from utils.serving import get_serving
+from utils.metrics import span, start_http_server
 
 # --- Paths ---
 BASE_DIR = Path(__file__).resolve().parent
 CSV_PATH = BASE_DIR / "models" / "startups_data.csv"
 
-# --- Load synthetic dataset ---
-df_synthetic = pd.read_csv(CSV_PATH)
-df_train = preprocess_startup_data(df_synthetic)
+# --- Load fitted models (trained once per data/hyperparameter version, shared by all sessions) ---
+models = load_models(CSV_PATH)
+regressor = models.regressor
+classifier = models.classifier
+clustering = models.clustering
+cluster_features = clustering.features
 
-# --- Train models at app startup ---
-regressor = GrowthPredictor()
-regressor.train(df_train)
+# --- Scored portfolio and submit results, shared by all sessions of this process ---
+serving = get_serving(engine, models)
+portfolio = serving.portfolio
 
-classifier = GrowthClassifier()
-classifier.train(df_train)
-
-clustering = StartupClustering(n_clusters=3)
-cluster_features = [
-    "revenue", "costs", "marketing_spend", "churn_rate",
-    "burn_rate", "cash_reserves", "cac",
-    "ltv", "profit_margin", "marketing_efficiency", "ltv_cac_ratio"
-]
-clustering.model.fit(df_train[cluster_features])
+# --- Stage timings: Prometheus text on METRICS_PORT (if set), per-stage percentiles on ?diagnostics=1 ---
+start_http_server()
 
 # --- Navigation ---
-menu = st.sidebar.radio("Go to:", ["Form Input", "Dashboard", "Reports", "Ask Gemini"])
+pages = ["Form Input", "Dashboard", "Reports", "Ask Gemini"]
+if st.query_params.get("diagnostics") == "1":
+    pages.append("Diagnostics")
+menu = st.sidebar.radio("Go to:", pages)
 
 # -------------------------
 # FORM INPUT PAGE
@@ -161,33 +152,12 @@ if menu == "Form Input":
             "ltv": ltv, "monthly_growth_rate": monthly_growth_rate, "market_share": market_share
         }
 
-        df_new = pd.DataFrame([st.session_state.form_data])
-
-        # Save to DB
-        with engine.begin() as conn:
-            df_new.to_sql("startup_info", conn, if_exists="append", index=False)
-
-        # Preprocess & predict
-        df_new_processed = preprocess_startup_data(df_new)
-        df_new_processed["predicted_growth"] = regressor.predict(df_new_processed)
-        df_new_processed["growth_category"] = classifier.predict(df_new_processed)
-        df_new_processed["cluster"] = clustering.model.predict(df_new_processed[cluster_features])
-
-        # Generate strategies & summaries
+        # Save to DB, score only the new startup and append it to the portfolio.
+        # Strategies & summaries come from the shared result cache when the same data was seen before.
+        with span("app.submit"):
+            df_new_processed, insights = serving.submit(st.session_state.form_data)
         st.session_state["current_startup"] = df_new_processed
-        st.session_state["insights"] = {
-            "strategies": generate_strategy(df_new_processed),
-            "summaries": {row["name"]: summarize_insights(row["name"], row) for _, row in df_new_processed.iterrows()}
-        }
-
-        # Update portfolio
-        with engine.connect() as conn:
-            df_db = pd.read_sql(text("SELECT * FROM startup_info"), conn)
-        df_db_processed = preprocess_startup_data(df_db)
-        df_db_processed["predicted_growth"] = regressor.predict(df_db_processed)
-        df_db_processed["growth_category"] = classifier.predict(df_db_processed)
-        df_db_processed["cluster"] = clustering.model.predict(df_db_processed[cluster_features])
-        st.session_state["all_startups"] = df_db_processed
+        st.session_state["insights"] = insights
 
         st.success("Startup data submitted successfully! ✅")
 
@@ -214,8 +184,13 @@ if menu == "Form Input":
             st.subheader(f"Startup: {startup_name}")
             st.text(summary)
 
+        similar = st.session_state["insights"].get("similar")
+        if similar is not None and not similar.empty:
+            st.header("Most Similar Portfolio Startups")
+            st.dataframe(similar.drop(columns=["id"]), hide_index=True)
+
         if st.button("🗑️ Clear Form & Insights"):
-            for key in ["form_data", "current_startup", "all_startups", "insights"]:
+            for key in ["form_data", "current_startup", "insights"]:
                 if key in st.session_state:
                     del st.session_state[key]
             st.rerun()
@@ -225,17 +200,24 @@ if menu == "Form Input":
 # DASHBOARD PAGE
 # -------------------------
 elif menu == "Dashboard":
-    if "all_startups" not in st.session_state:
+    if "current_startup" not in st.session_state:
         st.warning("⚠️ Please submit your startup first using the Form Input page.")
     else:
-        show_dashboard(st.session_state["all_startups"])
+        from dashboard import show_dashboard
+        with span("app.dashboard"):
+            # Once per rerun; the dashboard's reads only see stored scores.
+            with span("portfolio.score_missing"):
+                portfolio.score_missing()
+            show_dashboard(portfolio)
 
 
 # -------------------------
 # REPORTS PAGE
 # -------------------------
 elif menu == "Reports":
-    show_reports(regressor, classifier, clustering, cluster_features)
+    from utils.report_generator import show_reports
+    with span("app.reports"):
+        show_reports(regressor, classifier, clustering, cluster_features)
 
 
 
@@ -243,6 +225,7 @@ elif menu == "Reports":
 # ASK GEMINI
 # -------------------------
 elif menu == "Ask Gemini":
+    from utils.gemini_helper import stream_gemini
     st.title("🤖 Ask Gemini (AI Startup Advisor)")
     if "current_startup" not in st.session_state:
         st.warning("Please submit your startup first in the Form Input page.")
@@ -250,6 +233,9 @@ elif menu == "Ask Gemini":
         startup_df = st.session_state["current_startup"].iloc[0]
         startup_data = startup_df.to_dict()
         startup_data["recommendations"] = startup_df.get("recommendations", [])
+        similar = st.session_state.get("insights", {}).get("similar")
+        if similar is not None:
+            startup_data["similar"] = similar.to_dict(orient="records")
 
         if "gemini_chat" not in st.session_state:
             st.session_state["gemini_chat"] = []
@@ -262,9 +248,22 @@ elif menu == "Ask Gemini":
         if st.button("Ask Gemini"):
             if question.strip():
                 with st.chat_message("user"): st.write(question)
-                with st.spinner("Gemini is thinking..."):
-                    answer = ask_gemini(startup_data, question, st.session_state["gemini_chat"])
-                with st.chat_message("assistant"): st.write(answer)
+                with st.chat_message("assistant"), span("app.gemini"):
+                    answer_stream = stream_gemini(startup_data, question, st.session_state["gemini_chat"])
+                    answer = st.write_stream(answer_stream)
+                metrics = answer_stream.prompt_metrics
+                st.caption(
+                    f"Prompt: ~{metrics.total_tokens} tokens, {metrics.verbatim_turns} recent turns verbatim, "
+                    f"{metrics.summarized_turns} summarized"
+                )
                 st.session_state["gemini_chat"].append({"question": question, "answer": answer})
             else:
                 st.warning("Please type a question first.")
+
+
+# -------------------------
+# DIAGNOSTICS (hidden: open the app with ?diagnostics=1)
+# -------------------------
+elif menu == "Diagnostics":
+    from diagnostics import show_diagnostics
+    show_diagnostics()
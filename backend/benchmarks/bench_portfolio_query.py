@@ -0,0 +1,108 @@
+"""
+Benchmark dashboard portfolio reads: SELECT * + pandas filtering vs SQL pushdown.
+
+    python -m benchmarks.bench_portfolio_query [--rows 1000000] [--database-url sqlite:///bench.db]
+
+Without ``--database-url`` a temporary SQLite file is created and filled with
+synthetic startups and stored scores. Point it at a scratch Postgres database
+(created from db/init.sql) to measure the indexed schema there.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import pandas as pd
+from sqlalchemy import create_engine
+
+from benchmarks.synthetic import make_scored_portfolio
+from dashboard import DASHBOARD_COLUMNS
+from utils.db_utils import bulk_insert, create_schema, fetch_startup_data, startup_info, startup_scores
+from utils.portfolio import ScoredPortfolio
+from utils.preprocessing import preprocess_startup_data
+
+VERSION = "bench"
+
+SCENARIOS = {
+    "no filters": {},
+    "industry": {"industries": ["SaaS"]},
+    "industry+cluster": {"industries": ["SaaS", "Retail"], "clusters": [1]},
+    "growth category": {"growth_categories": ["High"]},
+}
+
+
+class _StoredScores:
+    """Model handle for a portfolio whose rows are all scored already."""
+
+    version = VERSION
+
+    def score(self, df):
+        raise RuntimeError("benchmark rows should all have stored scores")
+
+
+def _populate(engine, rows):
+    df = make_scored_portfolio(rows)
+    bulk_insert(df.drop(columns=["id", "growth_category"]), startup_info, engine, batch_size=50_000)
+    scores = df[["id", "predicted_growth", "growth_category", "cluster"]].rename(columns={"id": "startup_id"})
+    scores["model_version"] = VERSION
+    bulk_insert(scores, startup_scores, engine, batch_size=50_000)
+
+
+def legacy_load(engine, industries=None, clusters=None, growth_categories=None, **_):
+    """Read every row and column, preprocess, attach scores and filter in pandas (the old dashboard path)."""
+    df = preprocess_startup_data(fetch_startup_data(engine))
+    scores = pd.read_sql(
+        "SELECT startup_id, predicted_growth, growth_category, cluster FROM startup_scores "
+        f"WHERE model_version = '{VERSION}'", engine,
+    )
+    df = df.drop(columns=["growth_category"]).merge(scores, left_on="id", right_on="startup_id")
+    if industries:
+        df = df[df["industry"].isin(industries)]
+    if clusters:
+        df = df[df["cluster"].isin(clusters)]
+    if growth_categories:
+        df = df[df["growth_category"].isin(growth_categories)]
+    return df
+
+
+def _timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--database-url", help="Use an existing, already populated database.")
+    args = parser.parse_args(argv)
+
+    tmpdir = None
+    if args.database_url:
+        engine = create_engine(args.database_url)
+    else:
+        tmpdir = tempfile.TemporaryDirectory()
+        engine = create_engine(f"sqlite:///{os.path.join(tmpdir.name, 'bench.db')}")
+        create_schema(engine)
+        _, t_load = _timed(_populate, engine, args.rows)
+        print(f"Loaded {args.rows:,} synthetic startups in {t_load:.1f}s")
+
+    portfolio = ScoredPortfolio(engine, _StoredScores())
+    options, t_options = _timed(portfolio.filter_options)
+    print(f"filter options: {t_options * 1000:.0f} ms ({len(options['industry'])} industries)")
+
+    print(f"{'scenario':>18} {'rows':>9} {'legacy':>9} {'pushdown':>9} {'speedup':>8}")
+    try:
+        for label, filters in SCENARIOS.items():
+            old, t_old = _timed(legacy_load, engine, **filters)
+            new, t_new = _timed(portfolio.query, columns=DASHBOARD_COLUMNS, **filters)
+            assert len(old) == len(new), f"{label}: row count mismatch ({len(old)} vs {len(new)})"
+            print(f"{label:>18} {len(new):>9,} {t_old:8.2f}s {t_new:8.2f}s {t_old / t_new:7.1f}x")
+    finally:
+        engine.dispose()
+        if tmpdir is not None:
+            tmpdir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
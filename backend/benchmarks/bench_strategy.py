@@ -0,0 +1,93 @@
+"""
+Benchmark the vectorized strategy engine against the original iterrows loop.
+
+    python -m benchmarks.bench_strategy [--sizes 1000 100000 1000000]
+"""
+import argparse
+import time
+
+from benchmarks.synthetic import make_scored_portfolio
+from utils.strategy_engine import generate_strategy, strategy_rule_ids
+
+
+def legacy_generate_strategy(df):
+    """The row-by-row implementation generate_strategy replaced, kept as the reference."""
+    strategies = []
+    for _, row in df.iterrows():
+        recs = []
+        if row['predicted_growth'] < 0:
+            recs.append("Focus on cost reduction, improve cash flow, and retain existing customers.")
+        elif row['predicted_growth'] < 0.1 * row['revenue']:
+            recs.append("Optimize marketing campaigns, refine sales funnels, and analyze customer behavior.")
+        elif row['predicted_growth'] < 0.3 * row['revenue']:
+            recs.append("Consider strategic partnerships or explore adjacent markets for moderate growth.")
+        else:
+            recs.append("High growth potential: expand product lines, scale team, and invest in R&D.")
+        if row['archetype'] == 0:
+            recs.append("Early-stage archetype: validate product-market fit and prioritize MVP improvements.")
+        elif row['archetype'] == 1:
+            recs.append("Growth-stage archetype: invest in customer acquisition and optimize internal processes.")
+        elif row['archetype'] == 2:
+            recs.append("Mature archetype: focus on strategic expansion, operational efficiency, and diversification.")
+        if row['churn_rate'] > 20:
+            recs.append("High churn detected: implement customer retention programs, loyalty incentives, or feedback loops.")
+        elif row['churn_rate'] > 10:
+            recs.append("Moderate churn: monitor customer satisfaction and address pain points.")
+        if row['marketing_efficiency'] < 0.8:
+            recs.append("Marketing efficiency is low: reallocate budget or test new channels.")
+        elif row['marketing_efficiency'] < 1.2:
+            recs.append("Moderate marketing efficiency: optimize campaigns for higher ROI.")
+        if row['profit_margin'] < 0.1:
+            recs.append("Profit margin is low: review pricing strategy and reduce unnecessary expenses.")
+        elif row['profit_margin'] > 0.25:
+            recs.append("Healthy profit margin: consider reinvesting for growth or product development.")
+        if row['ltv_cac_ratio'] < 1:
+            recs.append("Customer acquisition is expensive relative to value: improve retention or optimize acquisition costs.")
+        elif row['ltv_cac_ratio'] > 3:
+            recs.append("Strong LTV/CAC ratio: scaling customer acquisition could be profitable.")
+        if row['runway_months'] < 3:
+            recs.append("Low runway: secure funding or cut non-essential costs to extend runway.")
+        elif row['runway_months'] > 12:
+            recs.append("Healthy cash reserves: opportunity to invest in growth initiatives.")
+        if row['industry'] == "SaaS":
+            recs.append("SaaS-specific: prioritize onboarding, reduce churn, and monitor subscription metrics.")
+        elif row['industry'] == "Retail":
+            recs.append("Retail-specific: analyze inventory turnover, optimize pricing, and enhance customer experience.")
+        elif row['industry'] == "Services":
+            recs.append("Services-specific: improve service delivery, client satisfaction, and repeat business strategies.")
+        strategies.append(recs)
+    df['recommendations'] = strategies
+    return df
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--legacy-max-rows", type=int, default=100_000,
+                        help="Skip the iterrows reference above this size (it takes minutes at 1M).")
+    args = parser.parse_args(argv)
+
+    print(f"{'rows':>10} {'rule ids':>10} {'vectorized':>11} {'iterrows':>10} {'speedup':>8}")
+    for n in args.sizes:
+        df = make_scored_portfolio(n)
+        _, t_ids = _timed(strategy_rule_ids, df)
+        fast, t_fast = _timed(generate_strategy, df.copy())
+
+        if n <= args.legacy_max_rows:
+            slow, t_slow = _timed(legacy_generate_strategy, df.copy())
+            assert fast["recommendations"].tolist() == slow["recommendations"].tolist(), "output mismatch"
+            legacy, speedup = f"{t_slow:9.3f}s", f"{t_slow / t_fast:7.0f}x"
+        else:
+            legacy, speedup = f"{'skipped':>10}", f"{'-':>8}"
+
+        print(f"{n:>10} {t_ids:9.3f}s {t_fast:10.3f}s {legacy} {speedup}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+Load test for the Form Input submit path with N concurrent sessions.
+
+    python -m benchmarks.load_test --sessions 32 --submits 20
+    python -m benchmarks.load_test --sessions 32 --isolated       # every session loads its own models
+    python -m benchmarks.load_test --sessions 32 --processes 4    # sessions spread over 4 server processes
+
+Each session is a thread that submits synthetic startups through
+``utils.serving.SharedServing`` and keeps what it got back, as a Streamlit
+session keeps ``st.session_state``. ``--repeat-fraction`` of the submits
+resend an earlier form, which the shared result cache answers.
+
+Reports p50/p99 submit latency and memory per session: the RSS growth of
+the process divided by its sessions. With ``--processes`` each process also
+reports PSS, which splits pages shared through the memory-mapped model
+artifacts between the processes mapping them.
+
+Without ``--database-url`` a temporary SQLite file holds ``--db-rows``
+startups.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+from sqlalchemy import create_engine
+
+from benchmarks.synthetic import make_startups
+from models.model_store import BUNDLE_FILE, configure_bundle, load_models
+from models.similarity import PersistentSimilarityIndex
+from utils.db_utils import bulk_insert, create_schema, startup_info
+from utils.portfolio import FORM_COLUMNS, ScoredPortfolio
+from utils.serving import ResultCache, SharedServing
+
+
+def _memory_mb():
+    """Current (RSS, PSS) of this process in MiB; PSS is None where /proc doesn't report it."""
+    rss = pss = None
+    try:
+        for line in Path("/proc/self/smaps_rollup").read_text().splitlines():
+            if line.startswith("Rss:"):
+                rss = int(line.split()[1]) / 1024
+            elif line.startswith("Pss:"):
+                pss = int(line.split()[1]) / 1024
+    except OSError:
+        import resource
+        # Peak rather than current RSS; ru_maxrss is KiB on Linux (bytes on macOS).
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        rss = peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+    return rss, pss
+
+
+def _forms(n, repeat_fraction, seed):
+    forms = make_startups(n, seed=seed)[FORM_COLUMNS].to_dict(orient="records")
+    rng = np.random.default_rng(seed)
+    for i in range(1, n):
+        if rng.random() < repeat_fraction:
+            forms[i] = forms[rng.integers(i)]
+    return forms
+
+
+def _isolated_serving(engine, bundle, tmpdir):
+    """What every session used to hold: its own model copies, portfolio and caches."""
+    own = joblib.load(Path(bundle.path) / BUNDLE_FILE)  # private copy, not memory-mapped
+    configure_bundle(own)
+    portfolio = ScoredPortfolio(engine, own, similarity=PersistentSimilarityIndex(engine, tmpdir))
+    return SharedServing(engine, own, cache=ResultCache(), portfolio=portfolio)
+
+
+def run_sessions(database_url, sessions, submits, repeat_fraction, isolated, seed, tmpdir):
+    """Run ``sessions`` concurrent sessions in this process; returns latencies and memory."""
+    engine = create_engine(database_url)
+    bundle = load_models()
+    shared = None
+    if not isolated:
+        portfolio = ScoredPortfolio(engine, bundle, similarity=PersistentSimilarityIndex(engine, tmpdir))
+        shared = SharedServing(engine, bundle, cache=ResultCache(), portfolio=portfolio)
+        # Warm-up outside the measurement: portfolio scores and the similarity index.
+        portfolio.score_missing()
+        portfolio.similarity.refresh()
+    rss_before, pss_before = _memory_mb()
+
+    forms = _forms(sessions * submits, repeat_fraction, seed)
+    latencies = [[] for _ in range(sessions)]
+    states = [[] for _ in range(sessions)]
+    errors = []
+    start = threading.Barrier(sessions)
+
+    def session(i):
+        try:
+            serving = shared or _isolated_serving(engine, bundle, tmpdir)
+            start.wait()
+            for form in forms[i::sessions]:
+                t = time.perf_counter()
+                states[i].append(serving.submit(form))
+                latencies[i].append(time.perf_counter() - t)
+        except Exception as exc:  # reported, not raised, so the other sessions finish
+            start.abort()
+            errors.append(repr(exc))
+
+    wall = time.perf_counter()
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - wall
+
+    rss_after, pss_after = _memory_mb()
+    engine.dispose()
+    return {
+        "latencies": [t for session_latencies in latencies for t in session_latencies],
+        "sessions": sessions,
+        "seconds": wall,
+        "rss_mb": rss_after,
+        "pss_mb": pss_after,
+        "rss_growth_mb": rss_after - rss_before,
+        "cache": shared.cache.stats() if shared else None,
+        "errors": errors,
+    }
+
+
+def _worker(args):
+    return run_sessions(*args)
+
+
+def _populate(database_url, rows, seed):
+    engine = create_engine(database_url)
+    create_schema(engine)
+    bulk_insert(make_startups(rows, seed=seed).drop(columns=["id"]), startup_info, engine, 50_000)
+    engine.dispose()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=16, help="Concurrent sessions in total.")
+    parser.add_argument("--submits", type=int, default=20, help="Submits per session.")
+    parser.add_argument("--processes", type=int, default=1, help="Server processes to spread sessions over.")
+    parser.add_argument("--repeat-fraction", type=float, default=0.2,
+                        help="Share of submits that resend an earlier form.")
+    parser.add_argument("--isolated", action="store_true",
+                        help="Give every session its own models and caches (the pre-shared baseline).")
+    parser.add_argument("--db-rows", type=int, default=10_000)
+    parser.add_argument("--database-url", help="Use an existing, already populated database.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", help="Write the results as JSON.")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        database_url = args.database_url or f"sqlite:///{os.path.join(tmpdir, 'load.db')}"
+        if not args.database_url:
+            _populate(database_url, args.db_rows, args.seed)
+        # Build (or load) the artifact and score the portfolio once, before any session starts.
+        engine = create_engine(database_url)
+        ScoredPortfolio(engine, load_models()).score_missing()
+        engine.dispose()
+
+        per_process = [args.sessions // args.processes + (i < args.sessions % args.processes)
+                       for i in range(args.processes)]
+        jobs = [(database_url, n, args.submits, args.repeat_fraction, args.isolated, args.seed + i, tmpdir)
+                for i, n in enumerate(per_process) if n]
+        if len(jobs) == 1:
+            results = [run_sessions(*jobs[0])]
+        else:
+            with multiprocessing.get_context("spawn").Pool(len(jobs)) as pool:
+                results = pool.map(_worker, jobs)
+
+    latencies = np.array([t for r in results for t in r["latencies"]]) * 1000
+    summary = {
+        "sessions": args.sessions,
+        "processes": len(results),
+        "submits": len(latencies),
+        "isolated": args.isolated,
+        "p50_ms": float(np.percentile(latencies, 50)) if len(latencies) else None,
+        "p99_ms": float(np.percentile(latencies, 99)) if len(latencies) else None,
+        "submits_per_s": len(latencies) / max(r["seconds"] for r in results),
+        "mb_per_session": sum(r["rss_growth_mb"] for r in results) / args.sessions,
+        "processes_detail": [{k: v for k, v in r.items() if k != "latencies"} for r in results],
+    }
+    print(f"{summary['sessions']} sessions over {summary['processes']} process(es), "
+          f"{'isolated' if args.isolated else 'shared'} state: {summary['submits']} submits")
+    if summary["p50_ms"] is not None:
+        print(f"  submit latency p50 {summary['p50_ms']:.1f} ms, p99 {summary['p99_ms']:.1f} ms, "
+              f"{summary['submits_per_s']:.0f} submits/s")
+    print(f"  memory per session {summary['mb_per_session']:.2f} MB (RSS growth / sessions)")
+    for i, r in enumerate(results):
+        pss = f", PSS {r['pss_mb']:.0f} MB" if r["pss_mb"] is not None else ""
+        cache = f", cache {r['cache']['hits']} hits / {r['cache']['misses']} misses" if r["cache"] else ""
+        print(f"  process {i}: RSS {r['rss_mb']:.0f} MB{pss}{cache}")
+        for error in r["errors"]:
+            print(f"    error: {error}")
+    if args.output:
+        Path(args.output).write_text(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+"""
+Stage-by-stage benchmarks for the advisor, written as JSON to compare commits.
+
+    python -m benchmarks.run_benchmarks --sizes 2000 100000 1000000 -o bench.json
+    python -m benchmarks.run_benchmarks --compare before.json bench.json
+
+Every stage runs on synthetic portfolios (benchmarks.synthetic). Gemini is
+replaced by LocalStubBackend and Postgres by a temporary SQLite file. Models
+are fitted on at most ``--train-max-rows`` rows, and summaries, charts and
+reports use only the first rows of each portfolio. The JSON records the row
+count each stage actually ran on. The PDF stage is skipped, with the reason
+recorded, when wkhtmltopdf isn't installed.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine
+
+from benchmarks.synthetic import make_startups
+from models.inference import InferenceEngine
+from models.model_store import ModelBundle
+from models.clustering_model import StartupClustering
+from models.growth_classifier import GrowthClassifier
+from models.regression_model import GrowthPredictor
+from models.similarity import PersistentSimilarityIndex
+from utils.dashboard_data import aggregate
+from utils.db_utils import bulk_insert, create_schema, startup_info
+from utils.gemini_helper import AdvisorClient, LocalStubBackend, ResponseCache, build_context, run_sync
+from utils.nlp_summarizer import iter_summaries
+from utils.portfolio import ScoredPortfolio
+from utils.preprocessing import preprocess_startup_data
+from utils.report_generator import ChartCache, ChartRenderer, generate_pdf_report, iter_report_html
+from utils.serving import ResultCache, SharedServing
+from utils.strategy_engine import generate_strategy
+
+SCHEMA_VERSION = 1
+
+
+def _percentiles(samples):
+    ms = np.asarray(samples) * 1000
+    return {"p50_ms": float(np.percentile(ms, 50)), "p99_ms": float(np.percentile(ms, 99)),
+            "mean_ms": float(ms.mean())}
+
+
+def _timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _meta(args):
+    import sklearn
+    import xgboost
+    return {
+        "schema_version": SCHEMA_VERSION,
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "versions": {"numpy": np.__version__, "pandas": pd.__version__,
+                     "scikit-learn": sklearn.__version__, "xgboost": xgboost.__version__},
+        "args": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+    }
+
+
+class Recorder:
+    """Collects one result dict per stage and prints a line for each."""
+
+    def __init__(self, quiet=False):
+        self.results = []
+        self.quiet = quiet
+
+    def add(self, stage, rows, seconds=None, size=None, **extra):
+        result = {"stage": stage, "size": size, "rows": rows, "seconds": seconds}
+        if seconds:
+            result["rows_per_s"] = rows / seconds
+        result.update(extra)
+        self.results.append(result)
+        if not self.quiet:
+            timing = f"{seconds:9.3f}s" if seconds is not None else f"{'-':>10}"
+            detail = " ".join(f"{k}={v:.2f}" if isinstance(v, float) else f"{k}={v}"
+                              for k, v in extra.items())
+            print(f"{str(size or '-'):>9} {stage:<28} {rows:>9,} {timing} {detail}", file=sys.stderr)
+
+
+# ---------------- Stages ----------------
+def bench_models(rec, df, size, train_max_rows):
+    """Fit every model (on up to ``train_max_rows`` rows) and return the fitted bundle."""
+    train = df.iloc[:train_max_rows]
+    regressor, classifier, clustering = GrowthPredictor(), GrowthClassifier(), StartupClustering(n_clusters=3)
+
+    # The model classes print their validation reports; keep stdout for the JSON.
+    with contextlib.redirect_stdout(sys.stderr if not rec.quiet else io.StringIO()):
+        regressor.train(train)
+        _, classifier_s = _timed(classifier.train, train)
+    fit_rows = int(len(train) * 0.8)
+    for name, metrics in regressor.metrics.items():
+        rec.add(f"fit_{name}", fit_rows, metrics["fit_s"], size, rmse=metrics["rmse"],
+                row_latency_ms=metrics["row_latency_ms"])
+    rec.add("fit_classifier", fit_rows, classifier_s, size)
+
+    _, seconds = _timed(clustering.train, train)
+    rec.add("fit_kmeans", len(train), seconds, size)
+    rec.add("serving", 0, None, size, serving=regressor.serving, weights=regressor.serving_weights)
+    return ModelBundle(regressor, classifier, clustering, version="bench")
+
+
+def bench_predict(rec, df, size, bundle, repeats, raw_record):
+    one = df.iloc[:1]
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        bundle.score(one.copy())
+        samples.append(time.perf_counter() - start)
+    rec.add("predict_single_row", 1, float(np.median(samples)), size, repeats=repeats, **_percentiles(samples))
+
+    engine, seconds = _timed(InferenceEngine, bundle)
+    rec.add("compile_inference", 1, seconds, size)
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        engine.predict(raw_record)
+        samples.append(time.perf_counter() - start)
+    rec.add("predict_single_row_compiled", 1, float(np.median(samples)), size, repeats=repeats,
+            **_percentiles(samples))
+
+    scored, seconds = _timed(bundle.score, df.copy())
+    rec.add("predict_batch", len(df), seconds, size)
+    return scored
+
+
+def bench_reports(rec, scored, size, report_rows, workers):
+    sample = scored.iloc[:report_rows]
+    startups = sample.to_dict(orient="records")
+
+    # Fresh in-memory caches so every run renders cold.
+    def render_all():
+        with ChartRenderer(workers=1, cache=ChartCache(directory=None)) as renderer:
+            return [renderer.submit(s)() for s in startups]
+    _, seconds = _timed(render_all)
+    rec.add("charts", len(sample), seconds, size)
+
+    _, seconds = _timed(lambda: sum(len(chunk) for chunk in iter_report_html(
+        sample, workers=workers, cache=ChartCache(directory=None))))
+    rec.add("report_html", len(sample), seconds, size, workers=workers)
+
+    if shutil.which("wkhtmltopdf") is None:
+        rec.add("report_pdf", len(sample), None, size, skipped="wkhtmltopdf not installed")
+    else:
+        pdf, seconds = _timed(generate_pdf_report, sample, workers=workers,
+                              cache=ChartCache(directory=None))
+        rec.add("report_pdf", len(sample), seconds, size, workers=workers, pdf_bytes=len(pdf))
+
+
+def bench_size(rec, n, args, tmpdir):
+    raw = make_startups(n, seed=args.seed)
+    csv_path = os.path.join(tmpdir, f"startups_{n}.csv")
+    raw.to_csv(csv_path, index=False)
+
+    raw, seconds = _timed(pd.read_csv, csv_path)
+    rec.add("csv_load", len(raw), seconds, n)
+    os.unlink(csv_path)
+
+    df, seconds = _timed(preprocess_startup_data, raw)
+    rec.add("preprocess", len(df), seconds, n)
+
+    bundle = bench_models(rec, df, n, args.train_max_rows)
+    scored = bench_predict(rec, df, n, bundle, args.repeats, raw.iloc[0].to_dict())
+
+    aggregates, seconds = _timed(aggregate, scored)
+    rec.add("dashboard_aggregate", len(scored), seconds, n,
+            points=sum(len(points) for points in aggregates["scatters"].values()))
+
+    scored, seconds = _timed(generate_strategy, scored)
+    rec.add("generate_strategy", len(scored), seconds, n)
+
+    sample = scored.iloc[:args.summary_rows]
+    _, seconds = _timed(lambda: list(iter_summaries(sample)))
+    rec.add("summarize_insights", len(sample), seconds, n)
+
+    bench_reports(rec, scored, n, args.report_rows, args.workers)
+    return bundle
+
+
+def bench_advisor(rec, startup, repeats):
+    """Ask round trips through the real client against the local stub (no cache hits)."""
+    client = AdvisorClient(LocalStubBackend(), cache=ResponseCache(directory=None),
+                           requests_per_minute=1e9, burst=1e9)
+    context = build_context(startup)
+    samples = []
+    for i in range(repeats):
+        start = time.perf_counter()
+        run_sync(client.ask(f"{context}\nUser: question {i}\nAI:"))
+        samples.append(time.perf_counter() - start)
+    rec.add("advisor_ask_stub", 1, float(np.median(samples)), repeats=repeats, **_percentiles(samples))
+
+
+def bench_submit(rec, bundle, db_rows, repeats, seed, tmpdir):
+    """The app's submit path against a SQLite stand-in holding ``db_rows`` startups."""
+    engine = create_engine(f"sqlite:///{os.path.join(tmpdir, 'bench.db')}")
+    create_schema(engine)
+    raw = make_startups(db_rows, seed=seed).drop(columns=["id"])
+    _, seconds = _timed(bulk_insert, raw, startup_info, engine, 50_000)
+    rec.add("db_bulk_insert", db_rows, seconds)
+
+    portfolio = ScoredPortfolio(engine, bundle, similarity=PersistentSimilarityIndex(engine, tmpdir))
+    _, seconds = _timed(portfolio.score_missing)
+    rec.add("db_score_missing", db_rows, seconds)
+    _, seconds = _timed(portfolio.similarity.refresh)
+    rec.add("similarity_index_build", db_rows, seconds)
+
+    serving = SharedServing(engine, bundle, cache=ResultCache(), portfolio=portfolio)
+    forms = raw.iloc[:repeats].to_dict(orient="records")
+    samples = []
+    for form in forms:
+        start = time.perf_counter()
+        serving.submit(form)
+        samples.append(time.perf_counter() - start)
+    rec.add("submit_end_to_end", 1, float(np.median(samples)), repeats=len(samples), **_percentiles(samples))
+
+    _, seconds = _timed(portfolio.query, industries=["SaaS"])
+    rec.add("portfolio_query", db_rows, seconds)
+    engine.dispose()
+
+
+# ---------------- Compare ----------------
+def compare(before_path, after_path, threshold):
+    """Print per-stage ratios; returns the number of stages slower than ``threshold``x."""
+    before, after = (json.loads(Path(p).read_text()) for p in (before_path, after_path))
+    old = {(r["stage"], r["size"]): r for r in before["results"]}
+    print(f"before: {before['meta'].get('commit')}  after: {after['meta'].get('commit')}")
+    print(f"{'size':>9} {'stage':<28} {'before':>10} {'after':>10} {'ratio':>7}")
+    regressions = 0
+    for r in after["results"]:
+        prev = old.get((r["stage"], r["size"]))
+        if not prev or not prev.get("seconds") or not r.get("seconds") or prev["rows"] != r["rows"]:
+            continue
+        ratio = r["seconds"] / prev["seconds"]
+        flag = ""
+        if ratio > threshold:
+            flag, regressions = "  SLOWER", regressions + 1
+        print(f"{str(r['size'] or '-'):>9} {r['stage']:<28} {prev['seconds']:9.4f}s {r['seconds']:9.4f}s "
+              f"{ratio:6.2f}x{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2_000, 100_000, 1_000_000])
+    parser.add_argument("--train-max-rows", type=int, default=100_000)
+    parser.add_argument("--summary-rows", type=int, default=10_000)
+    parser.add_argument("--report-rows", type=int, default=10)
+    parser.add_argument("--db-rows", type=int, default=100_000)
+    parser.add_argument("--repeats", type=int, default=50, help="Samples for latency stages.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Chart render processes.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("-o", "--output", help="Write JSON here (default: stdout).")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"),
+                        help="Compare two result files instead of running.")
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="With --compare, exit 1 if any stage is this many times slower.")
+    parser.add_argument("--quiet", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, args.threshold) else 0)
+
+    rec = Recorder(quiet=args.quiet)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        bundle = None
+        for n in args.sizes:
+            bundle = bench_size(rec, n, args, tmpdir)
+        startup = generate_strategy(bundle.score(preprocess_startup_data(make_startups(1, args.seed))))
+        bench_advisor(rec, startup.iloc[0].to_dict(), args.repeats)
+        bench_submit(rec, bundle, args.db_rows, args.repeats, args.seed, tmpdir)
+
+    report = json.dumps({"meta": _meta(args), "results": rec.results}, indent=2)
+    if args.output:
+        Path(args.output).write_text(report)
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Import-time profile and startup-time budget for a Streamlit worker.
+
+    python -m benchmarks.startup_time                        # profile + budget check
+    python -m benchmarks.startup_time --budget-ms 5000 --repeats 5
+    python -m benchmarks.startup_time --modules utils.report_generator dashboard
+
+Startup is what a fresh server process pays before it can show the Form
+Input page: a new interpreter runs ``app.py`` in Streamlit's bare mode
+(no browser session) and the wall time is measured from outside. The
+check fails, and the command exits 1, when the median is above
+``--budget-ms`` or when the form page imported one of ``DEFERRED_MODULES``
+(plotting, PDF and LLM dependencies that only their own pages need).
+
+The profile comes from ``python -X importtime``: the slowest modules by
+cumulative import time (their own time plus everything they imported
+first) and the total per top-level package.
+
+Without ``--database-url`` a temporary SQLite file holds ``--db-rows``
+startups. Models come from the usual artifact directory (built on the
+first, unmeasured run if missing).
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+APP = BACKEND_DIR / "app.py"
+
+STARTUP_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", 4500))
+# Imported on first use by the page that needs them, never by the form page.
+DEFERRED_MODULES = ("matplotlib", "plotly.express", "jinja2", "pdfkit", "google.generativeai")
+
+# Runs the app script once in a fresh interpreter and reports which deferred modules it loaded.
+_RUN_APP = """
+import json, runpy, sys
+sys.path.insert(0, {backend!r})
+runpy.run_path({app!r}, run_name="__main__")
+deferred = {deferred!r}
+print(json.dumps(sorted(m for m in deferred if m in sys.modules)))
+"""
+
+_IMPORTTIME = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def _env(database_url):
+    env = dict(os.environ, DATABASE_URL=database_url, PYTHONWARNINGS="ignore")
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(BACKEND_DIR), env.get("PYTHONPATH")]))
+    return env
+
+
+def run_app(database_url):
+    """Run the form page once in a new interpreter; returns ``(seconds, deferred modules it imported)``."""
+    code = _RUN_APP.format(backend=str(BACKEND_DIR), app=str(APP), deferred=DEFERRED_MODULES)
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, env=_env(database_url),
+                          capture_output=True, text=True)
+    seconds = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(f"app.py failed to start:\n{proc.stderr[-2000:]}")
+    return seconds, json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def import_profile(modules, database_url):
+    """
+    ``-X importtime`` records for importing ``modules`` in a new interpreter:
+    one dict per module with ``self_ms``, ``cumulative_ms`` and nesting ``depth``.
+    """
+    code = "; ".join(f"import {m}" for m in modules)
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=BACKEND_DIR,
+                          env=_env(database_url), capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"importing {', '.join(modules)} failed:\n{proc.stderr[-2000:]}")
+    records = []
+    for line in proc.stderr.splitlines():
+        match = _IMPORTTIME.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            records.append({"module": name, "self_ms": int(self_us) / 1000,
+                            "cumulative_ms": int(cumulative_us) / 1000, "depth": len(indent) // 2})
+    return records
+
+
+def slowest(records, top):
+    """The ``top`` modules by cumulative import time (a module's first record if it appears twice)."""
+    first = {}
+    for r in records:
+        first.setdefault(r["module"], r)
+    return sorted(first.values(), key=lambda r: -r["cumulative_ms"])[:top]
+
+
+def package_totals(records):
+    """Import time per top-level package (sum of its modules' own time), largest first."""
+    totals = defaultdict(float)
+    for r in records:
+        totals[r["module"].split(".")[0]] += r["self_ms"]
+    return dict(sorted(totals.items(), key=lambda item: -item[1]))
+
+
+def _app_modules():
+    """Modules ``app.py`` imports at the top level (those the form page always pays for)."""
+    pattern = re.compile(r"^(?:from (\S+) import|import (\S+))", re.M)
+    return [a or b for a, b in pattern.findall(APP.read_text())]
+
+
+def _populate(database_url, rows, seed):
+    from sqlalchemy import create_engine
+
+    from benchmarks.synthetic import make_startups
+    from utils.db_utils import bulk_insert, create_schema, startup_info
+
+    engine = create_engine(database_url)
+    create_schema(engine)
+    bulk_insert(make_startups(rows, seed=seed).drop(columns=["id"]), startup_info, engine, 50_000)
+    engine.dispose()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS,
+                        help="Median form-page startup allowed (default STARTUP_BUDGET_MS or 4500).")
+    parser.add_argument("--repeats", type=int, default=3, help="Measured app starts.")
+    parser.add_argument("--modules", nargs="+",
+                        help="Profile importing these instead of app.py's top-level imports.")
+    parser.add_argument("--top", type=int, default=15, help="Slowest modules/packages to list.")
+    parser.add_argument("--db-rows", type=int, default=2_000)
+    parser.add_argument("--database-url", help="Use an existing, already populated database.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", help="Write the results as JSON.")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        database_url = args.database_url or f"sqlite:///{os.path.join(tmpdir, 'startup.db')}"
+        if not args.database_url:
+            _populate(database_url, args.db_rows, args.seed)
+
+        modules = args.modules or _app_modules()
+        records = import_profile(modules, database_url)
+        run_app(database_url)  # warm-up: builds missing artifacts, fills the page cache
+        runs = [run_app(database_url) for _ in range(args.repeats)]
+
+    seconds = sorted(s for s, _ in runs)
+    median_ms = seconds[len(seconds) // 2] * 1000
+    eager = sorted({m for _, loaded in runs for m in loaded})
+    packages = package_totals(records)
+    total_ms = sum(r["self_ms"] for r in records)
+
+    print(f"Import profile of {', '.join(modules)}: {total_ms:.0f} ms in {len(records)} modules")
+    print(f"  {'module':<44} {'cumulative':>11} {'self':>9}")
+    for r in slowest(records, args.top):
+        print(f"  {r['module']:<44} {r['cumulative_ms']:9.1f}ms {r['self_ms']:7.1f}ms")
+    print(f"  {'package':<44} {'total':>11}")
+    for name, ms in list(packages.items())[:args.top]:
+        print(f"  {name:<44} {ms:9.1f}ms")
+
+    over = median_ms > args.budget_ms
+    print(f"Form page startup: median {median_ms:.0f} ms over {len(seconds)} runs "
+          f"(budget {args.budget_ms:.0f} ms){'  OVER BUDGET' if over else ''}")
+    if eager:
+        print(f"  imported at startup but deferred to their pages: {', '.join(eager)}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps({
+            "modules": modules,
+            "import_ms": total_ms,
+            "packages_ms": packages,
+            "slowest": slowest(records, args.top),
+            "startup_ms": [s * 1000 for s in seconds],
+            "startup_median_ms": median_ms,
+            "budget_ms": args.budget_ms,
+            "eager_deferred_modules": eager,
+        }, indent=2))
+    sys.exit(1 if over or eager else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Synthetic startup portfolios for benchmarks, shaped like models/startups_data.csv."""
+import numpy as np
+import pandas as pd
+
+INDUSTRIES = np.array(["SaaS", "Retail", "Services", "FinTech", "Other"], dtype=object)
+STAGES = np.array(["Idea", "Early", "Growth", "Scale"], dtype=object)
+GROWTH_CATEGORIES = np.array(["Low", "Medium", "High"], dtype=object)
+
+
+def make_startups(n, seed=42):
+    """Raw form/DB columns, as preprocess_startup_data expects them."""
+    rng = np.random.default_rng(seed)
+    revenue = rng.lognormal(11, 1.0, n).round(2)
+    costs = (revenue * rng.uniform(0.6, 1.4, n)).round(2)
+    return pd.DataFrame({
+        "id": np.arange(1, n + 1),
+        "name": np.char.add("Startup-", np.arange(n).astype(str)).astype(object),
+        "industry": INDUSTRIES[rng.integers(0, len(INDUSTRIES), n)],
+        "stage": STAGES[rng.integers(0, len(STAGES), n)],
+        "revenue": revenue,
+        "costs": costs,
+        "churn_rate": rng.uniform(0, 60, n).round(2),
+        "marketing_spend": rng.uniform(0, 50_000, n).round(2),
+        "burn_rate": np.maximum(costs - revenue, 0).round(2),
+        "cash_reserves": rng.uniform(0, 1_000_000, n).round(2),
+        "cac": rng.uniform(10, 1_000, n).round(2),
+        "ltv": rng.uniform(100, 10_000, n).round(2),
+        "monthly_growth_rate": rng.uniform(0, 0.3, n).round(4),
+        "market_share": rng.uniform(0, 20, n).round(2),
+    })
+
+
+def make_scored_portfolio(n, seed=42):
+    """Raw columns plus engineered features and model outputs, as the dashboard sees them."""
+    rng = np.random.default_rng(seed + 1)
+    df = make_startups(n, seed)
+    df["profit"] = df["revenue"] - df["costs"]
+    df["profit_margin"] = df["profit"] / df["revenue"].replace(0, 1)
+    df["marketing_efficiency"] = df["revenue"] / df["marketing_spend"].replace(0, 1)
+    df["ltv_cac_ratio"] = df["ltv"] / df["cac"].replace(0, 1)
+    df["runway_months"] = df["cash_reserves"] / df["burn_rate"].replace(0, 1)
+    df["predicted_growth"] = df["profit"] * rng.uniform(-0.5, 1.5, n)
+    df["growth_category"] = GROWTH_CATEGORIES[rng.integers(0, 3, n)]
+    df["cluster"] = rng.integers(0, 3, n)
+    df["archetype"] = df["cluster"]  # three clusters: one archetype each
+    return df
@@ -1,5 +1,6 @@
 import os
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -7,5 +8,28 @@ load_dotenv()
 # Environment variable (from .env or Docker)
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Connection pool settings (ignored for in-memory SQLite, which uses a single connection)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", 30))
+
+
+def make_engine(url=DATABASE_URL, **overrides):
+    """SQLAlchemy engine with a sized, pre-pinged connection pool."""
+    kwargs = {"pool_pre_ping": True}
+    parsed = make_url(url)
+    in_memory = parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:")
+    if not in_memory:
+        kwargs.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_timeout=DB_POOL_TIMEOUT,
+        )
+    kwargs.update(overrides)
+    return create_engine(url, **kwargs)
+
+
 # Create SQLAlchemy engine
-engine = create_engine(DATABASE_URL)
+engine = make_engine(DATABASE_URL)
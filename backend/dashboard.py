@@ -1,14 +1,87 @@
 import streamlit as st
 import plotly.express as px
-import pandas as pd
-from utils.strategy_engine import generate_strategy
-
-def show_dashboard(df):
-    """Simplified, clean dashboard for Startup Growth Advisor."""
+import plotly.graph_objects as go
+from utils.dashboard_data import BOX_VALUE, SCATTERS, aggregate, get_aggregates
+
+# startup_info columns the charts read (engineered features are derived from them).
+DASHBOARD_COLUMNS = ["name", "industry", "stage", "revenue", "churn_rate", "marketing_spend"]
+
+SCATTER_TITLES = {
+    "growth_vs_revenue": "Predicted Growth vs Revenue",
+    "efficiency_vs_growth": "Marketing Efficiency vs Predicted Growth",
+    "margin_vs_runway": "Profit Margin vs Runway (Months)",
+}
+USER_MARKER = {"symbol": "star", "size": 16, "color": "black", "line": {"width": 1, "color": "white"}}
+
+
+def _user_trace(trace, user_df, x, y):
+    """The user's startup as its own trace, added last so it is drawn on top."""
+    return trace(x=user_df[x], y=user_df[y], mode="markers", name="Your Startup",
+                 marker=USER_MARKER, hovertext=user_df["name"], hoverinfo="text+x+y")
+
+
+def _scatter(points, user_df, x, y, title, category_order):
+    """WebGL scatter of the (sampled) portfolio, with the user's startup overlaid."""
+    fig = px.scatter(
+        points,
+        x=x,
+        y=y,
+        color="growth_category",
+        hover_name="name",
+        category_orders={"growth_category": category_order},
+        render_mode="webgl",
+        title=title,
+    )
+    fig.update_traces(marker_size=5)
+    if user_df is not None and not user_df.empty:
+        fig.add_trace(_user_trace(go.Scattergl, user_df, x, y))
+    return fig
+
+
+def _box(stats, user_df, category_order):
+    """Box plot drawn from precomputed quartiles (``utils.dashboard_data.box_stats``)."""
+    fig = go.Figure()
+    colors = px.colors.qualitative.Plotly
+    for i, category in enumerate(category_order):
+        group = stats[stats["growth_category"] == category]
+        if group.empty:
+            continue
+        fig.add_trace(go.Box(
+            name=category,
+            x=group["industry"],
+            q1=group["q1"],
+            median=group["median"],
+            q3=group["q3"],
+            lowerfence=group["lowerfence"],
+            upperfence=group["upperfence"],
+            mean=group["mean"],
+            marker_color=colors[i % len(colors)],
+            hovertext=[f"{n:,} startups" for n in group["count"]],
+        ))
+    if user_df is not None and not user_df.empty:
+        fig.add_trace(_user_trace(go.Scatter, user_df, "industry", BOX_VALUE))
+    fig.update_layout(
+        boxmode="group",
+        title="Churn Rate Distribution by Industry",
+        xaxis_title="industry",
+        yaxis_title=BOX_VALUE,
+        legend_title_text="growth_category",
+    )
+    return fig
+
+
+def show_dashboard(portfolio):
+    """Simplified, clean dashboard for Startup Growth Advisor.
+
+    Filters are pushed down to SQL through ``portfolio.query`` so only the
+    matching rows and the charted columns are read. Charts are drawn from
+    cached server-side aggregates (``utils.dashboard_data``), not raw rows.
+    """
 
     st.title("📊 AI-Powered Startup Growth Dashboard")
 
     has_current_startup = "current_startup" in st.session_state
+    user_df = None
 
     # --- View mode selection ---
     view_options = ["Portfolio Mode"]
@@ -18,96 +91,58 @@ def show_dashboard(df):
 
     # --- Startup Mode ---
     if view_mode == "Startup Mode" and has_current_startup:
-        filtered_df = st.session_state["current_startup"].copy()
-        filtered_df["source"] = "Your Startup"
-        st.subheader(f"🚀 Visuals for {filtered_df.iloc[0]['name']}")
+        current = st.session_state["current_startup"]
+        st.subheader(f"🚀 Visuals for {current.iloc[0]['name']}")
+        aggregates = aggregate(current)
 
     # --- Portfolio Mode ---
     else:
-        filtered_df = df.copy()
-        filtered_df["source"] = "Portfolio"
-
-        # Add user's startup into portfolio for comparison
-        if has_current_startup:
-            user_df = st.session_state["current_startup"].copy()
-            user_df["source"] = "Your Startup"
-            filtered_df = pd.concat([filtered_df, user_df], ignore_index=True)
-
         st.subheader("📊 Portfolio Overview")
 
         # Sidebar filters (no default selections)
-        industry_options = filtered_df["industry"].dropna().unique().tolist()
-        industry_filter = st.sidebar.multiselect("Select Industry", industry_options)
-
-        cluster_options = filtered_df["cluster"].dropna().unique().tolist()
-        cluster_filter = st.sidebar.multiselect("Select Cluster", cluster_options)
-
-        growth_options = filtered_df["growth_category"].dropna().unique().tolist()
-        growth_filter = st.sidebar.multiselect("Select Growth Category", growth_options)
-
-        if industry_filter:
-            filtered_df = filtered_df[filtered_df["industry"].isin(industry_filter)]
-        if cluster_filter:
-            filtered_df = filtered_df[filtered_df["cluster"].isin(cluster_filter)]
-        if growth_filter:
-            filtered_df = filtered_df[filtered_df["growth_category"].isin(growth_filter)]
+        options = portfolio.filter_options()
+        industry_filter = st.sidebar.multiselect("Select Industry", options["industry"])
+        cluster_filter = st.sidebar.multiselect("Select Cluster", options["cluster"])
+        growth_filter = st.sidebar.multiselect("Select Growth Category", options["growth_category"])
+
+        aggregates = get_aggregates(
+            portfolio,
+            industries=industry_filter,
+            clusters=cluster_filter,
+            growth_categories=growth_filter,
+            columns=DASHBOARD_COLUMNS,
+        )
 
-    # --- Generate strategies (for visuals only) ---
-    df_with_strategies = generate_strategy(filtered_df)
+        # Overlay user's startup on the portfolio for comparison
+        if has_current_startup:
+            user_df = st.session_state["current_startup"]
+            if industry_filter:
+                user_df = user_df[user_df["industry"].isin(industry_filter)]
+            if cluster_filter:
+                user_df = user_df[user_df["cluster"].isin(cluster_filter)]
+            if growth_filter:
+                user_df = user_df[user_df["growth_category"].isin(growth_filter)]
 
     # --- Visualizations ---
-    if not df_with_strategies.empty:
+    if aggregates["rows"] or (user_df is not None and not user_df.empty):
         st.header("📈 Visual Analytics")
 
-        # Growth vs Revenue (scatter)
-        fig1 = px.scatter(
-            df_with_strategies,
-            x="revenue",
-            y="predicted_growth",
-            color="growth_category",
-            symbol="source",
-            hover_name="name",
-            size_max=6,  # fixed max size
-            size=[5]*len(df_with_strategies),  # uniform point size
-            title="Predicted Growth vs Revenue"
-        )
-        st.plotly_chart(fig1, use_container_width=True)
-
-        # Churn Distribution by Industry (boxplot)
-        fig2 = px.box(
-            df_with_strategies,
-            x="industry",
-            y="churn_rate",
-            color="growth_category",
-            hover_data=["name"],
-            title="Churn Rate Distribution by Industry"
-        )
-        st.plotly_chart(fig2, use_container_width=True)
-
-        # Marketing Efficiency vs Growth (scatter)
-        fig3 = px.scatter(
-            df_with_strategies,
-            x="marketing_efficiency",
-            y="predicted_growth",
-            color="growth_category",
-            symbol="source",
-            hover_name="name",
-            size=[5]*len(df_with_strategies),  # uniform size
-            size_max=6,
-            title="Marketing Efficiency vs Predicted Growth"
-        )
-        st.plotly_chart(fig3, use_container_width=True)
-
-        # Profit Margin vs Runway (scatter)
-        fig4 = px.scatter(
-            df_with_strategies,
-            x="profit_margin",
-            y="runway_months",
-            color="growth_category",
-            symbol="source",
-            hover_name="name",
-            size=[5]*len(df_with_strategies),
-            size_max=6,
-            title="Profit Margin vs Runway (Months)"
-        )
-        st.plotly_chart(fig4, use_container_width=True)
+        categories = sorted(aggregates["box"]["growth_category"].unique())
+        if user_df is not None:
+            categories = sorted(set(categories) | set(user_df["growth_category"]))
+        shown = max(len(points) for points in aggregates["scatters"].values())
+        if shown < aggregates["rows"]:
+            st.caption(f"Scatter plots show a density-preserving sample of {shown:,} of "
+                       f"{aggregates['rows']:,} startups; box plots use all of them.")
+
+        charts = list(SCATTERS.items())
+        # Growth vs Revenue (scatter), then Churn Distribution by Industry (boxplot)
+        for key, (x, y) in charts[:1]:
+            st.plotly_chart(_scatter(aggregates["scatters"][key], user_df, x, y, SCATTER_TITLES[key], categories),
+                            use_container_width=True)
+        st.plotly_chart(_box(aggregates["box"], user_df, categories), use_container_width=True)
+
+        # Marketing Efficiency vs Growth, Profit Margin vs Runway (scatter)
+        for key, (x, y) in charts[1:]:
+            st.plotly_chart(_scatter(aggregates["scatters"][key], user_df, x, y, SCATTER_TITLES[key], categories),
+                            use_container_width=True)
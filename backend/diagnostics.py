@@ -0,0 +1,50 @@
+import pandas as pd
+import streamlit as st
+
+from utils import metrics
+
+
+def stage_table(snapshot) -> pd.DataFrame:
+    """One row per stage: call count and latency percentiles in milliseconds."""
+    rows = [
+        {
+            "stage": name,
+            "count": stats["count"],
+            **{f"p{p} (ms)": stats[f"p{p}"] and stats[f"p{p}"] * 1000 for p in metrics.PERCENTILES},
+            "mean (ms)": stats["mean"] and stats["mean"] * 1000,
+            "total (s)": stats["sum"],
+        }
+        for name, stats in snapshot.items()
+    ]
+    return pd.DataFrame(rows, columns=["stage", "count", *(f"p{p} (ms)" for p in metrics.PERCENTILES),
+                                       "mean (ms)", "total (s)"])
+
+
+def show_diagnostics():
+    """Per-stage latency percentiles of this server process (opened with ``?diagnostics=1``).
+
+    Percentiles are over the last ``metrics.RECENT_SAMPLES`` calls of each
+    stage, across all sessions. Collection is off unless ``METRICS_ENABLED=1``
+    or it is switched on here.
+    """
+    st.title("🩺 Diagnostics")
+
+    collecting = st.toggle("Collect stage timings", value=metrics.enabled())
+    if collecting != metrics.enabled():
+        metrics.enable(collecting)
+
+    snapshot = metrics.REGISTRY.snapshot()
+    if not snapshot:
+        st.info("No stage timings recorded yet. Enable collection and submit a startup.")
+    else:
+        table = stage_table(snapshot).sort_values("total (s)", ascending=False)
+        st.dataframe(table, hide_index=True, use_container_width=True,
+                     column_config={col: st.column_config.NumberColumn(format="%.2f")
+                                    for col in table.columns if col not in ("stage", "count")})
+
+    col1, col2 = st.columns(2)
+    if col1.button("Reset timings"):
+        metrics.REGISTRY.reset()
+        st.rerun()
+    col2.download_button("Download Prometheus text", metrics.prometheus_text(),
+                         file_name="metrics.txt", mime="text/plain")
@@ -1,6 +1,135 @@
-from sklearn.cluster import KMeans
+from joblib import Parallel, delayed
+import numpy as np
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.metrics import silhouette_score
+from sklearn.preprocessing import StandardScaler
+import pandas as pd
+
+from utils.metrics import timed
+from utils.preprocessing import FEATURES, feature_matrix
+from utils.strategy_engine import ARCHETYPES
+
+# Above this many rows KMeans is replaced by MiniBatchKMeans.
+MINIBATCH_ROWS = 50_000
+# k candidates for n_clusters="auto", and the sample the silhouette is computed on.
+K_RANGE = range(2, 9)
+SILHOUETTE_ROWS = 5_000
+
+# Cluster IDs are ordered by centroid revenue, so 0 is always the smallest
+# (early-stage) archetype and the highest ID the largest, across refits.
+ORDER_BY = "revenue"
+
+
+def archetype_map(k):
+    """
+    Archetype (index into ``ARCHETYPES``) of each of ``k`` revenue-ordered clusters.
+
+    Cluster ranks are spread evenly over the archetypes and rounded, so the
+    smallest cluster is always "early", the largest always "mature" and the
+    mapping never decreases: k=2 gives early/mature, k=3 one each, and k=8
+    early x2, growth x4, mature x2.
+    """
+    if k == 1:
+        return np.zeros(1, dtype=np.intp)
+    return np.floor(np.arange(k) * (len(ARCHETYPES) - 1) / (k - 1) + 0.5).astype(np.intp)
+
+
+def _kmeans(k, n_rows, random_state=42):
+    if n_rows >= MINIBATCH_ROWS:
+        return MiniBatchKMeans(n_clusters=k, random_state=random_state, batch_size=4096, n_init=3)
+    return KMeans(n_clusters=k, random_state=random_state, n_init=3)
+
+
+def _score_k(X, sample, k, random_state):
+    model = _kmeans(k, len(X), random_state).fit(X)
+    labels = model.predict(sample)
+    silhouette = silhouette_score(sample, labels) if len(set(labels)) > 1 else -1.0
+    return {"k": k, "inertia": float(model.inertia_), "silhouette": float(silhouette)}
+
 
 class StartupClustering:
-    def __init__(self, n_clusters=3):
+    def __init__(self, n_clusters=3, k_range=K_RANGE, n_jobs=-1, random_state=42):
+        # n_clusters: an int, or "auto" to pick k by silhouette over k_range
         self.n_clusters = n_clusters
-        self.model = KMeans(n_clusters=n_clusters, random_state=42)
+        self.k_range = list(k_range)
+        self.n_jobs = n_jobs
+        self.random_state = random_state
+        self.features = list(FEATURES)
+        self.scaler = StandardScaler()
+        self.model = KMeans(n_clusters=n_clusters if n_clusters != "auto" else 3, random_state=random_state)
+        self.sweep = []
+
+    def _matrix(self, df):
+        return feature_matrix(df, self.features).astype(np.float64)
+
+    def select_k(self, X):
+        """Fit every k in ``k_range`` in parallel on scaled ``X``; returns the best by silhouette."""
+        rng = np.random.default_rng(self.random_state)
+        sample = X[rng.choice(len(X), min(len(X), SILHOUETTE_ROWS), replace=False)]
+        ks = [k for k in self.k_range if k < len(X)]
+        self.sweep = Parallel(n_jobs=self.n_jobs)(
+            delayed(_score_k)(X, sample, k, self.random_state) for k in ks
+        )
+        return max(self.sweep, key=lambda r: (r["silhouette"], -r["k"]))["k"]
+
+    @timed("clustering.train")
+    def train(self, df: pd.DataFrame):
+        X = self.scaler.fit_transform(self._matrix(df))
+        k = self.select_k(X) if self.n_clusters == "auto" else self.n_clusters
+        self.model = _kmeans(k, len(X), self.random_state).fit(X)
+        self._build_index()
+
+    # --- Out-of-core fitting (models.streaming): scale statistics first, then centroids ---
+    def partial_scale(self, df: pd.DataFrame):
+        self.scaler.partial_fit(self._matrix(df))
+
+    def partial_train(self, df: pd.DataFrame):
+        """Update the centroids with one chunk (after ``partial_scale`` has seen every chunk)."""
+        X = self.scaler.transform(self._matrix(df))
+        if not isinstance(self.model, MiniBatchKMeans):
+            k = self.select_k(X) if self.n_clusters == "auto" else self.n_clusters
+            self.model = MiniBatchKMeans(n_clusters=k, random_state=self.random_state)
+        self.model.partial_fit(X)
+
+    def finish_partial(self):
+        self._build_index()
+
+    def _build_index(self):
+        """
+        Precompute the assignment of raw feature rows to ordered clusters.
+
+        With ``c`` the centroids in raw units and ``w = 1 / scale``, the scaled
+        squared distance is ``|x w|^2 - 2 x (w^2 c)^T + |c w|^2``; the first term
+        is the same for every cluster, so ``argmin(x @ weights + bias)`` assigns.
+        """
+        centers = self.scaler.inverse_transform(self.model.cluster_centers_)
+        order = np.argsort(centers[:, self.features.index(ORDER_BY)], kind="stable")
+        self.centers_ = centers[order]
+        w = 1.0 / self.scaler.scale_
+        self.weights_ = -2.0 * (self.centers_ * w ** 2).T
+        self.bias_ = ((self.centers_ * w) ** 2).sum(axis=1)
+        self.archetypes_ = archetype_map(len(self.centers_))
+        self._check_archetypes()
+
+    def _check_archetypes(self):
+        """Every cluster ID must map to exactly one known archetype."""
+        archetypes = np.asarray(self.archetypes_)
+        if archetypes.shape != (len(self.centers_),) or not np.isin(archetypes, np.arange(len(ARCHETYPES))).all():
+            raise ValueError(f"Cluster archetypes {archetypes.tolist()} don't map "
+                             f"{len(self.centers_)} clusters onto {ARCHETYPES}.")
+
+    def archetype(self, clusters) -> np.ndarray:
+        """Archetype index for each cluster ID (see ``archetype_map``)."""
+        return self.archetypes_[np.asarray(clusters, dtype=np.intp)]
+
+    def assign(self, X: np.ndarray) -> np.ndarray:
+        """Cluster IDs for rows of raw (unscaled) features, in ``self.features`` order."""
+        return np.argmin(np.asarray(X, dtype=np.float64) @ self.weights_ + self.bias_, axis=1)
+
+    def scaled(self, df: pd.DataFrame) -> np.ndarray:
+        """Standardized clustering features (the space the centroids live in)."""
+        return self.scaler.transform(self._matrix(df))
+
+    @timed("clustering.predict")
+    def predict(self, df: pd.DataFrame):
+        return self.assign(self._matrix(df))
@@ -3,24 +3,27 @@ from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report
 import pandas as pd
 
+from utils.metrics import timed
+from utils.preprocessing import FEATURES, feature_matrix
+
 class GrowthClassifier:
-    def __init__(self):
-        self.model = RandomForestClassifier(n_estimators=200, random_state=42)
+    def __init__(self, extra_features=(), n_jobs=-1, predict_n_jobs=1):
+        # extra_features: optional inputs beyond FEATURES, e.g. utils.timeseries.TS_FEATURES
+        self.features = list(FEATURES) + list(extra_features)
+        self.predict_n_jobs = predict_n_jobs
+        self.model = RandomForestClassifier(n_estimators=200, random_state=42, n_jobs=n_jobs)
 
+    @timed("classifier.train")
     def train(self, df: pd.DataFrame):
-        features = ['revenue', 'costs', 'marketing_spend', 'churn_rate',
-                    'burn_rate', 'cash_reserves', 'cac',
-                    'ltv', 'profit_margin', 'marketing_efficiency', 'ltv_cac_ratio']
-        X = df[features]
-        y = df['growth_category']
+        X = feature_matrix(df, self.features)
+        y = df['growth_category'].to_numpy()
 
         X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
         self.model.fit(X_train, y_train)
+        self.model.set_params(n_jobs=self.predict_n_jobs)
         y_pred = self.model.predict(X_test)
         print(classification_report(y_test, y_pred))
 
+    @timed("classifier.predict")
     def predict(self, df: pd.DataFrame):
-        features = ['revenue', 'costs', 'marketing_spend', 'churn_rate',
-                    'burn_rate', 'cash_reserves', 'cac',
-                    'ltv', 'profit_margin', 'marketing_efficiency', 'ltv_cac_ratio']
-        return self.model.predict(df[features])
+        return self.model.predict(feature_matrix(df, self.features))
@@ -0,0 +1,385 @@
+"""
+Compiled single-row inference for the form submit.
+
+``InferenceEngine`` turns a fitted ``ModelBundle`` into plain NumPy arrays:
+tree ensembles become one flat node table traversed for all trees at once,
+the linear model a coefficient vector, and the clustering its precomputed centroid index. Scoring
+a startup then fills one preallocated float32 feature vector from the form
+dict, with the same arithmetic and dtype as ``preprocess_startup_data``, and
+never builds a DataFrame. The form values themselves are returned unrounded.
+
+Compiled engines of stored bundles are saved next to the bundle and loaded
+memory-mapped (``MODEL_MMAP``), so worker processes share one copy of the
+node tables and only the first process on a host pays for compiling.
+
+Check it against the sklearn/XGBoost models and measure latency (run from
+``backend/``):
+
+    python -m models.inference --rows 2000 --repeats 2000
+"""
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import weakref
+from pathlib import Path
+
+import joblib
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+
+from utils.metrics import timed
+from utils.preprocessing import COLUMN_ALIASES, REQUIRED_COLUMNS
+from utils.strategy_engine import recommendations_for_row
+
+_F32 = np.float32
+_ONE = _F32(1)
+_ZERO = _F32(0)
+
+# Vector entries computed from the form; anything else (e.g. TS_FEATURES) is read as given.
+_ENGINEERED = {"profit", "profit_margin", "marketing_efficiency", "ltv_cac_ratio", "runway_months",
+               *REQUIRED_COLUMNS}
+
+
+class FlatForest:
+    """
+    A tree ensemble as concatenated node arrays.
+
+    Every node sends ``x`` left when ``x[feature] <= threshold``. Leaves point
+    to themselves with an infinite threshold, so stepping all trees
+    ``depth`` times lands each one on its leaf without per-tree branching.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, depth):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.depth = depth
+
+    @classmethod
+    def from_sklearn(cls, estimators, columns, normalize=False):
+        """Flatten fitted sklearn trees; ``columns`` maps each tree feature to a vector index."""
+        columns = np.asarray(columns, dtype=np.intp)
+        parts = {"feature": [], "threshold": [], "left": [], "right": [], "value": []}
+        roots, offset, depth = [], 0, 0
+        for estimator in estimators:
+            tree = estimator.tree_
+            n = tree.node_count
+            leaf = tree.children_left == -1
+            own = np.arange(offset, offset + n)
+            parts["feature"].append(np.where(leaf, 0, columns[np.maximum(tree.feature, 0)]))
+            parts["threshold"].append(np.where(leaf, np.inf, tree.threshold))
+            parts["left"].append(np.where(leaf, own, tree.children_left + offset))
+            parts["right"].append(np.where(leaf, own, tree.children_right + offset))
+            value = tree.value[:, 0, :]
+            if normalize:
+                value = value / value.sum(axis=1, keepdims=True)
+            parts["value"].append(value)
+            roots.append(offset)
+            offset += n
+            depth = max(depth, tree.max_depth)
+        arrays = {k: np.concatenate(v) for k, v in parts.items()}
+        return cls(arrays["feature"].astype(np.intp), arrays["threshold"].astype(np.float64),
+                   arrays["left"].astype(np.intp), arrays["right"].astype(np.intp),
+                   arrays["value"], np.asarray(roots, dtype=np.intp), depth)
+
+    @classmethod
+    def from_xgboost(cls, booster, columns):
+        """Flatten an XGBoost booster (``x < split`` goes left; inputs are never missing)."""
+        columns = np.asarray(columns, dtype=np.intp)
+        trees = booster.trees_to_dataframe()
+        names = booster.feature_names
+        node_index = {node_id: i for i, node_id in enumerate(trees["ID"])}
+        is_leaf = (trees["Feature"] == "Leaf").to_numpy()
+        own = np.arange(len(trees))
+
+        def child(ids):
+            return np.array([node_index.get(i, -1) for i in ids], dtype=np.intp)
+
+        def feature_index(name):
+            if name == "Leaf":
+                return 0
+            return names.index(name) if names else int(name[1:])
+
+        feature = columns[[feature_index(name) for name in trees["Feature"]]]
+        # x < split  <=>  x <= the largest float32 below split
+        split = trees["Split"].to_numpy(dtype=np.float32, na_value=np.inf)
+        threshold = np.nextafter(split, _F32(-np.inf)).astype(np.float64)
+        value = trees["Gain"].to_numpy(dtype=np.float64)[:, None]
+
+        left = np.where(is_leaf, own, child(trees["Yes"]))
+        right = np.where(is_leaf, own, child(trees["No"]))
+        roots = np.flatnonzero(trees["Node"].to_numpy() == 0)
+        return cls(
+            np.where(is_leaf, 0, feature).astype(np.intp),
+            np.where(is_leaf, np.inf, threshold),
+            left, right, value, roots.astype(np.intp), _max_depth(left, right, is_leaf),
+        )
+
+    def leaves(self, x):
+        node = self.roots
+        feature, threshold, left, right = self.feature, self.threshold, self.left, self.right
+        for _ in range(self.depth):
+            node = np.where(x[feature[node]] <= threshold[node], left[node], right[node])
+        return node
+
+    def sum(self, x):
+        return self.value[self.leaves(x)].sum(axis=0)
+
+    def mean(self, x):
+        return self.sum(x) / len(self.roots)
+
+
+def _max_depth(left, right, is_leaf):
+    # XGBoost numbers children after their parent, so one pass in node order suffices.
+    depth = np.zeros(len(left), dtype=np.intp)
+    for i in np.flatnonzero(~is_leaf):
+        depth[left[i]] = depth[right[i]] = depth[i] + 1
+    return int(depth.max()) if len(depth) else 0
+
+
+def _xgb_base_score(booster):
+    params = json.loads(booster.save_config())["learner"]["learner_model_param"]
+    return float(str(params["base_score"]).strip("[]"))
+
+
+class _CompiledRegressor:
+    def __init__(self, model, columns):
+        self.kind = type(model).__name__
+        if isinstance(model, LinearRegression):
+            # Keep the fitted dtype (float32 when trained on float32 features) so sums round the same way.
+            self.coef = np.zeros(max(columns) + 1, dtype=model.coef_.dtype)
+            self.coef[columns] = model.coef_
+            self.intercept = model.coef_.dtype.type(model.intercept_)
+        elif isinstance(model, RandomForestRegressor):
+            self.forest = FlatForest.from_sklearn(model.estimators_, columns)
+        elif hasattr(model, "get_booster"):
+            self.forest = FlatForest.from_xgboost(model.get_booster(), columns)
+            self.base_score = _xgb_base_score(model.get_booster())
+        else:
+            raise TypeError(f"No compiled form for {self.kind}")
+
+    def predict(self, x):
+        if self.kind == "LinearRegression":
+            return float(self.coef @ x[:len(self.coef)] + self.intercept)
+        if self.kind == "RandomForestRegressor":
+            return float(self.forest.mean(x)[0])
+        return float(np.float32(self.base_score) + np.float32(self.forest.sum(x)[0]))
+
+
+class InferenceEngine:
+    """Score one startup dict with the bundle's models, compiled to NumPy arrays."""
+
+    def __init__(self, bundle, model_name=None):
+        self.version = bundle.version
+        regressor, classifier, clustering = bundle.regressor, bundle.classifier, bundle.clustering
+
+        # One vector holds every model's inputs; each model indexes into it.
+        self.columns = list(dict.fromkeys(regressor.features + classifier.features + clustering.features))
+        position = {name: i for i, name in enumerate(self.columns)}
+
+        def indices(features):
+            return [position[name] for name in features]
+
+        # The regressor's serving model(s) unless one is named; ensembles keep their weights.
+        weights = {model_name: 1.0} if model_name else regressor.serving_weights
+        self.regressors = [
+            (_CompiledRegressor(regressor.trained_models[name], indices(regressor.features)), weight)
+            for name, weight in weights.items()
+        ]
+
+        if not isinstance(classifier.model, RandomForestClassifier):
+            raise TypeError(f"No compiled form for {type(classifier.model).__name__}")
+        self.classifier = FlatForest.from_sklearn(
+            classifier.model.estimators_, indices(classifier.features), normalize=True
+        )
+        self.classes = classifier.model.classes_
+
+        self.cluster_index = np.asarray(indices(clustering.features), dtype=np.intp)
+        self.cluster_weights = clustering.weights_
+        self.cluster_bias = clustering.bias_
+        self.cluster_archetypes = clustering.archetypes_
+
+        self._extra = [name for name in self.columns if name not in _ENGINEERED]
+        self._local = threading.local()
+
+    def __getstate__(self):
+        # Per-thread scratch vectors are recreated on load.
+        return {k: v for k, v in self.__dict__.items() if k != "_local"}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    def _vector(self):
+        x = getattr(self._local, "x", None)
+        if x is None:
+            x = self._local.x = np.zeros(len(self.columns), dtype=_F32)
+        return x
+
+    def features(self, record):
+        """
+        Inputs of ``record`` as floats and its engineered values as float32
+        scalars (``preprocess_startup_data`` semantics).
+        """
+        values = {name: 0.0 for name in REQUIRED_COLUMNS}
+        values["monthly_growth_rate"] = None
+        for key, raw in record.items():
+            name = COLUMN_ALIASES.get(str(key).strip().lower(), str(key).strip().lower())
+            if name in values or name in self._extra:
+                values[name] = _to_float(raw, None if name == "monthly_growth_rate" else 0.0)
+        if values["monthly_growth_rate"] is None:
+            values["monthly_growth_rate"] = _to_float(record.get("ts_user_growth"))
+
+        revenue, costs = _F32(values["revenue"]), _F32(values["costs"])
+        profit = revenue - costs
+        values.update(
+            profit=profit,
+            profit_margin=profit / _nonzero(revenue),
+            marketing_efficiency=revenue / _nonzero(_F32(values["marketing_spend"])),
+            ltv_cac_ratio=_F32(values["ltv"]) / _nonzero(_F32(values["cac"])),
+            runway_months=_F32(values["cash_reserves"]) / _nonzero(_F32(values["burn_rate"])),
+        )
+        return values
+
+    @timed("inference.predict")
+    def predict(self, record: dict) -> dict:
+        """
+        ``record`` merged with its engineered features, ``predicted_growth``,
+        ``growth_category``, ``cluster``, ``archetype`` and ``recommendations``.
+        """
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            values = self.features(record)
+        x = self._vector()
+        for i, name in enumerate(self.columns):
+            x[i] = values.get(name, _ZERO)
+
+        proba = self.classifier.mean(x)
+        distances = x[self.cluster_index].astype(np.float64) @ self.cluster_weights + self.cluster_bias
+
+        result = dict(record)
+        result.update(values)
+        result["predicted_growth"] = sum(weight * model.predict(x) for model, weight in self.regressors)
+        result["growth_category"] = str(self.classes[int(np.argmax(proba))])
+        result["cluster"] = cluster = int(np.argmin(distances))
+        result["archetype"] = int(self.cluster_archetypes[cluster])
+        result["recommendations"] = recommendations_for_row(result)
+        return result
+
+
+def _to_float(value, default=0.0):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return default
+    return default if np.isnan(value) else value
+
+
+def _nonzero(value):
+    return _ONE if value == 0 else value
+
+
+# --- Process-wide cache, compiled once per loaded bundle ---
+_engines = weakref.WeakKeyDictionary()
+_engines_lock = threading.Lock()
+
+
+def _engine_path(bundle, key):
+    digest = hashlib.sha256(repr(key).encode()).hexdigest()[:12]
+    return Path(bundle.path) / f"engine-{digest}.joblib"
+
+
+def _stored_engine(bundle, model_name, key):
+    """Load the compiled engine saved with a stored bundle, compiling and saving it if missing."""
+    from models.model_store import MMAP_MODE
+
+    path = _engine_path(bundle, key)
+    if path.exists():
+        try:
+            engine = joblib.load(path, mmap_mode=MMAP_MODE)
+            if engine.version == bundle.version:
+                return engine
+        except Exception as exc:  # stale/incompatible pickle: recompile
+            print(f"Could not load compiled engine {path}: {exc}")
+    engine = InferenceEngine(bundle, model_name)
+    tmp = None
+    try:
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        os.close(fd)
+        joblib.dump(engine, tmp)
+        os.replace(tmp, path)
+    except OSError as exc:  # read-only artifact dir: serve the in-memory copy
+        if tmp is not None:
+            Path(tmp).unlink(missing_ok=True)
+        print(f"Could not save compiled engine {path}: {exc}")
+        return engine
+    return joblib.load(path, mmap_mode=MMAP_MODE)
+
+
+def get_engine(bundle, model_name=None) -> InferenceEngine:
+    # Keyed on the serving weights too, so reconfiguring the bundle recompiles.
+    key = (model_name, tuple(bundle.regressor.serving_weights.items()))
+    with _engines_lock:
+        engines = _engines.setdefault(bundle, {})
+        if key not in engines:
+            if bundle.path is not None:
+                engines[key] = _stored_engine(bundle, model_name, key)
+            else:
+                engines[key] = InferenceEngine(bundle, model_name)
+        return engines[key]
+
+
+def main(argv=None):
+    from benchmarks.synthetic import make_startups
+    from models.model_store import load_models
+    from utils.preprocessing import preprocess_startup_data
+    from utils.strategy_engine import generate_strategy
+
+    parser = argparse.ArgumentParser(description="Check and time the compiled inference engine.")
+    parser.add_argument("--rows", type=int, default=2000, help="Synthetic startups to compare.")
+    parser.add_argument("--repeats", type=int, default=2000, help="Single-row latency samples.")
+    args = parser.parse_args(argv)
+
+    bundle = load_models()
+    start = time.perf_counter()
+    engine = InferenceEngine(bundle)
+    print(f"compiled in {(time.perf_counter() - start) * 1000:.0f} ms "
+          f"({len(engine.classifier.roots)} classifier trees, depth {engine.classifier.depth}; "
+          f"serving {bundle.regressor.serving_weights})")
+
+    raw = make_startups(args.rows).drop(columns=["id"])
+    reference = generate_strategy(bundle.score(preprocess_startup_data(raw)))
+    compiled = pd.DataFrame([engine.predict(r) for r in raw.to_dict(orient="records")])
+    # Trees match exactly; float32 linear sums may differ in the last bits (BLAS summation order).
+    expected = reference["predicted_growth"].to_numpy()
+    np.testing.assert_allclose(compiled["predicted_growth"], expected, rtol=1e-6,
+                               atol=1e-6 * np.abs(expected).max())
+    assert (compiled["growth_category"].to_numpy() == reference["growth_category"].to_numpy()).all()
+    assert (compiled["cluster"].to_numpy() == reference["cluster"].to_numpy()).all()
+    assert compiled["recommendations"].tolist() == reference["recommendations"].tolist()
+    print(f"{args.rows} rows match the sklearn models")
+
+    record = raw.iloc[0].to_dict()
+    for label, fn in (("compiled", lambda: engine.predict(record)),
+                      ("pandas", lambda: generate_strategy(bundle.score(preprocess_startup_data(
+                          pd.DataFrame([record])))))):
+        samples = np.empty(args.repeats if label == "compiled" else max(args.repeats // 20, 10))
+        for i in range(len(samples)):
+            t = time.perf_counter()
+            fn()
+            samples[i] = time.perf_counter() - t
+        print(f"{label:>9}: p50 {np.percentile(samples, 50) * 1e3:.3f} ms, "
+              f"p99 {np.percentile(samples, 99) * 1e3:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,367 @@
+"""
+Versioned on-disk registry for the fitted models.
+
+Artifacts live under ``models/artifacts/<key>/`` where ``key`` is a hash of the
+training data, the feature lists and every estimator's hyperparameters. The app
+loads them through a process-wide cache, so Streamlit reruns never refit and a
+model is only retrained when its key changes.
+
+Pre-build artifacts during deploy (run from ``backend/``):
+
+    python -m models.model_store build
+    python -m models.model_store list
+    python -m models.model_store report   # per-model validation error and latency
+
+Hyperparameters found by ``python -m models.tuning`` for the same training
+data are applied automatically; they are part of the key and recorded in the
+artifact's meta.json.
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import joblib
+import pandas as pd
+
+from utils.preprocessing import preprocess_startup_data
+from utils.timeseries import TS_FEATURES
+from models.regression_model import GrowthPredictor
+from models.growth_classifier import GrowthClassifier
+from models.clustering_model import StartupClustering
+
+BASE_DIR = Path(__file__).resolve().parent
+DEFAULT_CSV = BASE_DIR / "startups_data.csv"
+ARTIFACT_DIR = Path(os.getenv("MODEL_ARTIFACT_DIR", BASE_DIR / "artifacts"))
+
+# Bump when the bundle layout or preprocessing changes in a way that makes
+# old artifacts unusable.
+STORE_VERSION = 6
+
+# Thread counts: all cores for training, one thread for the app's small predictions.
+# Neither is part of the artifact key.
+TRAIN_N_JOBS = int(os.getenv("MODEL_N_JOBS", -1))
+PREDICT_N_JOBS = int(os.getenv("MODEL_PREDICT_N_JOBS", 1))
+
+# Number of startup clusters, or "auto" to choose k by silhouette (see StartupClustering).
+CLUSTERS = os.getenv("MODEL_CLUSTERS", "3")
+
+# Which regressor serves predictions; see GrowthPredictor.configure_serving.
+SERVING = os.getenv("MODEL_SERVING", "auto")
+SERVING_MAX_LATENCY_MS = float(os.environ["MODEL_MAX_LATENCY_MS"]) if os.getenv("MODEL_MAX_LATENCY_MS") else None
+SERVING_RMSE_TOLERANCE = float(os.getenv("MODEL_RMSE_TOLERANCE", 0.05))
+
+# Load stored bundles with their NumPy arrays memory-mapped read-only, so
+# worker processes on one host share those pages instead of each holding a copy.
+MMAP = os.getenv("MODEL_MMAP", "1") != "0"
+MMAP_MODE = "r" if MMAP else None
+
+# Serve this stored version instead of the one keyed by the training CSV
+# (e.g. a bundle built out of core by models.streaming).
+PINNED_VERSION = os.getenv("MODEL_VERSION")
+
+BUNDLE_FILE = "bundle.joblib"
+META_FILE = "meta.json"
+TUNING_DIR = "tuning"
+TUNED_FILE = "best.json"
+
+# Runtime-only settings that don't change the fitted model.
+_IGNORED_PARAMS = {"n_jobs", "nthread", "verbose", "verbosity"}
+
+
+class ModelBundle:
+    """The fitted regressor, classifier and clustering model, plus their version key."""
+
+    # Search summary from models.tuning, if tuned parameters were applied.
+    tuning = None
+    # Artifact directory the bundle was loaded from or saved to (None if in memory only).
+    path = None
+
+    def __init__(self, regressor, classifier, clustering, version, tuning=None):
+        self.regressor = regressor
+        self.classifier = classifier
+        self.clustering = clustering
+        self.version = version
+        self.tuning = tuning
+
+    def score(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Add predicted_growth, growth_category, cluster and its archetype to a preprocessed frame."""
+        df["predicted_growth"] = self.regressor.predict(df)
+        df["growth_category"] = self.classifier.predict(df)
+        df["cluster"] = self.clustering.predict(df)
+        df["archetype"] = self.clustering.archetype(df["cluster"])
+        return df
+
+
+def new_models(extra_features=(), params=None):
+    """Fresh, unfitted models; ``params`` overrides hyperparameters per tuning target."""
+    regressor = GrowthPredictor(extra_features, n_jobs=TRAIN_N_JOBS, predict_n_jobs=PREDICT_N_JOBS)
+    classifier = GrowthClassifier(extra_features, n_jobs=TRAIN_N_JOBS, predict_n_jobs=PREDICT_N_JOBS)
+    for target, overrides in (params or {}).items():
+        tuning_estimator(regressor, classifier, target).set_params(**overrides)
+    clustering = StartupClustering(n_clusters=CLUSTERS if CLUSTERS == "auto" else int(CLUSTERS),
+                                   n_jobs=TRAIN_N_JOBS)
+    return regressor, classifier, clustering
+
+
+def tuning_estimator(regressor, classifier, target):
+    """The estimator a tuning target refers to: a regressor model name, or "classifier"."""
+    if target == "classifier":
+        return classifier.model
+    return regressor.models[target]
+
+
+def tuning_dir(csv_path=DEFAULT_CSV, artifact_dir=ARTIFACT_DIR) -> Path:
+    """Where searches over ``csv_path`` cache fold results and write their winner."""
+    return Path(artifact_dir) / TUNING_DIR / file_digest(Path(csv_path))[:16]
+
+
+def tuning_result(csv_path=DEFAULT_CSV, artifact_dir=ARTIFACT_DIR):
+    """The last search result for ``csv_path`` (see models.tuning), or None."""
+    path = tuning_dir(csv_path, artifact_dir) / TUNED_FILE
+    if not path.exists():
+        return None
+    result = json.loads(path.read_text())
+    return result if result.get("store_version") == STORE_VERSION else None
+
+
+def tuned_params(csv_path=DEFAULT_CSV, artifact_dir=ARTIFACT_DIR):
+    """``{target: params}`` from the last search over ``csv_path``; empty if there is none."""
+    result = tuning_result(csv_path, artifact_dir)
+    if result is None:
+        return {}
+    return {target: r["params"] for target, r in result["targets"].items()}
+
+
+def configure_bundle(bundle, serving=None, max_latency_ms=None, rmse_tolerance=None, predict_n_jobs=None):
+    """Apply serving and thread settings (defaults from the environment) to a loaded bundle."""
+    bundle.regressor.configure_serving(
+        serving or SERVING,
+        max_latency_ms if max_latency_ms is not None else SERVING_MAX_LATENCY_MS,
+        rmse_tolerance if rmse_tolerance is not None else SERVING_RMSE_TOLERANCE,
+    )
+    n_jobs = predict_n_jobs or PREDICT_N_JOBS
+    bundle.regressor.set_n_jobs(predict_n_jobs=n_jobs)
+    bundle.classifier.model.set_params(n_jobs=n_jobs)
+    return bundle
+
+
+def training_extra_features(csv_path=DEFAULT_CSV):
+    """Time-series features present in the training CSV; the models only use those."""
+    columns = set(pd.read_csv(csv_path, nrows=0).columns)
+    return [col for col in TS_FEATURES if col in columns]
+
+
+def _estimator_params(estimator):
+    params = estimator.get_params()
+    return {k: v for k, v in sorted(params.items()) if k not in _IGNORED_PARAMS}
+
+
+def file_digest(path: Path) -> str:
+    """SHA-256 of a file's bytes, read in 1 MB blocks (training data identity in artifact keys)."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def model_spec(regressor, classifier, clustering) -> dict:
+    """Feature lists and hyperparameters of a model set, as hashed into artifact keys."""
+    return {
+        "regressor": {
+            "features": regressor.features,
+            "models": {name: _estimator_params(m) for name, m in regressor.models.items()},
+        },
+        "classifier": {
+            "features": classifier.features,
+            "model": _estimator_params(classifier.model),
+        },
+        "clustering": {
+            "features": clustering.features,
+            "n_clusters": clustering.n_clusters,
+            "k_range": clustering.k_range,
+            "model": _estimator_params(clustering.model),
+        },
+    }
+
+
+def model_key(csv_path=DEFAULT_CSV, artifact_dir=ARTIFACT_DIR) -> str:
+    """Hash of training data, feature lists and hyperparameters of a fresh model set."""
+    models = new_models(training_extra_features(csv_path), tuned_params(csv_path, artifact_dir))
+    spec = {"store_version": STORE_VERSION, "data": file_digest(Path(csv_path)), **model_spec(*models)}
+    payload = json.dumps(spec, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()[:16]
+
+
+def train_bundle(csv_path=DEFAULT_CSV, key=None, artifact_dir=ARTIFACT_DIR) -> ModelBundle:
+    """Fit all models on the training CSV, with tuned hyperparameters if a search has run."""
+    key = key or model_key(csv_path, artifact_dir)
+    df_train = preprocess_startup_data(pd.read_csv(csv_path))
+
+    tuning = tuning_result(csv_path, artifact_dir)
+    regressor, classifier, clustering = new_models(training_extra_features(csv_path),
+                                                    tuned_params(csv_path, artifact_dir))
+    regressor.train(df_train)
+    classifier.train(df_train)
+    clustering.train(df_train)
+    return ModelBundle(regressor, classifier, clustering, key, tuning=tuning)
+
+
+def save_bundle(bundle: ModelBundle, csv_path=DEFAULT_CSV, artifact_dir=ARTIFACT_DIR, replace=False) -> Path:
+    """
+    Write a bundle atomically to ``artifact_dir/<version>/``.
+
+    An existing bundle of the same version is kept unless ``replace`` is set
+    (``build --force``, or a stored bundle that no longer loads).
+    """
+    artifact_dir = Path(artifact_dir)
+    artifact_dir.mkdir(parents=True, exist_ok=True)
+    target = artifact_dir / bundle.version
+
+    tmp = Path(tempfile.mkdtemp(prefix=f".{bundle.version}-", dir=artifact_dir))
+    try:
+        joblib.dump(bundle, tmp / BUNDLE_FILE)
+        meta = {
+            "version": bundle.version,
+            "store_version": STORE_VERSION,
+            "training_data": str(csv_path),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "tuning": bundle.tuning,
+        }
+        (tmp / META_FILE).write_text(json.dumps(meta, indent=2))
+        old = None
+        if replace and target.exists():
+            # os.replace can't overwrite a non-empty directory: move the old bundle aside first.
+            old = Path(tempfile.mkdtemp(prefix=f".{bundle.version}-old-", dir=artifact_dir))
+            os.replace(target, old / bundle.version)
+        try:
+            os.replace(tmp, target)
+        except OSError:
+            if replace or not (target / BUNDLE_FILE).exists():
+                raise
+            # Another process published the same version first; theirs is equivalent.
+            shutil.rmtree(tmp, ignore_errors=True)
+        if old is not None:
+            shutil.rmtree(old, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    return target
+
+
+def load_bundle(version, artifact_dir=ARTIFACT_DIR):
+    """Load a stored bundle, or return None if it doesn't exist."""
+    path = Path(artifact_dir) / version / BUNDLE_FILE
+    if not path.exists():
+        return None
+    bundle = joblib.load(path, mmap_mode=MMAP_MODE)
+    bundle.path = path.parent
+    return bundle
+
+
+# --- Process-wide cache ---
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def load_models(csv_path=DEFAULT_CSV, artifact_dir=ARTIFACT_DIR, rebuild=False) -> ModelBundle:
+    """
+    Return the fitted bundle for ``csv_path``.
+
+    Looks in the process cache first, then on disk, and only trains when no
+    artifact matches the current key.
+    """
+    csv_path = Path(csv_path)
+    stat = csv_path.stat()
+    cache_key = (str(csv_path), stat.st_mtime_ns, stat.st_size, str(artifact_dir))
+
+    with _cache_lock:
+        if not rebuild and cache_key in _cache:
+            return _cache[cache_key]
+
+        version = PINNED_VERSION or model_key(csv_path, artifact_dir)
+        bundle = None
+        replace = rebuild
+        if PINNED_VERSION:
+            bundle = load_bundle(version, artifact_dir)
+            if bundle is None:
+                raise FileNotFoundError(f"MODEL_VERSION={version} is not in {artifact_dir}")
+        elif not rebuild:
+            try:
+                bundle = load_bundle(version, artifact_dir)
+            except Exception as exc:  # stale/incompatible pickle: retrain
+                print(f"Could not load model artifact {version}: {exc}")
+                replace = True
+        if bundle is None:
+            bundle = train_bundle(csv_path, key=version, artifact_dir=artifact_dir)
+            bundle.path = save_bundle(bundle, csv_path, artifact_dir, replace=replace)
+
+        _cache[cache_key] = configure_bundle(bundle)
+        return bundle
+
+
+def list_artifacts(artifact_dir=ARTIFACT_DIR):
+    artifact_dir = Path(artifact_dir)
+    if not artifact_dir.exists():
+        return []
+    metas = []
+    for meta_path in sorted(artifact_dir.glob(f"*/{META_FILE}")):
+        metas.append(json.loads(meta_path.read_text()))
+    return metas
+
+
+def prune_artifacts(keep, artifact_dir=ARTIFACT_DIR):
+    """Delete every stored version except ``keep``."""
+    removed = []
+    for meta in list_artifacts(artifact_dir):
+        if meta["version"] != keep:
+            shutil.rmtree(Path(artifact_dir) / meta["version"], ignore_errors=True)
+            removed.append(meta["version"])
+    return removed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build and manage model artifacts.")
+    parser.add_argument("command", choices=["build", "list", "prune", "report"])
+    parser.add_argument("--csv", default=str(DEFAULT_CSV), help="Training data CSV.")
+    parser.add_argument("--artifact-dir", default=str(ARTIFACT_DIR))
+    parser.add_argument("--force", action="store_true", help="Retrain even if the artifact exists.")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        start = time.perf_counter()
+        bundle = load_models(args.csv, args.artifact_dir, rebuild=args.force)
+        print(f"Model version {bundle.version} ready in {time.perf_counter() - start:.1f}s "
+              f"({Path(args.artifact_dir) / bundle.version})")
+    elif args.command == "list":
+        for meta in list_artifacts(args.artifact_dir):
+            print(f"{meta['version']}  {meta['created_at']}  {meta['training_data']}")
+    elif args.command == "report":
+        bundle = load_models(args.csv, args.artifact_dir)
+        regressor = bundle.regressor
+        with pd.option_context("display.width", 160, "display.max_columns", None):
+            print(regressor.timing_report().round(4))
+        print(f"Serving ({regressor.serving}): {regressor.serving_weights}")
+        clustering = bundle.clustering
+        print(f"Clusters: {len(clustering.centers_)} ({clustering.n_clusters}), {type(clustering.model).__name__}")
+        for row in clustering.sweep:
+            print(f"  k={row['k']}: silhouette {row['silhouette']:.3f}, inertia {row['inertia']:.1f}")
+        for target, result in (bundle.tuning or {}).get("targets", {}).items():
+            print(f"Tuned {target}: {result['params']} (CV {result['metric']} {result['loss']:.4g})")
+    elif args.command == "prune":
+        current = PINNED_VERSION or model_key(args.csv, args.artifact_dir)
+        for version in prune_artifacts(current, args.artifact_dir):
+            print(f"Removed {version}")
+
+
+if __name__ == "__main__":
+    # Re-import under the package name so pickled classes resolve to
+    # models.model_store rather than __main__.
+    from models.model_store import main
+    main()
@@ -1,38 +1,163 @@
+import time
+
 import pandas as pd
 from sklearn.model_selection import train_test_split
 from sklearn.linear_model import LinearRegression
 from sklearn.ensemble import RandomForestRegressor
-import xgboost as xgb
 from sklearn.metrics import mean_squared_error, r2_score
 import numpy as np
 
+from utils.metrics import timed
+from utils.preprocessing import FEATURES, feature_matrix
+
+# Serving modes: "auto" picks a model from the validation metrics, "ensemble"
+# blends all of them, or name one model (e.g. "RandomForest") to pin it.
+SERVING_MODES = ("auto", "ensemble")
+
+
 class GrowthPredictor:
-    def __init__(self):
-        self.features = [
-            'revenue', 'costs', 'marketing_spend', 'churn_rate',
-            'burn_rate', 'cash_reserves', 'cac',
-            'ltv', 'profit_margin', 'marketing_efficiency', 'ltv_cac_ratio'
-        ]
+    def __init__(self, extra_features=(), n_jobs=-1, predict_n_jobs=1):
+        # extra_features: optional inputs beyond FEATURES, e.g. utils.timeseries.TS_FEATURES
+        self.features = list(FEATURES) + list(extra_features)
+        # n_jobs is used while fitting (-1 = all cores); predict_n_jobs afterwards,
+        # since thread start-up dominates for the small batches the app scores.
+        self.n_jobs = n_jobs
+        self.predict_n_jobs = predict_n_jobs
+        # Only needed to fit; a stored bundle imports it when its XGBoost model is unpickled.
+        import xgboost as xgb
+
         self.models = {
             'LinearRegression': LinearRegression(),
-            'RandomForest': RandomForestRegressor(n_estimators=200, random_state=42),
-            'XGBoost': xgb.XGBRegressor(n_estimators=200, learning_rate=0.05, random_state=42)
+            'RandomForest': RandomForestRegressor(n_estimators=200, random_state=42, n_jobs=n_jobs),
+            'XGBoost': xgb.XGBRegressor(n_estimators=200, learning_rate=0.05, random_state=42, n_jobs=n_jobs)
         }
         self.trained_models = {}
+        self.metrics = {}
+        self.prediction_stats = {}
+        self.configure_serving()
 
+    @timed("regressor.train")
     def train(self, df: pd.DataFrame):
-        X = df[self.features]
-        y = df['profit']
+        X = feature_matrix(df, self.features)
+        y = df['profit'].to_numpy()
 
         X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
 
         for name, model in self.models.items():
+            self._set_threads(model, self.n_jobs)
+            start = time.perf_counter()
             model.fit(X_train, y_train)
-            y_pred = model.predict(X_test)
-            rmse = np.sqrt(mean_squared_error(y_test, y_pred))
-            r2 = r2_score(y_test, y_pred)
-            print(f"{name} RMSE: {rmse:.2f}, R2: {r2:.2f}")
-            self.trained_models[name] = model
-
-    def predict(self, df: pd.DataFrame, model_name='RandomForest'):
-        return self.trained_models[model_name].predict(df[self.features])
+            fit_s = time.perf_counter() - start
+            self._set_threads(model, self.predict_n_jobs)
+
+            self.add_trained(name, model, X_test, y_test, fit_s)
+        self.configure_serving(self.serving, self.max_latency_ms, self.rmse_tolerance)
+
+    def add_trained(self, name, model, X_test, y_test, fit_s=None):
+        """Register a fitted model under ``name`` and record its validation metrics on ``X_test``."""
+        start = time.perf_counter()
+        y_pred = model.predict(X_test)
+        batch_s = time.perf_counter() - start
+
+        rmse = np.sqrt(mean_squared_error(y_test, y_pred))
+        r2 = r2_score(y_test, y_pred)
+        print(f"{name} RMSE: {rmse:.2f}, R2: {r2:.2f}")
+        self.trained_models[name] = model
+        self.metrics[name] = {
+            "rmse": float(rmse),
+            "r2": float(r2),
+            "mse": float(rmse ** 2),
+            "fit_s": fit_s,
+            "row_latency_ms": _row_latency_ms(model, X_test[:1]),
+            "batch_us_per_row": batch_s / max(len(X_test), 1) * 1e6,
+        }
+
+    @staticmethod
+    def _set_threads(model, n_jobs):
+        # n_jobs is also XGBoost's nthread.
+        if 'n_jobs' in model.get_params():
+            model.set_params(n_jobs=n_jobs)
+
+    def set_n_jobs(self, n_jobs=None, predict_n_jobs=None):
+        """Change the thread counts used for the next ``train`` and/or for predictions."""
+        if n_jobs is not None:
+            self.n_jobs = n_jobs
+        if predict_n_jobs is not None:
+            self.predict_n_jobs = predict_n_jobs
+            for model in self.trained_models.values():
+                self._set_threads(model, predict_n_jobs)
+
+    def configure_serving(self, serving="auto", max_latency_ms=None, rmse_tolerance=0.05):
+        """
+        Choose what ``predict`` serves.
+
+        ``"auto"``: among models within ``max_latency_ms`` per row (all if None),
+        the fastest whose validation RMSE is within ``rmse_tolerance`` of the best.
+        ``"ensemble"``: every model, weighted by inverse validation MSE.
+        A model name serves that model.
+        """
+        if serving not in SERVING_MODES and serving not in self.models:
+            raise ValueError(f"Unknown serving mode {serving!r}; use one of {SERVING_MODES + tuple(self.models)}")
+        self.serving = serving
+        self.max_latency_ms = max_latency_ms
+        self.rmse_tolerance = rmse_tolerance
+        self.serving_weights = self._weights()
+
+    def _weights(self):
+        if self.serving in self.models:
+            return {self.serving: 1.0}
+        if not self.metrics:
+            return {}
+        if self.serving == "ensemble":
+            inverse = {name: 1.0 / max(m["mse"], 1e-12) for name, m in self.metrics.items()}
+            total = sum(inverse.values())
+            return {name: w / total for name, w in inverse.items()}
+
+        candidates = {
+            name: m for name, m in self.metrics.items()
+            if self.max_latency_ms is None or m["row_latency_ms"] <= self.max_latency_ms
+        } or self.metrics
+        best = min(m["rmse"] for m in candidates.values())
+        accurate = [name for name, m in candidates.items() if m["rmse"] <= best * (1 + self.rmse_tolerance)]
+        return {min(accurate, key=lambda name: candidates[name]["row_latency_ms"]): 1.0}
+
+    @timed("regressor.predict")
+    def predict(self, df: pd.DataFrame, model_name=None):
+        """Predicted growth from the serving model(s), or from ``model_name`` if given."""
+        X = feature_matrix(df, self.features)
+        weights = {model_name: 1.0} if model_name else self.serving_weights
+        prediction = None
+        for name, weight in weights.items():
+            start = time.perf_counter()
+            y = self.trained_models[name].predict(X)
+            self._record(name, len(X), time.perf_counter() - start)
+            prediction = weight * y if prediction is None else prediction + weight * y
+        return prediction
+
+    def _record(self, name, rows, seconds):
+        stats = self.prediction_stats.setdefault(name, {"calls": 0, "rows": 0, "seconds": 0.0})
+        stats["calls"] += 1
+        stats["rows"] += rows
+        stats["seconds"] += seconds
+
+    def timing_report(self) -> pd.DataFrame:
+        """Per-model validation metrics, measured latency and live prediction timings."""
+        rows = []
+        for name, metrics in self.metrics.items():
+            stats = self.prediction_stats.get(name, {"calls": 0, "rows": 0, "seconds": 0.0})
+            rows.append({
+                "model": name, **metrics,
+                "serving_weight": self.serving_weights.get(name, 0.0),
+                "calls": stats["calls"],
+                "mean_call_ms": stats["seconds"] / stats["calls"] * 1000 if stats["calls"] else None,
+            })
+        return pd.DataFrame(rows).set_index("model") if rows else pd.DataFrame()
+
+
+def _row_latency_ms(model, row, repeats=20):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        model.predict(row)
+        samples.append(time.perf_counter() - start)
+    return float(np.median(samples) * 1000)
@@ -0,0 +1,284 @@
+"""
+Nearest-neighbour index of portfolio startups ("similar startups").
+
+Startups are compared on the engineered ``FEATURES`` from
+``preprocess_startup_data``, standardized so revenue doesn't drown out the
+ratios. The bulk of the portfolio lives in a KD-tree. Startups inserted
+since the tree was built sit in a small delta buffer that is scanned by
+brute force, and the tree is rebuilt once the buffer outgrows
+``rebuild_fraction`` of it. ``refresh`` pulls rows other sessions inserted
+(by id watermark), so the tree is never rebuilt from scratch on a rerun.
+
+The tree is persisted under ``<artifact dir>/similarity/`` on every
+rebuild; a restart loads it and only reads the rows inserted since.
+
+    python -m models.similarity build              # index startup_info (DATABASE_URL)
+    python -m models.similarity bench --rows 1000000
+"""
+import argparse
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import KDTree
+from sqlalchemy import select
+
+from models.model_store import ARTIFACT_DIR, STORE_VERSION
+from utils.db_utils import startup_info
+from utils.preprocessing import FEATURES, REQUIRED_COLUMNS, feature_matrix, preprocess_startup_data
+
+SIMILARITY_DIR = "similarity"
+DEFAULT_K = 10
+
+
+class SimilarityIndex:
+    """Top-k nearest startups by standardized feature vector, with incremental inserts."""
+
+    def __init__(self, features=FEATURES, leaf_size=40, rebuild_fraction=0.05, min_rebuild=1_000):
+        self.features = list(features)
+        self.leaf_size = leaf_size
+        self.rebuild_fraction = rebuild_fraction
+        self.min_rebuild = min_rebuild
+        self.mean = np.zeros(len(self.features))
+        self.scale = np.ones(len(self.features))
+        self.tree = None
+        self.ids = np.empty(0, dtype=np.int64)
+        self._delta_ids = []
+        self._delta_vectors = []
+        self.last_id = 0
+        self.store_version = STORE_VERSION
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # The delta buffer is rebuilt from the database on load; locks don't pickle.
+        state = {k: v for k, v in self.__dict__.items() if k not in ("_lock", "_delta_ids", "_delta_vectors")}
+        state["last_id"] = int(self.ids.max()) if len(self.ids) else 0
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._delta_ids, self._delta_vectors = [], []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.ids) + sum(len(ids) for ids in self._delta_ids)
+
+    def _vectors(self, df: pd.DataFrame) -> np.ndarray:
+        X = feature_matrix(df, self.features).astype(np.float64)
+        return np.nan_to_num((X - self.mean) / self.scale, nan=0.0, posinf=0.0, neginf=0.0)
+
+    def build(self, df: pd.DataFrame, ids):
+        """(Re)build from preprocessed rows ``df`` with startup ``ids``."""
+        X = feature_matrix(df, self.features).astype(np.float64)
+        with self._lock:
+            self._build_locked(X, np.asarray(ids, dtype=np.int64))
+        return self
+
+    def _build_locked(self, raw, ids):
+        self.mean = raw.mean(axis=0) if len(raw) else np.zeros(len(self.features))
+        std = raw.std(axis=0) if len(raw) else np.ones(len(self.features))
+        self.scale = np.where(std > 0, std, 1.0)
+        vectors = np.nan_to_num((raw - self.mean) / self.scale, nan=0.0, posinf=0.0, neginf=0.0)
+        self.tree = KDTree(vectors, leaf_size=self.leaf_size) if len(ids) else None
+        self.ids = ids
+        self._delta_ids, self._delta_vectors = [], []
+        self.last_id = max(self.last_id, int(ids.max()) if len(ids) else 0)
+
+    def add(self, df: pd.DataFrame, ids) -> bool:
+        """Insert preprocessed rows; returns True if that (re)built the tree."""
+        ids = np.asarray(ids, dtype=np.int64)
+        if len(ids) == 0:
+            return False
+        if self.tree is None and not self._delta_ids:
+            self.build(df, ids)
+            return True
+        vectors = self._vectors(df)
+        with self._lock:
+            self._delta_ids.append(ids)
+            self._delta_vectors.append(vectors)
+            self.last_id = max(self.last_id, int(ids.max()))
+            pending = sum(len(d) for d in self._delta_ids)
+            if pending < max(self.min_rebuild, self.rebuild_fraction * len(self.ids)):
+                return False
+            # Back to raw units so the rebuilt tree gets fresh scaling.
+            scaled = [np.asarray(self.tree.data)] if self.tree is not None else []
+            raw = np.vstack(scaled + self._delta_vectors) * self.scale + self.mean
+            self._build_locked(raw, np.concatenate([self.ids, *self._delta_ids]))
+            return True
+
+    def query(self, df: pd.DataFrame, k=DEFAULT_K, exclude=()):
+        """
+        The ``k`` nearest startups to the first row of ``df`` (preprocessed).
+
+        Returns ``(ids, distances)`` sorted by distance, skipping ``exclude``.
+        """
+        x = self._vectors(df.iloc[:1])
+        exclude = {int(i) for i in exclude}
+        with self._lock:
+            if len(self._delta_ids) > 1:
+                # Consolidate single-row inserts so the scan is one vectorized pass.
+                self._delta_ids = [np.concatenate(self._delta_ids)]
+                self._delta_vectors = [np.vstack(self._delta_vectors)]
+            candidates_ids, candidates_dist = [], []
+            if self.tree is not None:
+                n = min(k + len(exclude), len(self.ids))
+                dist, pos = self.tree.query(x, k=n)
+                candidates_ids.append(self.ids[pos[0]])
+                candidates_dist.append(dist[0])
+            for ids, vectors in zip(self._delta_ids, self._delta_vectors):
+                candidates_ids.append(ids)
+                candidates_dist.append(np.sqrt(((vectors - x) ** 2).sum(axis=1)))
+        if not candidates_ids:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        ids = np.concatenate(candidates_ids)
+        dist = np.concatenate(candidates_dist)
+        keep = ~np.isin(ids, list(exclude)) if exclude else slice(None)
+        ids, dist = ids[keep], dist[keep]
+        order = np.argsort(dist, kind="stable")[:k]
+        return ids[order], dist[order]
+
+    # --- Database and disk ---
+    def refresh(self, engine, chunksize=100_000) -> int:
+        """Index ``startup_info`` rows with ids past the watermark; returns how many."""
+        columns = [startup_info.c.id] + [startup_info.c[c] for c in REQUIRED_COLUMNS if c in startup_info.c]
+        stmt = select(*columns).where(startup_info.c.id > self.last_id).order_by(startup_info.c.id)
+        initial = self.tree is None and not self._delta_ids
+        frames, added = [], 0
+        with engine.connect() as conn:
+            for chunk in pd.read_sql(stmt, conn, chunksize=chunksize):
+                ids = chunk.pop("id").to_numpy()
+                df = preprocess_startup_data(chunk)
+                added += len(ids)
+                if initial:
+                    # First load: one build over everything instead of repeated rebuilds.
+                    frames.append((feature_matrix(df, self.features).astype(np.float64), ids))
+                else:
+                    self.add(df, ids)
+        if frames:
+            with self._lock:
+                self._build_locked(np.vstack([X for X, _ in frames]),
+                                   np.concatenate([ids for _, ids in frames]).astype(np.int64))
+        return added
+
+    def save(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        os.close(fd)
+        try:
+            joblib.dump(self, tmp)
+            os.replace(tmp, path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+
+    @staticmethod
+    def load(path):
+        """A stored index, or None if missing or from another store version."""
+        path = Path(path)
+        if not path.exists():
+            return None
+        try:
+            index = joblib.load(path)
+        except Exception as exc:  # stale/incompatible pickle: rebuild
+            print(f"Could not load similarity index {path}: {exc}")
+            return None
+        return index if getattr(index, "store_version", None) == STORE_VERSION else None
+
+
+def index_path(engine, artifact_dir=ARTIFACT_DIR) -> Path:
+    """Index file for a database (the URL without its password)."""
+    url = engine.url.render_as_string(hide_password=True)
+    return Path(artifact_dir) / SIMILARITY_DIR / f"{hashlib.sha256(url.encode()).hexdigest()[:16]}.joblib"
+
+
+class PersistentSimilarityIndex:
+    """A ``SimilarityIndex`` kept in sync with ``startup_info`` and saved whenever its tree is rebuilt."""
+
+    def __init__(self, engine, artifact_dir=ARTIFACT_DIR):
+        self.engine = engine
+        self.path = index_path(engine, artifact_dir)
+        self.index = SimilarityIndex.load(self.path) or SimilarityIndex()
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        with self._lock:
+            tree = self.index.tree
+            added = self.index.refresh(self.engine)
+            if self.index.tree is not tree:
+                self.index.save(self.path)
+        return added
+
+    def query(self, df, k=DEFAULT_K, exclude=()):
+        self.refresh()
+        return self.index.query(df, k, exclude)
+
+
+# --- Process-wide cache, one index per database ---
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_similarity_index(engine, artifact_dir=ARTIFACT_DIR) -> PersistentSimilarityIndex:
+    with _indexes_lock:
+        key = (id(engine), str(artifact_dir))
+        if key not in _indexes:
+            _indexes[key] = PersistentSimilarityIndex(engine, artifact_dir)
+        return _indexes[key]
+
+
+def _bench(rows, queries, k):
+    from benchmarks.synthetic import make_startups
+
+    df = preprocess_startup_data(make_startups(rows, seed=1))
+    start = time.perf_counter()
+    index = SimilarityIndex().build(df, df["id"].to_numpy())
+    print(f"built over {rows:,} startups in {time.perf_counter() - start:.1f}s")
+
+    extra = preprocess_startup_data(make_startups(500, seed=2))
+    start = time.perf_counter()
+    for i in range(len(extra)):
+        index.add(extra.iloc[i:i + 1], [rows + i + 1])
+    print(f"500 incremental inserts: {(time.perf_counter() - start) * 1000 / len(extra):.3f} ms each")
+
+    rng = np.random.default_rng(0)
+    samples = np.empty(queries)
+    for i, row in enumerate(rng.choice(rows, queries)):
+        query = df.iloc[row:row + 1]
+        t = time.perf_counter()
+        index.query(query, k, exclude=[int(query["id"].iloc[0])])
+        samples[i] = time.perf_counter() - t
+    print(f"top-{k}: p50 {np.percentile(samples, 50) * 1e3:.2f} ms, p99 {np.percentile(samples, 99) * 1e3:.2f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Similar-startup index.")
+    parser.add_argument("command", choices=["build", "bench"])
+    parser.add_argument("--artifact-dir", default=str(ARTIFACT_DIR))
+    parser.add_argument("--rows", type=int, default=1_000_000, help="bench: synthetic portfolio size")
+    parser.add_argument("--queries", type=int, default=1_000)
+    parser.add_argument("-k", type=int, default=DEFAULT_K)
+    args = parser.parse_args(argv)
+
+    if args.command == "bench":
+        _bench(args.rows, args.queries, args.k)
+        return
+    from config import engine
+    index = PersistentSimilarityIndex(engine, args.artifact_dir)
+    start = time.perf_counter()
+    added = index.refresh()
+    index.index.save(index.path)
+    print(f"Indexed {added:,} new startups ({len(index.index):,} total) in "
+          f"{time.perf_counter() - start:.1f}s -> {index.path}")
+
+
+if __name__ == "__main__":
+    # Re-import under the package name so the pickled index resolves to models.similarity.
+    from models.similarity import main
+    main()
@@ -0,0 +1,420 @@
+"""
+Out-of-core training for historical portfolios that don't fit in memory.
+
+The source (CSV, Parquet or a SQL table/query read through a server-side
+cursor) is streamed in chunks, each preprocessed on its own, so peak memory
+is bounded by ``chunksize`` rather than the dataset:
+
+* LinearRegression is solved exactly from running, mean-centred moments
+  (Chan's pairwise update); no rows are kept.
+* XGBoost trains from an external-memory ``DataIter``; pages are cached on
+  disk under a temporary directory.
+* RandomForest (regressor and classifier) use ``warm_start``: the configured
+  ``n_estimators`` are spread over the chunks and each batch of new trees is
+  fit on one chunk. With more chunks than trees, every tree sees its own chunk.
+* StartupClustering fits its scaler in the first pass and MiniBatchKMeans
+  centroids in the second.
+
+A deterministic ~5% of rows is held out of training (capped by reservoir
+sampling) and used for the quality report, which puts the streamed models
+next to an in-memory baseline fit on the first ``--baseline-rows`` training
+rows.
+
+    python -m models.streaming history.csv --chunksize 200000
+    python -m models.streaming --sql startup_info --database-url sqlite:///startups.db --save
+    MODEL_VERSION=<printed version> streamlit run app.py   # serve the streamed bundle
+"""
+import argparse
+import contextlib
+import hashlib
+import json
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sklearn.linear_model import LinearRegression
+from sklearn.metrics import f1_score, mean_squared_error, r2_score
+
+from models.model_store import (
+    ARTIFACT_DIR, STORE_VERSION, ModelBundle, file_digest, model_spec, new_models, save_bundle,
+)
+from utils.preprocessing import GROWTH_CATEGORIES, feature_matrix, preprocess_startup_data
+from utils.timeseries import TS_FEATURES
+
+VALIDATION_FRACTION = 0.05
+VALIDATION_ROWS = 50_000
+
+
+def read_chunks(path, chunksize):
+    """Raw frames of at most ``chunksize`` rows from a CSV or Parquet file."""
+    path = Path(path)
+    if path.suffix.lower() in (".parquet", ".pq"):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            sys.exit("Reading Parquet requires pyarrow (pip install pyarrow).")
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunksize)
+
+
+def read_sql_chunks(engine, query, chunksize):
+    """Raw frames from a table name or SELECT, fetched through a server-side cursor."""
+    if " " not in query.strip():
+        query = f"SELECT * FROM {query}"
+    with engine.connect().execution_options(stream_results=True, max_row_buffer=chunksize) as conn:
+        yield from pd.read_sql(query, conn, chunksize=chunksize)
+
+
+class ChunkSource:
+    """
+    Re-iterable stream of preprocessed training chunks.
+
+    Each pass re-reads the source; the train/validation split of every row
+    depends only on its chunk's position, so all passes agree on it.
+    """
+
+    def __init__(self, frames, chunksize, seed=42, validation_fraction=VALIDATION_FRACTION):
+        # frames: callable returning a fresh iterator of raw frames
+        self.frames = frames
+        self.chunksize = chunksize
+        self.seed = seed
+        self.validation_fraction = validation_fraction
+        self.extra_features = None
+
+    def __iter__(self):
+        """Yield ``(df, validation_mask)`` per chunk."""
+        for i, raw in enumerate(self.frames()):
+            if self.extra_features is None:
+                self.extra_features = [c for c in TS_FEATURES if c in raw.columns]
+            df = preprocess_startup_data(raw)
+            rng = np.random.default_rng((self.seed, i))
+            yield df, rng.random(len(df)) < self.validation_fraction
+
+
+class _Moments:
+    """Running mean-centred cross-products, enough to solve least squares exactly."""
+
+    def __init__(self, n_features):
+        self.n = 0
+        self.mean_x = np.zeros(n_features)
+        self.mean_y = 0.0
+        self.xx = np.zeros((n_features, n_features))
+        self.xy = np.zeros(n_features)
+
+    def update(self, X, y):
+        X = X.astype(np.float64)
+        y = y.astype(np.float64)
+        n_b = len(X)
+        if n_b == 0:
+            return
+        mean_x, mean_y = X.mean(axis=0), y.mean()
+        Xc, yc = X - mean_x, y - mean_y
+        n = self.n + n_b
+        dx, dy = mean_x - self.mean_x, mean_y - self.mean_y
+        scale = self.n * n_b / n
+        self.xx += Xc.T @ Xc + np.outer(dx, dx) * scale
+        self.xy += Xc.T @ yc + dx * dy * scale
+        self.mean_x += dx * n_b / n
+        self.mean_y += dy * n_b / n
+        self.n = n
+
+    def linear_regression(self):
+        coef, _, rank, singular = np.linalg.lstsq(self.xx, self.xy, rcond=None)
+        model = LinearRegression()
+        model.coef_ = coef
+        model.intercept_ = float(self.mean_y - self.mean_x @ coef)
+        model.rank_, model.singular_ = int(rank), singular
+        model.n_features_in_ = len(coef)
+        return model
+
+
+class _Reservoir:
+    """Uniform sample of at most ``size`` validation rows across the stream."""
+
+    def __init__(self, size, seed):
+        self.size = size
+        self.rng = np.random.default_rng(seed)
+        self.sample = None
+        self.seen = 0
+
+    def add(self, df):
+        if df.empty:
+            return
+        if self.sample is None or len(self.sample) < self.size:
+            room = self.size - (0 if self.sample is None else len(self.sample))
+            head = df.iloc[:room]
+            self.sample = head.reset_index(drop=True) if self.sample is None else pd.concat(
+                [self.sample, head], ignore_index=True)
+            self.seen += len(head)
+            df = df.iloc[room:]
+            if df.empty:
+                return
+        # Row t replaces a random slot with probability size / (t + 1).
+        slots = self.rng.integers(0, self.seen + np.arange(1, len(df) + 1))
+        self.seen += len(df)
+        rows = np.flatnonzero(slots < self.size)
+        if len(rows):
+            # When two rows draw the same slot the later one wins, as if applied in order.
+            replaced, last = np.unique(slots[rows][::-1], return_index=True)
+            self.sample = pd.concat([self.sample.drop(index=replaced), df.iloc[rows[::-1][last]]],
+                                    ignore_index=True)
+
+
+class _XGBChunks(xgb.DataIter):
+    """Feeds the training rows of each chunk to XGBoost's external-memory DMatrix."""
+
+    def __init__(self, source, features, cache_dir):
+        super().__init__(cache_prefix=str(Path(cache_dir) / "xgb"))
+        self.source = source
+        self.features = features
+        self._it = None
+
+    def next(self, input_data):
+        if self._it is None:
+            self._it = iter(self.source)
+        for df, validation in self._it:
+            train = df[~validation]
+            if len(train):
+                input_data(data=feature_matrix(train, self.features), label=train["profit"].to_numpy())
+                return True
+        return False
+
+    def reset(self):
+        self._it = None
+
+
+def _tree_quota(n_estimators, n_chunks):
+    """Trees to add per chunk so that ``n_estimators`` are spread evenly over ``n_chunks``."""
+    edges = [(i * n_estimators) // n_chunks for i in range(n_chunks + 1)]
+    return [b - a for a, b in zip(edges, edges[1:])]
+
+
+def _peak_rss_mb():
+    # ru_maxrss is KiB on Linux (bytes on macOS).
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+
+
+class StreamingTrainer:
+    """Fit a ``ModelBundle`` from a ``ChunkSource`` in a fixed number of passes."""
+
+    def __init__(self, source, params=None, validation_rows=VALIDATION_ROWS, seed=42, log=print):
+        self.source = source
+        self.params = params
+        self.validation_rows = validation_rows
+        self.seed = seed
+        self.log = log
+        self.stats = {}
+        self.validation = None
+
+    def fit(self, version=None) -> ModelBundle:
+        start = time.perf_counter()
+        # Pass 1: counts, least-squares moments, clustering scale and the validation sample.
+        chunk_sizes = []
+        moments = clustering = regressor = classifier = None
+        reservoir = _Reservoir(self.validation_rows, self.seed)
+        for df, validation in self.source:
+            if regressor is None:
+                regressor, classifier, clustering = new_models(self.source.extra_features, self.params)
+                moments = _Moments(len(regressor.features))
+            train = df[~validation]
+            chunk_sizes.append(len(train))
+            reservoir.add(df[validation])
+            if len(train):
+                moments.update(feature_matrix(train, regressor.features), train["profit"].to_numpy())
+                clustering.partial_scale(train)
+        if regressor is None or moments.n == 0:
+            raise ValueError("the training source has no rows")
+        if reservoir.sample is None:
+            raise ValueError("no validation rows; use a larger source or validation fraction")
+        self.stats.update(rows=int(sum(chunk_sizes)), chunks=len(chunk_sizes),
+                          validation_rows=len(reservoir.sample))
+        self._phase("pass 1 (linear, scaling, validation sample)", start)
+
+        valid = self.validation = reservoir.sample
+        X_valid = feature_matrix(valid, regressor.features)
+        y_valid = valid["profit"].to_numpy()
+        regressor.add_trained("LinearRegression", moments.linear_regression(), X_valid, y_valid,
+                              self.stats["phases"][-1]["seconds"])
+
+        # Pass 2: both random forests, growing warm-started trees chunk by chunk, and the centroids.
+        t = time.perf_counter()
+        self._fit_forests(regressor, classifier, clustering, chunk_sizes)
+        fit_s = self._phase("pass 2 (random forests, kmeans)", t)
+        regressor.add_trained("RandomForest", regressor.models["RandomForest"], X_valid, y_valid, fit_s)
+
+        # Pass 3+: XGBoost from its external-memory iterator (it re-reads the source as needed).
+        t = time.perf_counter()
+        regressor.add_trained("XGBoost", self._fit_xgboost(regressor), X_valid, y_valid,
+                              self._phase("xgboost (external memory)", t))
+        regressor.configure_serving(regressor.serving, regressor.max_latency_ms, regressor.rmse_tolerance)
+
+        self.stats["seconds"] = time.perf_counter() - start
+        self.stats["peak_rss_mb"] = _peak_rss_mb()
+        return ModelBundle(regressor, classifier, clustering, version or "streaming")
+
+    def _phase(self, name, start):
+        seconds = time.perf_counter() - start
+        self.stats.setdefault("phases", []).append({"phase": name, "seconds": seconds})
+        self.log(f"{name}: {seconds:.1f}s")
+        return seconds
+
+    def _fit_forests(self, regressor, classifier, clustering, chunk_sizes):
+        forest, cls = regressor.models["RandomForest"], classifier.model
+        forest_quota = _tree_quota(forest.n_estimators, len(chunk_sizes))
+        cls_quota = _tree_quota(cls.n_estimators, len(chunk_sizes))
+        forest.set_params(warm_start=True, n_estimators=0)
+        cls.set_params(warm_start=True, n_estimators=0)
+        owed, last = 0, None
+        classes = set(GROWTH_CATEGORIES)
+        for i, (df, validation) in enumerate(self.source):
+            train = df[~validation]
+            if len(train) == 0:
+                owed += cls_quota[i]
+                continue
+            clustering.partial_train(train)
+            X = feature_matrix(train, regressor.features)
+            if forest_quota[i]:
+                forest.set_params(n_estimators=forest.n_estimators + forest_quota[i])
+                forest.fit(X, train["profit"].to_numpy())
+            # Warm-started classifiers need every class in each fit; carry the quota until a chunk has them.
+            owed += cls_quota[i]
+            y = train["growth_category"].to_numpy()
+            if owed and classes <= set(y):
+                cls.set_params(n_estimators=cls.n_estimators + owed)
+                cls.fit(X, y)
+                owed = 0
+            last = (X, y)
+        if owed and last is not None:
+            cls.set_params(n_estimators=cls.n_estimators + owed)
+            cls.fit(*last)
+        clustering.finish_partial()
+        forest.set_params(warm_start=False)
+        cls.set_params(warm_start=False)
+        regressor.set_n_jobs(predict_n_jobs=regressor.predict_n_jobs)
+        cls.set_params(n_jobs=classifier.predict_n_jobs)
+
+    def _fit_xgboost(self, regressor):
+        model = regressor.models["XGBoost"]
+        params = {k: v for k, v in model.get_xgb_params().items() if v is not None}
+        params.setdefault("tree_method", "hist")
+        with tempfile.TemporaryDirectory(prefix="xgb-") as cache_dir:
+            data = xgb.ExtMemQuantileDMatrix(_XGBChunks(self.source, regressor.features, cache_dir))
+            booster = xgb.train(params, data, num_boost_round=model.n_estimators)
+            del data  # release the page cache before its directory goes away
+        # Hand the booster to the sklearn wrapper through its public (de)serialisation.
+        model.load_model(bytearray(booster.save_raw(raw_format="ubj")))
+        model.set_params(n_jobs=regressor.predict_n_jobs)
+        return model
+
+
+def quality_report(bundle, baseline, validation) -> pd.DataFrame:
+    """Validation metrics of the streamed bundle next to the in-memory baseline."""
+    y = validation["profit"].to_numpy()
+    labels = validation["growth_category"].to_numpy()
+    rows = []
+    for label, b in (("streaming", bundle), ("baseline", baseline)):
+        if b is None:
+            continue
+        X = feature_matrix(validation, b.regressor.features)
+        for name, model in b.regressor.trained_models.items():
+            predicted = model.predict(X)
+            rows.append({"model": name, "metric": "rmse", label: np.sqrt(mean_squared_error(y, predicted))})
+            rows.append({"model": name, "metric": "r2", label: r2_score(y, predicted)})
+        predicted = b.classifier.predict(validation)
+        rows.append({"model": "classifier", "metric": "f1_macro",
+                     label: f1_score(labels, predicted, average="macro")})
+        X_cluster = b.clustering.scaled(validation)
+        rows.append({"model": "clustering", "metric": "inertia_per_row",
+                     label: -b.clustering.model.score(X_cluster) / len(X_cluster)})
+    report = pd.DataFrame(rows).groupby(["model", "metric"], sort=False).first()
+    if "baseline" in report:
+        report["ratio"] = report["streaming"] / report["baseline"]
+    return report
+
+
+def _baseline(source, rows):
+    """In-memory bundle on the first ``rows`` training rows of ``source``."""
+    parts, have = [], 0
+    for df, validation in source:
+        parts.append(df[~validation])
+        have += len(parts[-1])
+        if have >= rows:
+            break
+    df = pd.concat(parts, ignore_index=True).iloc[:rows]
+    regressor, classifier, clustering = new_models(source.extra_features)
+    regressor.train(df)
+    classifier.train(df)
+    clustering.train(df)
+    return ModelBundle(regressor, classifier, clustering, "baseline")
+
+
+def streaming_key(source_id, digest, models):
+    """Artifact version for a streamed build: source, data and the (unfitted) model spec."""
+    spec = {"store_version": STORE_VERSION, "streaming": source_id, "data": digest, **model_spec(*models)}
+    payload = json.dumps(spec, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()[:16]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the models out of core from chunked data.")
+    parser.add_argument("input", nargs="?", help="CSV or Parquet training file.")
+    parser.add_argument("--sql", help="Table name or SELECT to stream instead of a file.")
+    parser.add_argument("--database-url", help="Database for --sql (default: DATABASE_URL via config).")
+    parser.add_argument("--chunksize", type=int, default=100_000)
+    parser.add_argument("--validation-rows", type=int, default=VALIDATION_ROWS)
+    parser.add_argument("--baseline-rows", type=int, default=200_000,
+                        help="Rows for the in-memory baseline in the quality report (0 to skip).")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--artifact-dir", default=str(ARTIFACT_DIR))
+    parser.add_argument("--save", action="store_true", help="Store the bundle under --artifact-dir.")
+    args = parser.parse_args(argv)
+    if bool(args.input) == bool(args.sql):
+        parser.error("pass either an input file or --sql")
+
+    log = lambda message: print(message, file=sys.stderr)  # noqa: E731
+    if args.sql:
+        if args.database_url:
+            from sqlalchemy import create_engine
+            engine = create_engine(args.database_url)
+        else:
+            from config import engine
+        source = ChunkSource(lambda: read_sql_chunks(engine, args.sql, args.chunksize), args.chunksize, args.seed)
+        source_id = f"sql:{engine.url.render_as_string(hide_password=True)}:{args.sql}"
+    else:
+        source = ChunkSource(lambda: read_chunks(args.input, args.chunksize), args.chunksize, args.seed)
+        source_id = f"file:{Path(args.input).name}"
+
+    trainer = StreamingTrainer(source, validation_rows=args.validation_rows, seed=args.seed, log=log)
+    bundle = trainer.fit()
+    stats = trainer.stats
+    print(f"Streamed {stats['rows']:,} training rows in {stats['chunks']} chunks of {args.chunksize:,} "
+          f"({stats['seconds']:.1f}s, peak RSS {stats['peak_rss_mb']:.0f} MB)")
+
+    baseline = None
+    if args.baseline_rows:
+        # The model classes print their own validation reports; keep stdout for ours.
+        with contextlib.redirect_stdout(sys.stderr):
+            baseline = _baseline(source, args.baseline_rows)
+    # Both bundles are scored on the same held-out rows, which neither was trained on.
+    with pd.option_context("display.width", 160, "display.max_columns", None):
+        print(quality_report(bundle, baseline, trainer.validation).round(4))
+
+    if args.save:
+        digest = file_digest(Path(args.input)) if args.input else str(stats["rows"])
+        bundle.version = streaming_key(source_id, digest, new_models(source.extra_features))
+        path = save_bundle(bundle, args.input or args.sql, args.artifact_dir)
+        print(f"Model version {bundle.version} stored in {path}; serve it with MODEL_VERSION={bundle.version}")
+
+
+if __name__ == "__main__":
+    # Re-import under the package name so pickled classes resolve to models.streaming.
+    from models.streaming import main
+    main()
@@ -0,0 +1,364 @@
+"""
+Cross-validated hyperparameter search for the growth models.
+
+Each target (the RandomForest and XGBoost regressors and the growth
+classifier) draws random candidates from ``SEARCH_SPACES``, always including
+the current defaults, and scores them with k-fold cross-validation. Successive
+halving first evaluates every candidate on a fraction of each training fold
+and promotes the best ``1 / eta`` to the next rung, ending on the full folds.
+
+Fold fits run in a process pool. Every finished fold is cached on disk under
+``<artifact dir>/tuning/<training data hash>/folds/``, so an interrupted or
+time-limited search resumes where it stopped. ``--budget`` bounds the whole
+search; when it runs out, the best candidate among the ones fully evaluated on
+the deepest rung reached wins. The winners are written to ``best.json`` in the
+same directory, and ``model_store`` trains (and keys) the next artifact with
+them.
+
+    python -m models.tuning --budget 600 --workers 8
+    python -m models.tuning --search random --candidates 30 --build
+"""
+import argparse
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.metrics import f1_score, mean_squared_error
+from sklearn.model_selection import KFold, StratifiedKFold
+
+from models.model_store import (
+    ARTIFACT_DIR, DEFAULT_CSV, STORE_VERSION, TUNED_FILE, file_digest, load_models, new_models,
+    training_extra_features, tuning_dir, tuning_estimator, tuning_result,
+)
+from utils.preprocessing import feature_matrix, preprocess_startup_data
+
+# Discrete grids; candidates are sampled from their product.
+SEARCH_SPACES = {
+    "RandomForest": {
+        "n_estimators": [100, 200, 400],
+        "max_depth": [None, 8, 16, 32],
+        "min_samples_leaf": [1, 2, 5, 10],
+        "max_features": [1.0, 0.5, "sqrt"],
+    },
+    "XGBoost": {
+        "n_estimators": [100, 200, 400, 800],
+        "learning_rate": [0.01, 0.03, 0.05, 0.1, 0.2],
+        "max_depth": [3, 4, 6, 8],
+        "min_child_weight": [1, 3, 5],
+        "subsample": [0.7, 0.85, 1.0],
+        "colsample_bytree": [0.7, 0.85, 1.0],
+    },
+    "classifier": {
+        "n_estimators": [100, 200, 400],
+        "max_depth": [None, 8, 16, 32],
+        "min_samples_leaf": [1, 2, 5],
+        "max_features": [1.0, 0.5, "sqrt"],
+        "class_weight": [None, "balanced"],
+    },
+}
+
+# Lower is better for both.
+METRICS = {"regression": "rmse", "classification": "1-f1_macro"}
+
+SEARCHES = ("halving", "random")
+
+
+def _kind(target):
+    return "classification" if target == "classifier" else "regression"
+
+
+def sample_candidates(target, n, seed=42, defaults=None):
+    """Up to ``n`` distinct parameter dicts for ``target``; ``defaults`` (if given) comes first."""
+    space = SEARCH_SPACES[target]
+    rng = np.random.default_rng(seed)
+    candidates = [dict(defaults)] if defaults else []
+    seen = {json.dumps(c, sort_keys=True) for c in candidates}
+    # The grids are small enough that a bounded number of draws finds every distinct point.
+    for _ in range(n * 20):
+        if len(candidates) >= n:
+            break
+        params = {name: values[rng.integers(len(values))] for name, values in space.items()}
+        params = {k: v.item() if isinstance(v, np.generic) else v for k, v in params.items()}
+        key = json.dumps(params, sort_keys=True)
+        if key not in seen:
+            seen.add(key)
+            candidates.append(params)
+    return candidates
+
+
+def rung_fractions(n_candidates, eta=3, search="halving"):
+    """Training-fold fraction per rung: e.g. 16 candidates, eta 3 -> [1/3, 1]."""
+    if search == "random" or n_candidates <= 1:
+        return [1.0]
+    rungs = max(1, int(math.log(n_candidates) / math.log(eta)))
+    return [float(eta) ** (r - rungs + 1) for r in range(rungs)]
+
+
+# --- Fold evaluation (runs in worker processes) ---
+_data = {}
+
+
+def _init_worker(X, targets):
+    _data["X"] = X
+    _data["y"] = targets
+
+
+def _folds(kind, y, folds, seed):
+    splitter = (StratifiedKFold if kind == "classification" else KFold)(
+        n_splits=folds, shuffle=True, random_state=seed
+    )
+    return list(splitter.split(np.zeros(len(y)), y))
+
+
+def evaluate_fold(task):
+    """Fit one candidate on one (possibly subsampled) training fold and score the held-out fold."""
+    kind = _kind(task["target"])
+    X, y = _data["X"], _data["y"][kind]
+    train_idx, test_idx = _folds(kind, y, task["folds"], task["seed"])[task["fold"]]
+    if task["fraction"] < 1:
+        rng = np.random.default_rng(task["seed"] + task["fold"])
+        keep = max(task["folds"], int(len(train_idx) * task["fraction"]))
+        train_idx = np.sort(rng.permutation(train_idx)[:keep])
+
+    estimator = clone(task["estimator"]).set_params(**task["params"])
+    if task["single_thread"] and "n_jobs" in estimator.get_params():
+        estimator.set_params(n_jobs=1)
+    start = time.perf_counter()
+    estimator.fit(X[train_idx], y[train_idx])
+    fit_s = time.perf_counter() - start
+
+    predicted = estimator.predict(X[test_idx])
+    if kind == "classification":
+        loss = 1 - f1_score(y[test_idx], predicted, average="macro")
+    else:
+        loss = np.sqrt(mean_squared_error(y[test_idx], predicted))
+    return {"loss": float(loss), "fit_s": fit_s, "train_rows": int(len(train_idx))}
+
+
+# --- Search ---
+class FoldCache:
+    """One JSON file per finished fold fit, keyed by everything that affects its score."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def key(task, features):
+        spec = {k: task[k] for k in ("target", "params", "fraction", "fold", "folds", "seed")}
+        spec.update(features=features, store_version=STORE_VERSION)
+        payload = json.dumps(spec, sort_keys=True, default=str).encode("utf-8")
+        return hashlib.sha256(payload).hexdigest()[:24]
+
+    def get(self, key):
+        path = self.path / f"{key}.json"
+        return json.loads(path.read_text()) if path.exists() else None
+
+    def put(self, key, result):
+        fd, tmp = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(result, f)
+        os.replace(tmp, self.path / f"{key}.json")
+
+
+class _Runner:
+    """Runs fold tasks in a process pool (or in-process), caching results and honouring a deadline."""
+
+    def __init__(self, X, targets, workers, deadline, cache, features):
+        self.deadline = deadline
+        self.cache = cache
+        self.features = features
+        self.pool = None
+        if workers > 1:
+            self.pool = multiprocessing.Pool(workers, initializer=_init_worker, initargs=(X, targets))
+        else:
+            _init_worker(X, targets)
+        self.fits = 0
+
+    def remaining(self):
+        return None if self.deadline is None else self.deadline - time.monotonic()
+
+    def expired(self):
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
+
+    def run(self, tasks):
+        """Results for ``tasks`` (None where the deadline passed first)."""
+        keys = [FoldCache.key(task, self.features) for task in tasks]
+        results = [self.cache.get(key) for key in keys]
+        todo = [i for i, result in enumerate(results) if result is None]
+        for task in tasks:
+            task["single_thread"] = self.pool is not None
+
+        if self.pool is None:
+            for i in todo:
+                if self.expired():
+                    break
+                results[i] = self._store(keys[i], evaluate_fold(tasks[i]))
+            return results
+
+        pending = {i: self.pool.apply_async(evaluate_fold, (tasks[i],)) for i in todo}
+        for i, async_result in pending.items():
+            remaining = self.remaining()
+            try:
+                result = async_result.get(None if remaining is None else max(remaining, 0))
+            except multiprocessing.TimeoutError:
+                break
+            results[i] = self._store(keys[i], result)
+        # Keep whatever else finished before giving up on the rest.
+        for i, async_result in pending.items():
+            if results[i] is None and async_result.ready() and async_result.successful():
+                results[i] = self._store(keys[i], async_result.get())
+        return results
+
+    def _store(self, key, result):
+        self.cache.put(key, result)
+        self.fits += 1
+        return result
+
+    def close(self):
+        if self.pool is not None:
+            # terminate, not close: fits still running past the deadline are abandoned.
+            self.pool.terminate()
+            self.pool.join()
+
+
+def search_target(runner, target, estimator, candidates, fractions, eta, folds, seed, log=print):
+    """
+    Successive halving over ``candidates`` for one target.
+
+    Returns the winner's summary, or None if the deadline passed before any
+    candidate completed a rung.
+    """
+    kind = _kind(target)
+    alive = candidates
+    best = None
+    for rung, fraction in enumerate(fractions):
+        tasks = [
+            {"target": target, "estimator": estimator, "params": params, "fraction": fraction,
+             "fold": fold, "folds": folds, "seed": seed}
+            for params in alive for fold in range(folds)
+        ]
+        results = runner.run(tasks)
+        scored = []
+        for c, params in enumerate(alive):
+            fold_results = results[c * folds:(c + 1) * folds]
+            if all(r is not None for r in fold_results):
+                losses = [r["loss"] for r in fold_results]
+                scored.append((float(np.mean(losses)), float(np.std(losses)), c, params))
+        if not scored:
+            break
+        scored.sort(key=lambda item: (item[0], item[2]))
+        loss, std, _, params = scored[0]
+        best = {
+            "params": params, "loss": loss, "loss_std": std, "metric": METRICS[kind],
+            "rung": rung, "fraction": fraction, "candidates_scored": len(scored),
+        }
+        log(f"{target}: rung {rung} ({fraction:.0%} of each fold) scored {len(scored)}/{len(alive)}, "
+            f"best {METRICS[kind]} {loss:.4g} with {params}")
+        if len(scored) < len(alive) or runner.expired():
+            break
+        alive = [params for *_, params in scored[:max(1, math.ceil(len(scored) / eta))]]
+    return best
+
+
+def tune(csv_path=DEFAULT_CSV, artifact_dir=ARTIFACT_DIR, targets=tuple(SEARCH_SPACES), search="halving",
+         n_candidates=16, eta=3, folds=5, budget_s=None, workers=None, seed=42, log=print):
+    """
+    Search hyperparameters for ``targets`` on ``csv_path`` and write ``best.json``.
+
+    Returns the written result. Targets with no completed candidate keep
+    their previous tuned (or default) parameters.
+    """
+    if search not in SEARCHES:
+        raise ValueError(f"Unknown search {search!r}; use one of {SEARCHES}")
+    start = time.monotonic()
+    deadline = start + budget_s if budget_s else None
+    workers = workers or os.cpu_count() or 1
+
+    df = preprocess_startup_data(pd.read_csv(csv_path))
+    extra = training_extra_features(csv_path)
+    previous = (tuning_result(csv_path, artifact_dir) or {}).get("targets", {})
+    regressor, classifier, _ = new_models(extra)
+    X = feature_matrix(df, regressor.features)
+    y = {"regression": df["profit"].to_numpy(), "classification": df["growth_category"].to_numpy()}
+
+    directory = tuning_dir(csv_path, artifact_dir)
+    cache = FoldCache(directory / "folds")
+    runner = _Runner(X, y, workers, deadline, cache, regressor.features)
+    fractions = rung_fractions(n_candidates, eta, search)
+    winners = {}
+    try:
+        for i, target in enumerate(targets):
+            estimator = tuning_estimator(regressor, classifier, target)
+            defaults = {name: estimator.get_params()[name] for name in SEARCH_SPACES[target]}
+            candidates = sample_candidates(target, n_candidates, seed + i, defaults)
+            best = search_target(runner, target, estimator, candidates, fractions, eta, folds, seed, log)
+            # A winner from a subsampled rung doesn't displace one scored on full folds.
+            if best is not None and (best["fraction"] == 1 or target not in previous):
+                winners[target] = best
+            if runner.expired():
+                log("Time budget exhausted.")
+                break
+    finally:
+        runner.close()
+
+    # Earlier winners for targets this run didn't reach stay in effect.
+    kept = {t: r for t, r in previous.items() if t not in winners}
+    result = {
+        "store_version": STORE_VERSION,
+        "data": file_digest(Path(csv_path)),
+        "search": search,
+        "folds": folds,
+        "seed": seed,
+        "complete": not runner.expired() and set(winners) >= set(targets),
+        "elapsed_s": round(time.monotonic() - start, 1),
+        "fits": runner.fits,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "targets": {**kept, **winners},
+    }
+    (directory / TUNED_FILE).write_text(json.dumps(result, indent=2))
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cross-validated hyperparameter search for the growth models.")
+    parser.add_argument("--csv", default=str(DEFAULT_CSV), help="Training data CSV.")
+    parser.add_argument("--artifact-dir", default=str(ARTIFACT_DIR))
+    parser.add_argument("--targets", nargs="+", choices=list(SEARCH_SPACES), default=list(SEARCH_SPACES))
+    parser.add_argument("--search", choices=SEARCHES, default="halving")
+    parser.add_argument("--candidates", type=int, default=16, help="Candidates sampled per target.")
+    parser.add_argument("--eta", type=int, default=3, help="Halving rate: keep 1/eta per rung.")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--budget", type=float, help="Seconds for the whole search.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--build", action="store_true", help="Train and store the tuned artifact afterwards.")
+    args = parser.parse_args(argv)
+
+    result = tune(args.csv, args.artifact_dir, args.targets, args.search, args.candidates, args.eta,
+                  args.folds, args.budget, args.workers, args.seed,
+                  log=lambda message: print(message, file=sys.stderr))
+    print(f"{'Search complete' if result['complete'] else 'Search stopped early'} after "
+          f"{result['elapsed_s']}s, {result['fits']} new fold fits")
+    for target, best in result["targets"].items():
+        print(f"{target}: {best['params']}  CV {best['metric']} {best['loss']:.4g} ± {best['loss_std']:.2g}")
+
+    if args.build:
+        bundle = load_models(args.csv, args.artifact_dir)
+        print(f"Model version {bundle.version} ready ({Path(args.artifact_dir) / bundle.version})")
+
+
+if __name__ == "__main__":
+    # Re-import under the package name so pickled tasks resolve to models.tuning.
+    from models.tuning import main
+    main()
@@ -0,0 +1,163 @@
+"""
+Headless batch scoring for deal-flow exports.
+
+Streams a CSV or Parquet file in chunks through preprocessing, the growth
+regressor, the growth classifier, cluster assignment and the strategy engine,
+and appends each scored chunk to the output as soon as it is ready. At most
+``2 * workers`` chunks are in memory at once.
+
+    python backend/score.py deals.csv -o scored.csv --chunksize 50000 --workers 4
+    python backend/score.py deals.parquet -o scored.parquet --top 100 --top-output top.csv
+"""
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+from models.model_store import ARTIFACT_DIR, DEFAULT_CSV, load_models
+from models.streaming import read_chunks
+from utils.preprocessing import preprocess_startup_data
+from utils.strategy_engine import generate_strategy
+
+OUTPUT_COLUMNS = [
+    "name", "industry", "stage", "revenue", "costs", "profit", "profit_margin",
+    "marketing_efficiency", "ltv_cac_ratio", "runway_months", "churn_rate",
+    "predicted_growth", "growth_category", "cluster", "recommendations",
+]
+
+
+def score_chunk(df: pd.DataFrame, models) -> pd.DataFrame:
+    """Score one chunk of raw startup rows and return the output columns."""
+    df = preprocess_startup_data(df)
+    df = models.score(df)
+    df = generate_strategy(df)
+    df["recommendations"] = df["recommendations"].map("; ".join)
+
+    return df[[c for c in ["id"] + OUTPUT_COLUMNS if c in df.columns]]
+
+
+class ChunkWriter:
+    """Append scored chunks to a CSV or Parquet file."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.parquet = self.path.suffix.lower() in (".parquet", ".pq")
+        self._writer = None
+        self._wrote_header = False
+
+    def write(self, df):
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table)
+        else:
+            df.to_csv(self.path, mode="a" if self._wrote_header else "w",
+                      header=not self._wrote_header, index=False)
+            self._wrote_header = True
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+# --- Worker processes ---
+_worker_models = None
+
+
+def _init_worker(csv_path, artifact_dir):
+    global _worker_models
+    _worker_models = load_models(csv_path, artifact_dir)
+
+
+def _score_in_worker(df):
+    return score_chunk(df, _worker_models)
+
+
+def score_file(input_path, output_path=None, chunksize=50_000, workers=1, top=None,
+               csv_path=DEFAULT_CSV, artifact_dir=ARTIFACT_DIR, progress=True):
+    """
+    Score ``input_path`` chunk by chunk.
+
+    Writes every scored row to ``output_path`` (if given) and returns
+    ``(rows, seconds, top_frame)`` where ``top_frame`` holds the ``top`` rows
+    by predicted growth (or None).
+    """
+    # Build/load artifacts once in the parent so workers only read them from disk.
+    models = load_models(csv_path, artifact_dir)
+    writer = ChunkWriter(output_path) if output_path else None
+    best = None
+    rows = 0
+    start = time.perf_counter()
+
+    def collect(scored):
+        nonlocal best, rows
+        rows += len(scored)
+        if writer:
+            writer.write(scored)
+        if top:
+            best = scored if best is None else pd.concat([best, scored], ignore_index=True)
+            best = best.nlargest(top, "predicted_growth")
+        if progress:
+            elapsed = time.perf_counter() - start
+            print(f"\r{rows:,} rows scored, {rows / elapsed:,.0f} rows/s", end="", file=sys.stderr)
+
+    try:
+        if workers <= 1:
+            for chunk in read_chunks(input_path, chunksize):
+                collect(score_chunk(chunk, models))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(str(csv_path), str(artifact_dir))) as pool:
+                pending = deque()
+                for chunk in read_chunks(input_path, chunksize):
+                    pending.append(pool.submit(_score_in_worker, chunk))
+                    # Keep output in input order and bound the chunks held in memory.
+                    while len(pending) >= 2 * workers:
+                        collect(pending.popleft().result())
+                while pending:
+                    collect(pending.popleft().result())
+    finally:
+        if writer:
+            writer.close()
+
+    elapsed = time.perf_counter() - start
+    if progress:
+        print(file=sys.stderr)
+    return rows, elapsed, best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch-score startups from a CSV or Parquet export.")
+    parser.add_argument("input", help="CSV or Parquet file with startup rows.")
+    parser.add_argument("-o", "--output", help="Where to write all scored rows (.csv or .parquet).")
+    parser.add_argument("--chunksize", type=int, default=50_000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--top", type=int, help="Also print/write the N startups with the highest predicted growth.")
+    parser.add_argument("--top-output", help="Write the --top rows to this CSV instead of printing them.")
+    parser.add_argument("--quiet", action="store_true", help="Don't report progress.")
+    args = parser.parse_args(argv)
+
+    if not args.output and not args.top:
+        parser.error("nothing to do: pass --output and/or --top")
+
+    rows, elapsed, best = score_file(args.input, args.output, args.chunksize, args.workers,
+                                     top=args.top, progress=not args.quiet)
+    print(f"Scored {rows:,} rows in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):,.0f} rows/s)", file=sys.stderr)
+
+    if best is not None:
+        if args.top_output:
+            best.to_csv(args.top_output, index=False)
+        else:
+            print(best.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,416 @@
+"""
+Headless JSON scoring service (ASGI) alongside the Streamlit UI.
+
+Run from ``backend/``:
+
+    uvicorn service:app --port 8080
+    python service.py serve --port 8080
+    python service.py bench --concurrency 64 --requests 2000   # in-process, no network
+
+Bodies are startup records with the form's fields (as in ``startup_info``):
+
+    POST /score                 {startup}       -> scores and engineered features
+    POST /score/batch           [{startup}, ..] -> {"results": [...]}
+    POST /strategy              {startup}       -> scores + recommendations
+    POST /summary?style=founder {startup}       -> {"summary": "..."}
+    POST /similar?k=10          {startup}       -> nearest portfolio startups (needs DATABASE_URL)
+    GET  /health
+    GET  /metrics                               -> stage timings, Prometheus text format
+
+Concurrent single-row requests are micro-batched: a request waits at most
+``max_wait_ms`` for others to arrive, and up to ``max_batch`` rows are
+preprocessed and scored together by the bundle's ``GrowthPredictor``,
+``GrowthClassifier`` and ``StartupClustering`` in one vectorized call each,
+followed by ``generate_strategy``. Scoring runs in a worker thread so the
+event loop keeps accepting requests while a batch is computed.
+
+With ``METRICS_ENABLED=1`` every request and the pipeline stages under it
+(preprocessing, each model's ``predict``, strategies) are timed into
+``utils.metrics``, which ``/metrics`` exposes for Prometheus to scrape.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+import time
+from urllib.parse import parse_qs
+
+import numpy as np
+import pandas as pd
+
+from models.model_store import load_models
+from score import OUTPUT_COLUMNS
+from utils import metrics
+from utils.nlp_summarizer import STYLES, summarize_insights
+from utils.preprocessing import preprocess_startup_data
+from utils.strategy_engine import generate_strategy
+
+MAX_BATCH = int(os.getenv("SERVICE_MAX_BATCH", 256))
+MAX_WAIT_MS = float(os.getenv("SERVICE_MAX_WAIT_MS", 2))
+MAX_BODY_BYTES = 10 << 20
+
+SCORE_FIELDS = [c for c in OUTPUT_COLUMNS if c != "recommendations"]
+# Numeric fields default to 0 in preprocessing; these have no default.
+REQUIRED_FIELDS = ("name", "industry")
+
+
+class PrometheusText(str):
+    """Handler result sent as-is, in the Prometheus text format, instead of as JSON."""
+    content_type = b"text/plain; version=0.0.4; charset=utf-8"
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _plain(value):
+    """JSON-safe Python value (NumPy scalars unwrapped, NaN/inf as null)."""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [_plain(v) for v in value]
+    return value
+
+
+def score_rows(models, records):
+    """Score raw startup records in one vectorized pass; returns one scored dict per record."""
+    df = generate_strategy(models.score(preprocess_startup_data(pd.DataFrame.from_records(records))))
+    return df.to_dict(orient="records")
+
+
+class MicroBatcher:
+    """Collects concurrent single-row requests and scores them together."""
+
+    def __init__(self, score_fn, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS):
+        self.score_fn = score_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.batches = 0
+        self.rows = 0
+        self._loop = None
+        self._queue = None
+        self._task = None
+
+    async def submit(self, record):
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._loop is not loop:
+            # Bound to the running loop on first use (again if a new loop calls, e.g. the test client).
+            self._loop, self._queue = loop, asyncio.Queue()
+            self._task = loop.create_task(self._run())
+        future = loop.create_future()
+        await self._queue.put((record, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0 and self._queue.empty():
+                    break
+                try:
+                    batch.append(self._queue.get_nowait() if timeout <= 0 else
+                                 await asyncio.wait_for(self._queue.get(), timeout))
+                except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                    break
+            records = [record for record, _ in batch]
+            try:
+                results = await loop.run_in_executor(None, self.score_fn, records)
+            except Exception as exc:  # fail this batch's requests, keep serving
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+                continue
+            self.batches += 1
+            self.rows += len(batch)
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self):
+        return {"batches": self.batches, "rows": self.rows,
+                "mean_batch": self.rows / self.batches if self.batches else 0.0}
+
+
+class ScoringService:
+    """The ASGI application. Models (and the database, for ``/similar``) are loaded on first use."""
+
+    def __init__(self, models=None, engine=None, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS):
+        self._models = models
+        self._engine = engine
+        self.batcher = MicroBatcher(self._score, max_batch, max_wait_ms)
+        self.routes = {
+            ("GET", "/health"): self.health,
+            ("GET", "/metrics"): self.metrics_text,
+            ("POST", "/score"): self.score,
+            ("POST", "/score/batch"): self.score_batch,
+            ("POST", "/strategy"): self.strategy,
+            ("POST", "/summary"): self.summary,
+            ("POST", "/similar"): self.similar,
+        }
+
+    @property
+    def models(self):
+        if self._models is None:
+            self._models = load_models()
+        return self._models
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            if not os.getenv("DATABASE_URL"):
+                raise HTTPError(503, "/similar needs DATABASE_URL")
+            from config import engine
+            self._engine = engine
+        return self._engine
+
+    def _score(self, records):
+        return score_rows(self.models, records)
+
+    # --- Handlers: (body, query) -> JSON-able result ---
+    async def health(self, body, query):
+        return {"status": "ok", "model_version": self.models.version, "batching": self.batcher.stats()}
+
+    async def metrics_text(self, body, query):
+        return PrometheusText(metrics.prometheus_text())
+
+    async def score(self, body, query):
+        row = await self.batcher.submit(_startup(body))
+        return {field: _plain(row.get(field)) for field in SCORE_FIELDS}
+
+    async def score_batch(self, body, query):
+        if not isinstance(body, list):
+            raise HTTPError(400, "expected a JSON array of startup objects")
+        if not body:
+            return {"results": []}
+        body = [_startup(record) for record in body]
+        rows = await asyncio.get_running_loop().run_in_executor(None, self._score, body)
+        return {"results": [{field: _plain(row.get(field)) for field in OUTPUT_COLUMNS} for row in rows]}
+
+    async def strategy(self, body, query):
+        row = await self.batcher.submit(_startup(body))
+        return {field: _plain(row.get(field)) for field in OUTPUT_COLUMNS}
+
+    async def summary(self, body, query):
+        style = query.get("style", "founder")
+        if style not in STYLES:
+            raise HTTPError(400, f"unknown style {style!r}; one of {sorted(STYLES)}")
+        row = await self.batcher.submit(_startup(body))
+        return {"name": _plain(row.get("name")), "style": style,
+                "summary": summarize_insights(row.get("name"), row, style)}
+
+    async def similar(self, body, query):
+        startup = _startup(body)
+        try:
+            k = int(query.get("k", 10))
+        except ValueError:
+            raise HTTPError(400, "k must be an integer") from None
+        engine = self.engine
+        row = await self.batcher.submit(startup)
+
+        def lookup():
+            from utils.portfolio import get_portfolio
+            portfolio = get_portfolio(engine, self.models)
+            portfolio.score_missing()
+            return portfolio.similar(pd.DataFrame([row]), k)
+
+        df = await asyncio.get_running_loop().run_in_executor(None, lookup)
+        return {"results": [{key: _plain(value) for key, value in r.items()}
+                            for r in df.to_dict(orient="records")]}
+
+    # --- ASGI ---
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    await self.batcher.close()
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+        if scope["type"] != "http":
+            return
+
+        try:
+            handler = self.routes.get((scope["method"], scope["path"].rstrip("/") or "/"))
+            if handler is None:
+                known = any(path == scope["path"] for _, path in self.routes)
+                raise HTTPError(405 if known else 404, "method not allowed" if known else "not found")
+            body = await _read_json(receive) if scope["method"] == "POST" else None
+            query = {k: v[-1] for k, v in parse_qs(scope.get("query_string", b"").decode()).items()}
+            with metrics.span(f"service.{handler.__name__}"):
+                status, payload = 200, await handler(body, query)
+        except HTTPError as exc:
+            status, payload = exc.status, {"error": exc.message}
+        except Exception as exc:  # surfaced as a 500 with the reason, never kills the server
+            status, payload = 500, {"error": f"{type(exc).__name__}: {exc}"}
+
+        if isinstance(payload, PrometheusText):
+            data, content_type = payload.encode(), payload.content_type
+        else:
+            data, content_type = json.dumps(payload, allow_nan=False).encode(), b"application/json"
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(b"content-type", content_type),
+                                (b"content-length", str(len(data)).encode())]})
+        await send({"type": "http.response.body", "body": data})
+
+
+def _startup(body):
+    if not isinstance(body, dict):
+        raise HTTPError(400, "expected a JSON object with the startup's fields")
+    missing = [field for field in REQUIRED_FIELDS if field not in body]
+    if missing:
+        # Checked up front so one bad request can't fail the batch it would join.
+        raise HTTPError(400, f"missing fields: {', '.join(missing)}")
+    return body
+
+
+async def _read_json(receive):
+    chunks, size = [], 0
+    while True:
+        message = await receive()
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > MAX_BODY_BYTES:
+            raise HTTPError(413, "request body too large")
+        chunks.append(chunk)
+        if not message.get("more_body"):
+            break
+    try:
+        return json.loads(b"".join(chunks) or b"null")
+    except json.JSONDecodeError as exc:
+        raise HTTPError(400, f"invalid JSON: {exc}") from None
+
+
+class TestClient:
+    """Calls an ASGI app in-process (no sockets), for tests and the throughput benchmark."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def request(self, method, path, body=None):
+        """Returns ``(status, decoded JSON)``; non-JSON responses are returned as text."""
+        path, _, query = path.partition("?")
+        data = json.dumps(body).encode() if body is not None else b""
+        scope = {"type": "http", "method": method, "path": path, "query_string": query.encode(),
+                 "headers": [(b"content-type", b"application/json")]}
+        sent = False
+        response = {}
+
+        async def receive():
+            nonlocal sent
+            if sent:
+                return {"type": "http.disconnect"}
+            sent = True
+            return {"type": "http.request", "body": data, "more_body": False}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["json"] = dict(message["headers"]).get(b"content-type") == b"application/json"
+            elif message["type"] == "http.response.body":
+                response["body"] = response.get("body", b"") + message.get("body", b"")
+
+        await self.app(scope, receive, send)
+        if not response["json"]:
+            return response["status"], response["body"].decode()
+        return response["status"], json.loads(response["body"])
+
+    def get(self, path):
+        return asyncio.run(self.request("GET", path))
+
+    def post(self, path, body):
+        return asyncio.run(self.request("POST", path, body))
+
+
+# Module-level app for ``uvicorn service:app``.
+app = ScoringService()
+
+
+def _bench_run(service, records, concurrency):
+    async def run():
+        client = TestClient(service)
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = []
+
+        async def one(record):
+            async with semaphore:
+                start = time.perf_counter()
+                status, body = await client.request("POST", "/score", record)
+                latencies.append(time.perf_counter() - start)
+                if status != 200:
+                    raise RuntimeError(body)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(r) for r in records))
+        elapsed = time.perf_counter() - start
+        await service.batcher.close()
+        return elapsed, np.asarray(latencies) * 1000
+
+    return asyncio.run(run())
+
+
+def bench(requests, concurrency, max_wait_ms):
+    from benchmarks.synthetic import make_startups
+
+    models = load_models()
+    records = make_startups(requests, seed=3).drop(columns=["id"]).to_dict(orient="records")
+    print(f"{requests:,} /score requests, {concurrency} concurrent, in-process client")
+    for label, max_batch in (("micro-batched", MAX_BATCH), ("one row per call", 1)):
+        service = ScoringService(models, max_batch=max_batch, max_wait_ms=max_wait_ms)
+        elapsed, ms = _bench_run(service, records, concurrency)
+        stats = service.batcher.stats()
+        print(f"  {label:>16}: {requests / elapsed:8,.0f} req/s, p50 {np.percentile(ms, 50):7.1f} ms, "
+              f"p99 {np.percentile(ms, 99):7.1f} ms, mean batch {stats['mean_batch']:.1f}")
+
+    service = ScoringService(models)
+    client = TestClient(service)
+    start = time.perf_counter()
+    status, body = client.post("/score/batch", records)
+    elapsed = time.perf_counter() - start
+    print(f"  {'/score/batch':>16}: {requests / elapsed:8,.0f} rows/s (one request, status {status})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless JSON scoring service.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve = sub.add_parser("serve", help="Run with uvicorn.")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8080)
+    run = sub.add_parser("bench", help="Throughput under concurrency, in-process.")
+    run.add_argument("--requests", type=int, default=2000)
+    run.add_argument("--concurrency", type=int, default=64)
+    run.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS)
+    args = parser.parse_args(argv)
+
+    if args.command == "bench":
+        bench(args.requests, args.concurrency, args.max_wait_ms)
+        return
+    try:
+        import uvicorn
+    except ImportError:
+        sys.exit("serving needs uvicorn: pip install uvicorn")
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
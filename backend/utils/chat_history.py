@@ -0,0 +1,128 @@
+"""
+Conversation-history compaction for Ask Gemini.
+
+The last ``keep_last`` turns are sent verbatim; older turns are folded into a
+rolling summary of one short line per turn. If the prompt still exceeds the
+token budget, the oldest verbatim turns are folded too, and then the oldest
+summary lines are dropped. Token counts are a local estimate, not the
+Gemini tokenizer.
+"""
+import re
+import time
+from collections import OrderedDict, deque
+from dataclasses import asdict, dataclass
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s")
+
+
+def estimate_tokens(text):
+    """Rough token count: ~4 characters per word piece, punctuation counts as one."""
+    return sum((len(piece) + 3) // 4 for piece in _TOKEN_RE.findall(text))
+
+
+def _shorten(text, limit):
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[: limit - 1].rstrip() + "…"
+
+
+def summarize_turn(turn, question_chars=80, answer_chars=160):
+    """One-line digest of a ``{question, answer}`` turn: the question and the answer's first sentence."""
+    first_sentence = _SENTENCE_END_RE.split(turn["answer"].strip(), maxsplit=1)[0]
+    return f"- Q: {_shorten(turn['question'], question_chars)} A: {_shorten(first_sentence, answer_chars)}"
+
+
+@dataclass
+class PromptMetrics:
+    context_tokens: int
+    summary_tokens: int
+    history_tokens: int
+    question_tokens: int
+    total_tokens: int
+    prompt_chars: int
+    verbatim_turns: int
+    summarized_turns: int
+    dropped_turns: int
+    build_ms: float
+
+    def as_dict(self):
+        return asdict(self)
+
+
+class HistoryManager:
+    def __init__(self, keep_last=4, token_budget=4000, cache_size=1024, metrics_size=100):
+        self.keep_last = keep_last
+        self.token_budget = token_budget
+        self._line_cache = OrderedDict()
+        self._cache_size = cache_size
+        # Recent prompts from every session, for aggregate stats; compose() returns each call's own.
+        self.metrics = deque(maxlen=metrics_size)
+
+    def _summary_line(self, turn):
+        # Summary lines are cached so the rolling summary only does work for newly folded turns.
+        key = (turn["question"], turn["answer"])
+        entry = self._line_cache.get(key)
+        if entry is None:
+            line = summarize_turn(turn)
+            entry = self._line_cache[key] = (line, estimate_tokens(line))
+            if len(self._line_cache) > self._cache_size:
+                self._line_cache.popitem(last=False)
+        return entry
+
+    def compose(self, context, question, history):
+        """Return ``(prompt, PromptMetrics)`` for ``context`` + compacted ``history`` + ``question``."""
+        start = time.perf_counter()
+        history = list(history)
+
+        context_tokens = estimate_tokens(context)
+        question_text = f"User: {question}\nAI:"
+        question_tokens = estimate_tokens(question_text)
+
+        n_folded = max(0, len(history) - self.keep_last)
+        verbatim = [f"User: {h['question']}\nAI: {h['answer']}" for h in history[n_folded:]]
+        verbatim_tokens = [estimate_tokens(text) for text in verbatim]
+        available = self.token_budget - context_tokens - question_tokens
+
+        # Fold the oldest verbatim turns until the kept ones fit the budget.
+        kept_tokens = sum(verbatim_tokens)
+        while verbatim and kept_tokens > available:
+            kept_tokens -= verbatim_tokens.pop(0)
+            verbatim.pop(0)
+            n_folded += 1
+
+        # Keep the newest summary lines that fit in what's left.
+        lines = [self._summary_line(h) for h in history[:n_folded]]
+        remaining = available - kept_tokens
+        summary, summary_tokens = [], 0
+        for line, tokens in reversed(lines):
+            if summary_tokens + tokens > remaining:
+                break
+            summary.append(line)
+            summary_tokens += tokens
+        summary.reverse()
+        dropped = len(lines) - len(summary)
+
+        messages = [context]
+        if summary or dropped:
+            header = "Summary of earlier conversation"
+            if dropped:
+                header += f" ({dropped} older turns omitted)"
+            messages.append(header + ":\n" + "\n".join(summary))
+        messages.extend(verbatim)
+        messages.append(question_text)
+        prompt = "\n".join(messages)
+
+        metrics = PromptMetrics(
+            context_tokens=context_tokens,
+            summary_tokens=summary_tokens,
+            history_tokens=kept_tokens,
+            question_tokens=question_tokens,
+            total_tokens=context_tokens + summary_tokens + kept_tokens + question_tokens,
+            prompt_chars=len(prompt),
+            verbatim_turns=len(history) - n_folded,
+            summarized_turns=len(summary),
+            dropped_turns=dropped,
+            build_ms=(time.perf_counter() - start) * 1000,
+        )
+        self.metrics.append(metrics)
+        return prompt, metrics
@@ -0,0 +1,159 @@
+"""
+Server-side aggregates for the dashboard charts.
+
+Sending every filtered startup to Plotly stops working somewhere past 100k
+points. The box plot gets per-group quantiles computed here instead of raw
+values. The scatters get a density-aware sample of at most
+``DASHBOARD_MAX_POINTS`` points: rows are binned on a grid per growth
+category and every bin is capped at the same count. Sparse regions and
+outliers are kept whole and only the dense core is thinned. The user's own
+startup is never part of the sample; the dashboard overlays it afterwards,
+so it is always drawn.
+
+Aggregates are cached per filter combination and invalidated by
+``ScoredPortfolio.data_version`` (new rows, new scores or rescoring).
+"""
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from utils.metrics import timed
+
+MAX_POINTS = int(os.getenv("DASHBOARD_MAX_POINTS", "5000"))
+GRID_BINS = 64
+CACHE_SIZE = 32
+
+# (x, y) of each dashboard scatter; all are coloured by growth_category.
+SCATTERS = {
+    "growth_vs_revenue": ("revenue", "predicted_growth"),
+    "efficiency_vs_growth": ("marketing_efficiency", "predicted_growth"),
+    "margin_vs_runway": ("profit_margin", "runway_months"),
+}
+BOX_GROUPS = ["industry", "growth_category"]
+BOX_VALUE = "churn_rate"
+BOX_STATS = ["count", "lowerfence", "q1", "median", "q3", "upperfence", "mean"]
+
+
+def _bin_codes(values, bins):
+    """Equal-width bin index per value (non-finite values share the last bin)."""
+    finite = np.isfinite(values)
+    if not finite.any():
+        return np.zeros(len(values), dtype=np.int64)
+    lo, hi = values[finite].min(), values[finite].max()
+    width = (hi - lo) / bins if hi > lo else 1.0
+    codes = np.clip(((values - lo) / width), 0, bins - 1)
+    return np.where(finite, codes, bins).astype(np.int64)
+
+
+def _bin_cap(counts, budget):
+    """Largest per-bin cap whose total stays within ``budget`` (0 if there are more bins than that)."""
+    lo, hi = 0, int(counts.max())
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if np.minimum(counts, mid).sum() <= budget:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def density_sample(df, x, y, color="growth_category", max_points=MAX_POINTS, bins=GRID_BINS, seed=0):
+    """
+    At most ``max_points`` rows of ``df``, thinned where the ``x``/``y`` scatter
+    is dense. Deterministic for a given ``seed``; row order is preserved.
+
+    When more grid cells are occupied than ``max_points``, the grid is
+    coarsened until they fit; on the coarsest grid a random subset of cells
+    keeps one row each.
+    """
+    if len(df) <= max_points:
+        return df
+    x_values = df[x].to_numpy(dtype=np.float64)
+    y_values = df[y].to_numpy(dtype=np.float64)
+    colors = pd.factorize(df[color])[0] if color in df.columns else np.zeros(len(df), dtype=np.int64)
+    while True:
+        xs, ys = _bin_codes(x_values, bins), _bin_codes(y_values, bins)
+        cell = (colors * (bins + 1) + xs) * (bins + 1) + ys
+        _, cell, counts = np.unique(cell, return_inverse=True, return_counts=True)
+        if len(counts) <= max_points or bins == 1:
+            break
+        bins //= 2
+
+    rng = np.random.default_rng(seed)
+    cap = _bin_cap(counts, max_points)
+    # Random rank of each row within its cell; keep the first ``cap`` of every cell.
+    order = np.lexsort((rng.random(len(df)), cell))
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    rank = np.empty(len(df), dtype=np.int64)
+    rank[order] = np.arange(len(df)) - starts[cell[order]]
+    if cap == 0:
+        return df[(rank == 0) & np.isin(cell, rng.choice(len(counts), max_points, replace=False))]
+    return df[rank < cap]
+
+
+def box_stats(df, groups=BOX_GROUPS, value=BOX_VALUE) -> pd.DataFrame:
+    """
+    Box-plot statistics per group, matching Plotly's defaults: linear
+    quartiles, and whiskers at the most extreme values within 1.5 IQR.
+    """
+    if df.empty:
+        return pd.DataFrame(columns=[*groups, *BOX_STATS])
+    data = df[[*groups, value]].dropna(subset=[value])
+    grouped = data.groupby(groups, observed=True, sort=True)[value]
+    stats = grouped.agg(["count", "mean"])
+    quartiles = grouped.quantile([0.25, 0.5, 0.75]).unstack()
+    stats["q1"], stats["median"], stats["q3"] = quartiles[0.25], quartiles[0.5], quartiles[0.75]
+
+    iqr = stats["q3"] - stats["q1"]
+    limits = pd.DataFrame({"low": stats["q1"] - 1.5 * iqr, "high": stats["q3"] + 1.5 * iqr})
+    bounded = data.join(limits, on=groups)
+    values = bounded[value]
+    stats["lowerfence"] = values.where(values >= bounded["low"]).groupby(
+        [bounded[g] for g in groups], observed=True).min()
+    stats["upperfence"] = values.where(values <= bounded["high"]).groupby(
+        [bounded[g] for g in groups], observed=True).max()
+    return stats.reset_index()[[*groups, *BOX_STATS]]
+
+
+@timed("dashboard.aggregate")
+def aggregate(df, max_points=MAX_POINTS) -> dict:
+    """Everything the portfolio charts need from the filtered frame ``df``."""
+    columns = ["name", "growth_category"]
+    return {
+        "rows": len(df),
+        "scatters": {
+            key: density_sample(df[[*columns, x, y]], x, y, max_points=max_points)
+            for key, (x, y) in SCATTERS.items()
+        },
+        "box": box_stats(df),
+    }
+
+
+# --- Process-wide cache, keyed by portfolio, filters and data version ---
+_aggregates = OrderedDict()
+_aggregates_lock = threading.Lock()
+
+
+def _filter_key(filters):
+    return tuple(sorted((name, tuple(sorted(map(str, values or ())))) for name, values in filters.items()))
+
+
+def get_aggregates(portfolio, columns=None, **filters) -> dict:
+    """
+    Cached ``aggregate`` of ``portfolio.query(**filters)``. Only a cheap
+    version check hits the database while the portfolio is unchanged.
+    """
+    key = (id(portfolio), _filter_key(filters), portfolio.data_version())
+    with _aggregates_lock:
+        if key in _aggregates:
+            _aggregates.move_to_end(key)
+            return _aggregates[key]
+    result = aggregate(portfolio.query(columns=columns, **filters))
+    with _aggregates_lock:
+        _aggregates[key] = result
+        while len(_aggregates) > CACHE_SIZE:
+            _aggregates.popitem(last=False)
+    return result
@@ -1,7 +1,282 @@
+"""
+Data-access helpers for the startup tables.
+
+The table definitions mirror ``db/init.sql`` so the same code runs against
+Postgres or a local SQLite stand-in (``create_schema``). Bulk ingest uses
+COPY on Postgres and batched ``executemany`` everywhere else.
+
+    python -m utils.db_utils create-schema           # SQLite stand-in
+    python -m utils.db_utils upgrade-schema          # existing database, after pulling schema changes
+    python -m utils.db_utils import historical.csv --batch-size 10000
+"""
+import argparse
+import csv
+import io
+import sys
+import time
+from pathlib import Path
+
 import pandas as pd
-from config import engine
+from sqlalchemy import (
+    Column, Date, DateTime, Float, ForeignKey, Index, Integer, MetaData, String, Table,
+    and_, func, select,
+)
+
+metadata = MetaData()
+
+UPGRADE_SQL = Path(__file__).resolve().parents[2] / "db" / "upgrade.sql"
+
+startup_info = Table(
+    "startup_info", metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("name", String(100), nullable=False),
+    Column("industry", String(50)),
+    Column("stage", String(50)),
+    # Financial
+    Column("revenue", Float),
+    Column("costs", Float),
+    Column("marketing_spend", Float),
+    Column("profit", Float),
+    Column("profit_margin", Float),
+    Column("burn_rate", Float),
+    Column("gross_margin", Float),
+    Column("cac", Float),
+    Column("ltv", Float),
+    Column("cash_flow", Float),
+    Column("cash_reserves", Float),
+    Column("monthly_growth_rate", Float),
+    Column("market_share", Float),
+    # Operational
+    Column("churn_rate", Float),
+    Column("retention_rate", Float),
+    Column("employee_count", Integer),
+    Column("productivity", Float),
+    Column("product_launches", Integer),
+    Column("nps_score", Float),
+    # Market/Digital
+    Column("market_size", Float),
+    Column("competition_index", Float),
+    Column("website_traffic", Float),
+    Column("conversion_rate", Float),
+    Column("social_engagement", Float),
+    # Label
+    Column("growth_category", String(50)),
+    Column("created_at", DateTime, server_default=func.current_timestamp()),
+    Index("idx_startup_info_industry", "industry"),
+    Index("idx_startup_info_stage", "stage"),
+    Index("idx_startup_info_growth_category", "growth_category"),
+    Index("idx_startup_info_created_at", "created_at"),
+)
+
+operational_metrics = Table(
+    "operational_metrics", metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("startup_id", Integer, ForeignKey("startup_info.id", ondelete="CASCADE")),
+    Column("month", Date, nullable=False),
+    Column("active_users", Integer),
+    Column("new_customers", Integer),
+    Column("retention_rate", Float),
+    Column("nps_score", Float),
+    Column("support_tickets", Integer),
+    Column("infra_costs", Float),
+    Column("created_at", DateTime, server_default=func.current_timestamp()),
+    Index("idx_operational_metrics_startup_month", "startup_id", "month"),
+)
+
+startup_scores = Table(
+    "startup_scores", metadata,
+    Column("startup_id", Integer, ForeignKey("startup_info.id", ondelete="CASCADE"), primary_key=True),
+    Column("model_version", String(32), primary_key=True),
+    Column("predicted_growth", Float),
+    Column("growth_category", String(50)),
+    Column("cluster", Integer),
+    Column("scored_at", DateTime, server_default=func.current_timestamp()),
+    Index("idx_startup_scores_version_cluster", "model_version", "cluster"),
+    Index("idx_startup_scores_version_growth", "model_version", "growth_category"),
+)
+
+# Newest operational_metrics.id folded into a model version's stored scores.
+score_watermarks = Table(
+    "score_watermarks", metadata,
+    Column("model_version", String(32), primary_key=True),
+    Column("metrics_id", Integer, nullable=False),
+    Column("updated_at", DateTime, server_default=func.current_timestamp()),
+)
+
+SCORE_COLUMNS = ["predicted_growth", "growth_category", "cluster"]
+
+COLUMN_ALIASES = {
+    "customer_acquisition_cost": "cac",
+    "lifetime_value": "ltv",
+}
 
-def fetch_startup_data():
+
+def _default_engine():
+    from config import engine
+    return engine
+
+
+def create_schema(engine=None):
+    """Create the tables if they don't exist (for SQLite stand-ins; Postgres uses db/init.sql)."""
+    metadata.create_all(engine or _default_engine())
+
+
+def upgrade_schema(engine=None):
+    """
+    Bring an existing database up to the current schema. Postgres runs
+    ``db/upgrade.sql`` (idempotent); SQLite only needs missing tables and indexes.
+    """
+    engine = engine or _default_engine()
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as conn:
+            conn.exec_driver_sql(UPGRADE_SQL.read_text())
+    else:
+        create_schema(engine)
+
+
+def fetch_startup_data(engine=None):
     query = "SELECT * FROM startup_info"
-    df = pd.read_sql(query, con=engine)
+    df = pd.read_sql(query, con=engine or _default_engine())
     return df
+
+
+def query_startups(engine, model_version, columns=None, industries=None, stages=None,
+                   growth_categories=None, clusters=None, created_after=None, limit=None, ids=None):
+    """
+    Scored startups for ``model_version`` with filters and projection done in SQL.
+
+    ``columns`` selects ``startup_info`` columns (all if None). Scores come back
+    as ``score_predicted_growth``, ``score_growth_category`` and ``score_cluster``;
+    ``growth_categories``/``clusters`` filter on the scores, not the stored label.
+    """
+    info, scores = startup_info, startup_scores
+    selected = [info.c[name] for name in columns] if columns else list(info.columns)
+    selected += [scores.c[name].label(f"score_{name}") for name in SCORE_COLUMNS]
+
+    join = info.join(scores, and_(scores.c.startup_id == info.c.id,
+                                  scores.c.model_version == model_version))
+    stmt = select(*selected).select_from(join)
+    if industries:
+        stmt = stmt.where(info.c.industry.in_(list(industries)))
+    if stages:
+        stmt = stmt.where(info.c.stage.in_(list(stages)))
+    if growth_categories:
+        stmt = stmt.where(scores.c.growth_category.in_(list(growth_categories)))
+    if clusters:
+        stmt = stmt.where(scores.c.cluster.in_([int(c) for c in clusters]))
+    if ids is not None:
+        stmt = stmt.where(info.c.id.in_([int(i) for i in ids]))
+    if created_after is not None:
+        stmt = stmt.where(info.c.created_at > created_after)
+    stmt = stmt.order_by(info.c.id)
+    if limit:
+        stmt = stmt.limit(limit)
+
+    with engine.connect() as conn:
+        return pd.read_sql(stmt, conn)
+
+
+def distinct_values(engine, model_version):
+    """Filter options: distinct industries, stages, growth categories and clusters."""
+    with engine.connect() as conn:
+        def values(stmt):
+            return [v for v in conn.execute(stmt).scalars() if v is not None]
+
+        version = startup_scores.c.model_version == model_version
+        return {
+            "industry": values(select(startup_info.c.industry).distinct()),
+            "stage": values(select(startup_info.c.stage).distinct()),
+            "growth_category": values(select(startup_scores.c.growth_category).where(version).distinct()),
+            "cluster": values(select(startup_scores.c.cluster).where(version).distinct()),
+        }
+
+
+def _insertable(df, table):
+    """Normalize column names and keep only the columns ``table`` can take (never ``id``)."""
+    df = df.rename(columns=lambda c: COLUMN_ALIASES.get(str(c).strip().lower(), str(c).strip().lower()))
+    columns = [
+        c.name for c in table.columns
+        if c.name in df.columns and not (c.primary_key and c.autoincrement is True)
+    ]
+    return df[columns]
+
+
+def _batches(df, batch_size):
+    for start in range(0, len(df), batch_size):
+        yield df.iloc[start:start + batch_size]
+
+
+def _copy_batch(cursor, table, batch):
+    buf = io.StringIO()
+    batch.to_csv(buf, index=False, header=False, na_rep="\\N", quoting=csv.QUOTE_MINIMAL)
+    buf.seek(0)
+    cursor.copy_expert(
+        f"COPY {table.name} ({', '.join(batch.columns)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+        buf,
+    )
+
+
+def bulk_insert(df, table=startup_info, engine=None, batch_size=10_000):
+    """
+    Insert ``df`` into ``table`` in one transaction and return the row count.
+
+    Uses COPY on psycopg2/Postgres and batched executemany otherwise.
+    """
+    engine = engine or _default_engine()
+    df = _insertable(df, table)
+    if df.empty:
+        return 0
+
+    if engine.dialect.name == "postgresql" and engine.dialect.driver == "psycopg2":
+        raw = engine.raw_connection()
+        try:
+            with raw.cursor() as cursor:
+                for batch in _batches(df, batch_size):
+                    _copy_batch(cursor, table, batch)
+            raw.commit()
+        except BaseException:
+            raw.rollback()
+            raise
+        finally:
+            raw.close()
+    else:
+        insert = table.insert()
+        with engine.begin() as conn:
+            for batch in _batches(df, batch_size):
+                batch = batch.astype(object).where(batch.notna(), None)
+                conn.execute(insert, batch.to_dict(orient="records"))
+    return len(df)
+
+
+def import_csv(path, table=startup_info, engine=None, batch_size=10_000, chunksize=100_000):
+    """Stream a CSV into ``table``; returns ``(rows, seconds)``."""
+    start = time.perf_counter()
+    rows = 0
+    for chunk in pd.read_csv(path, chunksize=chunksize):
+        rows += bulk_insert(chunk, table, engine, batch_size)
+    return rows, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Startup database utilities.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("create-schema", help="Create tables (SQLite stand-in).")
+    sub.add_parser("upgrade-schema", help="Add missing tables/indexes and retype columns of an existing database.")
+    imp = sub.add_parser("import", help="Bulk-import a CSV of historical startups.")
+    imp.add_argument("csv")
+    imp.add_argument("--table", choices=sorted(metadata.tables), default="startup_info")
+    imp.add_argument("--batch-size", type=int, default=10_000)
+    args = parser.parse_args(argv)
+
+    if args.command == "create-schema":
+        create_schema()
+    elif args.command == "upgrade-schema":
+        upgrade_schema()
+    elif args.command == "import":
+        rows, elapsed = import_csv(args.csv, metadata.tables[args.table], batch_size=args.batch_size)
+        print(f"Imported {rows:,} rows in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):,.0f} rows/s)",
+              file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,315 @@
 # utils/gemini_helper.py
-import google.generativeai as genai
+"""
+Async advisor client for Ask Gemini.
+
+``AdvisorClient`` wraps a pluggable ``AdvisorBackend`` (Gemini, or the
+deterministic ``LocalStubBackend`` for tests and load benchmarks) with an
+LRU + on-disk response cache, a token-bucket rate limiter, bounded
+concurrency, per-call timeouts and retry with backoff. The client runs on a
+background event loop so the Streamlit script thread can call ``ask_gemini``
+or stream tokens with ``stream_gemini``.
+
+Set ``ADVISOR_BACKEND=stub`` to run without a Gemini API key.
+"""
+import abc
+import asyncio
+import hashlib
+import json
 import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
 from dotenv import load_dotenv
 
+from utils import metrics
+from utils.chat_history import HistoryManager
+
 load_dotenv()
 
-# Load API key from environment variable
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+MODEL_NAME = "gemini-2.5-flash-lite"
+CACHE_DIR = Path(os.getenv("GEMINI_CACHE_DIR", Path(__file__).resolve().parent.parent / ".cache" / "gemini"))
 
-# Initialize model
-model = genai.GenerativeModel("gemini-2.5-flash-lite")
 
+# ---------------- Backends ----------------
+class AdvisorBackend(abc.ABC):
+    """Interface for LLM backends: stream the answer to a prompt as text chunks."""
 
-def ask_gemini(startup_data, question, history=[]):
-    """
-    Sends startup-specific context + user question + history to Gemini
-    and returns a natural language response.
-    """
+    name = "base"
+
+    @abc.abstractmethod
+    def stream(self, prompt):
+        """
+        Return an async iterator of text chunks answering ``prompt``.
+
+        Implementations are usually ``async def`` generators. ``AdvisorClient``
+        retries a failed stream only until its first chunk has been yielded.
+        """
+
+
+class GeminiBackend(AdvisorBackend):
+    name = "gemini"
+
+    def __init__(self, model_name=MODEL_NAME, api_key=None):
+        self.model_name = model_name
+        self.api_key = api_key
+        self._model = None
+
+    def _get_model(self):
+        if self._model is None:
+            import google.generativeai as genai
+
+            genai.configure(api_key=self.api_key or os.getenv("GEMINI_API_KEY"))
+            self._model = genai.GenerativeModel(self.model_name)
+        return self._model
+
+    async def stream(self, prompt):
+        response = await self._get_model().generate_content_async(prompt, stream=True)
+        async for chunk in response:
+            # Chunks without text parts (e.g. safety metadata) raise on .text
+            try:
+                text = chunk.text
+            except ValueError:
+                continue
+            if text:
+                yield text
+
+
+class LocalStubBackend(AdvisorBackend):
+    """Deterministic, offline backend: the same prompt always yields the same answer."""
+
+    name = "stub"
+
+    def __init__(self, latency=0.0, token_delay=0.0):
+        self.latency = latency
+        self.token_delay = token_delay
+
+    async def stream(self, prompt):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8]
+        question = prompt.rsplit("User:", 1)[-1].removesuffix("AI:").strip()
+        answer = f"[stub {digest}] Advice on: {question}"
+        for word in answer.split(" "):
+            if self.token_delay:
+                await asyncio.sleep(self.token_delay)
+            yield word + " "
+
+
+# ---------------- Cache & rate limiting ----------------
+class ResponseCache:
+    """In-memory LRU in front of one JSON file per key on disk."""
+
+    def __init__(self, max_entries=256, directory=CACHE_DIR):
+        self.max_entries = max_entries
+        self.directory = Path(directory) if directory else None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return self.directory / f"{key}.json"
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        if self.directory:
+            try:
+                value = json.loads(self._path(key).read_text())["answer"]
+            except (OSError, ValueError, KeyError):
+                return None
+            self._remember(key, value)
+            return value
+        return None
+
+    def put(self, key, value):
+        self._remember(key, value)
+        if self.directory:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            tmp = self._path(key).with_suffix(".tmp")
+            tmp.write_text(json.dumps({"answer": value, "created_at": time.time()}))
+            os.replace(tmp, self._path(key))
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class TokenBucket:
+    """Allow ``rate`` requests per second on average, with bursts up to ``capacity``."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+# ---------------- Client ----------------
+def cache_key(context, question, history):
+    payload = json.dumps(
+        [context, question, [[h["question"], h["answer"]] for h in history]],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class AdvisorClient:
+    def __init__(self, backend, cache=None, requests_per_minute=15, burst=5,
+                 max_concurrency=4, timeout=60.0, retries=3, backoff=1.0):
+        self.backend = backend
+        self.cache = cache if cache is not None else ResponseCache()
+        self.requests_per_minute = requests_per_minute
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        # asyncio primitives are created lazily on the loop that uses them.
+        self._bucket = None
+        self._semaphore = None
+
+    def _limits(self):
+        if self._semaphore is None:
+            self._bucket = TokenBucket(self.requests_per_minute / 60.0, self.burst)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._bucket, self._semaphore
+
+    async def stream(self, prompt, key=None):
+        """
+        Yield answer chunks for ``prompt``; a cache hit yields the whole answer at once.
+
+        Failed attempts are retried with exponential backoff as long as no
+        chunk has been yielded yet.
+
+        Records ``gemini.first_chunk`` (time to the first backend chunk,
+        including rate limiting and retries) and ``gemini.response`` (until
+        the last chunk) in ``utils.metrics``.
+        """
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                yield cached
+                return
+
+        start = time.perf_counter()
+        bucket, semaphore = self._limits()
+        async with semaphore:
+            for attempt in range(self.retries + 1):
+                with metrics.span("gemini.rate_limit_wait"):
+                    await bucket.acquire()
+                parts = []
+                deadline = time.monotonic() + self.timeout
+                chunks = self.backend.stream(prompt).__aiter__()
+                try:
+                    while True:
+                        remaining = deadline - time.monotonic()
+                        try:
+                            chunk = await asyncio.wait_for(chunks.__anext__(), max(remaining, 0))
+                        except StopAsyncIteration:
+                            break
+                        if not parts:
+                            metrics.observe("gemini.first_chunk", time.perf_counter() - start)
+                        parts.append(chunk)
+                        yield chunk
+                    break
+                except Exception:
+                    if parts or attempt == self.retries:
+                        raise
+                    await asyncio.sleep(self.backoff * 2 ** attempt * (1 + random.random() / 2))
+                finally:
+                    await chunks.aclose()
+
+        metrics.observe("gemini.response", time.perf_counter() - start)
+        if key is not None:
+            self.cache.put(key, "".join(parts))
 
-    base_context = f"""
+    async def ask(self, prompt, key=None):
+        return "".join([chunk async for chunk in self.stream(prompt, key)])
+
+
+# ---------------- Background loop for the sync (Streamlit) side ----------------
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def _background_loop():
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="advisor-client", daemon=True).start()
+        return _loop
+
+
+def run_sync(coro):
+    return asyncio.run_coroutine_threadsafe(coro, _background_loop()).result()
+
+
+def iter_sync(agen):
+    """Iterate an async generator from synchronous code, one chunk at a time."""
+    loop = _background_loop()
+    try:
+        while True:
+            try:
+                yield asyncio.run_coroutine_threadsafe(agen.__anext__(), loop).result()
+            except StopAsyncIteration:
+                return
+    finally:
+        asyncio.run_coroutine_threadsafe(agen.aclose(), loop).result()
+
+
+def make_backend(name=None):
+    name = name or os.getenv("ADVISOR_BACKEND", "gemini")
+    if name == "stub":
+        return LocalStubBackend()
+    if name == "gemini":
+        return GeminiBackend()
+    raise ValueError(f"Unknown advisor backend: {name}")
+
+
+_client = None
+
+
+def get_client():
+    global _client
+    if _client is None:
+        _client = AdvisorClient(
+            make_backend(),
+            requests_per_minute=float(os.getenv("GEMINI_RPM", 15)),
+            max_concurrency=int(os.getenv("GEMINI_MAX_CONCURRENCY", 4)),
+            timeout=float(os.getenv("GEMINI_TIMEOUT", 60)),
+        )
+    return _client
+
+
+def set_client(client):
+    """Swap the process-wide client (e.g. to a LocalStubBackend in tests)."""
+    global _client
+    _client = client
+
+
+# ---------------- Prompt ----------------
+def build_context(startup_data):
+    return f"""
     You are an AI startup advisor with expertise across multiple industries
     (SaaS, Retail, Services, and others). Provide insights that are both
     strategic and tactical, and keep responses simple and actionable.
@@ -43,7 +334,7 @@ def ask_gemini(startup_data, question, history=[]):
     - Monthly Growth Rate: {startup_data.get('monthly_growth_rate', 0):.2f}
     - Cluster: {startup_data['cluster']}
     - Recommendations: {', '.join(startup_data.get('recommendations', []))}
-
+{_similar_lines(startup_data.get('similar'))}
     Use industry-specific knowledge when possible:
     - SaaS: emphasize MRR, CAC, LTV, churn reduction, and onboarding.
     - Retail: emphasize margins, inventory, pricing, foot traffic, and growth levers.
@@ -52,12 +343,84 @@ def ask_gemini(startup_data, question, history=[]):
     Keep responses practical, plain-language, and easy to implement.
     """
 
-    # Build conversation with history
-    messages = [base_context]
-    for h in history:
-        messages.append(f"User: {h['question']}\nAI: {h['answer']}")
-    messages.append(f"User: {question}\nAI:")
 
-    response = model.generate_content("\n".join(messages))
-    return response.text
+def _similar_lines(similar):
+    """Context lines for the nearest portfolio startups (``ScoredPortfolio.similar`` records)."""
+    if not similar:
+        return ""
+    lines = ["", "    Most similar startups in the portfolio (for benchmarking):"]
+    for peer in similar:
+        lines.append(
+            f"    - {peer['name']} ({peer.get('industry', 'Unknown')}, {peer.get('stage', 'Unknown')}): "
+            f"revenue {peer['revenue']:.0f}, profit margin {peer['profit_margin']:.2f}, "
+            f"churn {peer['churn_rate']:.2f}%, predicted growth {peer['predicted_growth']:.0f}, "
+            f"{peer['growth_category']}, cluster {peer['cluster']}"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def build_prompt(base_context, question, history):
+    return history_manager.compose(base_context, question, history)[0]
+
+
+history_manager = HistoryManager(
+    keep_last=int(os.getenv("GEMINI_HISTORY_TURNS", 4)),
+    token_budget=int(os.getenv("GEMINI_PROMPT_TOKEN_BUDGET", 4000)),
+)
+
+# Rendered context blocks, so a startup's ~30 lines are formatted once per
+# session rather than on every turn.
+_context_cache = OrderedDict()
+_CONTEXT_CACHE_SIZE = 256
+
+
+def _context_for(startup_data):
+    if startup_data.get("id") is not None:
+        key = ("id", startup_data["id"], startup_data["name"])
+    else:
+        key = ("data", json.dumps(startup_data, sort_keys=True, default=str))
+    context = _context_cache.get(key)
+    if context is None:
+        context = _context_cache[key] = build_context(startup_data)
+        if len(_context_cache) > _CONTEXT_CACHE_SIZE:
+            _context_cache.popitem(last=False)
+    return context
+
+
+class AnswerStream:
+    """
+    Answer chunks as they arrive, iterable by ``st.write_stream``.
+
+    ``prompt_metrics`` is the ``PromptMetrics`` of the prompt this call sent,
+    so concurrent sessions each see their own numbers.
+    """
+
+    def __init__(self, chunks, prompt_metrics):
+        self._chunks = chunks
+        self.prompt_metrics = prompt_metrics
 
+    def __iter__(self):
+        return self._chunks
+
+
+@metrics.timed("gemini.prompt")
+def _prepare(startup_data, question, history):
+    """Return ``(prompt, cache key, PromptMetrics)`` for one question."""
+    context = _context_for(startup_data)
+    prompt, prompt_metrics = history_manager.compose(context, question, history)
+    return prompt, cache_key(context, question, history), prompt_metrics
+
+
+def stream_gemini(startup_data, question, history=()):
+    """Stream the answer as an ``AnswerStream`` (e.g. for ``st.write_stream``)."""
+    prompt, key, prompt_metrics = _prepare(startup_data, question, history)
+    return AnswerStream(iter_sync(get_client().stream(prompt, key)), prompt_metrics)
+
+
+def ask_gemini(startup_data, question, history=()):
+    """
+    Sends startup-specific context + user question + history to Gemini
+    and returns a natural language response.
+    """
+    prompt, key, _ = _prepare(startup_data, question, history)
+    return run_sync(get_client().ask(prompt, key))
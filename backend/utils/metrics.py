@@ -0,0 +1,222 @@
+"""
+In-process timing spans and latency histograms for the hot paths.
+
+    from utils.metrics import span, timed
+
+    with span("portfolio.insert"):
+        ...
+
+    @timed("strategy.generate")
+    def generate_strategy(df): ...
+
+Collection is off unless ``METRICS_ENABLED=1`` (or ``enable()`` is called,
+e.g. from the diagnostics page). While off, ``span`` returns one shared
+no-op context manager and ``timed`` functions only check a flag, so the
+instrumentation can stay in place on every hot path.
+
+Each stage gets a histogram with fixed Prometheus-style buckets plus the
+most recent ``RECENT_SAMPLES`` observations, from which the diagnostics
+page computes percentiles. ``prometheus_text`` renders the registry in the
+Prometheus text exposition format. The service serves it at ``/metrics``.
+The Streamlit process can expose it on ``METRICS_PORT`` with
+``start_http_server``.
+"""
+import bisect
+import functools
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+METRIC_NAME = "advisor_stage_seconds"
+# Upper bounds in seconds, from sub-millisecond predicts to multi-second LLM calls.
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+RECENT_SAMPLES = 2048
+PERCENTILES = (50, 90, 99)
+
+_enabled = os.getenv("METRICS_ENABLED", "0") == "1"
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def enable(on=True):
+    global _enabled
+    _enabled = bool(on)
+
+
+class Histogram:
+    """Cumulative-bucket histogram of one stage's durations, plus a window of recent samples."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.recent = deque(maxlen=RECENT_SAMPLES)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        i = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += seconds
+            self.count += 1
+            self.recent.append(seconds)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            recent = np.fromiter(self.recent, dtype=np.float64, count=len(self.recent))
+            stats = {"count": self.count, "sum": self.sum, "counts": list(self.counts)}
+        for p in PERCENTILES:
+            stats[f"p{p}"] = float(np.percentile(recent, p)) if len(recent) else None
+        stats["mean"] = stats["sum"] / stats["count"] if stats["count"] else None
+        return stats
+
+
+class Registry:
+    """Histograms by stage name, created on first observation."""
+
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name) -> Histogram:
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(name, Histogram())
+        return histogram
+
+    def observe(self, name, seconds):
+        self.histogram(name).observe(seconds)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            names = sorted(self._histograms)
+        return {name: self._histograms[name].snapshot() for name in names}
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+
+REGISTRY = Registry()
+
+
+class _Span:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        REGISTRY.observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def span(name):
+    """Context manager timing its block as stage ``name`` (a shared no-op while disabled)."""
+    return _Span(name) if _enabled else _NOOP
+
+
+def observe(name, seconds):
+    """Record a duration measured by the caller (e.g. across an async generator's yields)."""
+    if _enabled:
+        REGISTRY.observe(name, seconds)
+
+
+def timed(name):
+    """Decorator: time every call of the function as stage ``name``."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                REGISTRY.observe(name, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus_text(registry=REGISTRY) -> str:
+    """The registry in the Prometheus text exposition format (version 0.0.4)."""
+    lines = [
+        f"# HELP {METRIC_NAME} Duration of advisor pipeline stages.",
+        f"# TYPE {METRIC_NAME} histogram",
+    ]
+    for name, stats in registry.snapshot().items():
+        stage = _label(name)
+        cumulative = 0
+        for bound, count in zip((*BUCKETS, "+Inf"), stats["counts"]):
+            cumulative += count
+            lines.append(f'{METRIC_NAME}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+        lines.append(f'{METRIC_NAME}_sum{{stage="{stage}"}} {stats["sum"]!r}')
+        lines.append(f'{METRIC_NAME}_count{{stage="{stage}"}} {stats["count"]}')
+    return "\n".join(lines) + "\n"
+
+
+_server = None
+
+
+def start_http_server(port=None, host="0.0.0.0"):
+    """
+    Serve ``prometheus_text`` at ``/metrics`` from a daemon thread, once per
+    process. ``port`` defaults to ``METRICS_PORT``; returns the server, or
+    None if no port is configured.
+    """
+    global _server
+    port = port if port is not None else os.getenv("METRICS_PORT")
+    if not port or _server is not None:
+        return _server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = prometheus_text().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    try:
+        _server = ThreadingHTTPServer((host, int(port)), Handler)
+    except OSError as exc:  # e.g. another Streamlit worker already owns the port
+        print(f"Metrics endpoint not started on port {port}: {exc}")
+        return None
+    threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+    return _server
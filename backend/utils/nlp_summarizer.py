@@ -1,97 +1,220 @@
+"""
+Plain-language startup summaries, in a founder or an investor voice.
+
+Strengths and risks are classified for a whole frame at once: every signal
+is one vectorized comparison, and each row's combination of signals indexes
+a table of pre-joined phrases. Each style is a set of ``str.format``
+templates, compiled once into one template per combination of optional
+sections, so rendering a row is a single ``format_map``.
+
+``iter_summaries`` yields summaries lazily in row order, for portfolio-wide
+use (reports, batch export). ``summarize_insights`` renders one row through
+the same path. New styles are added with ``register_style``.
+"""
+import operator
+import string
+from collections import namedtuple
+from itertools import product
+
+import numpy as np
+
+# A signal fires when ``df[column] <op> threshold``; ``kind`` is "strength" or "risk".
+# Within a kind, phrases are listed in this order.
+Signal = namedtuple("Signal", ["kind", "column", "op", "threshold", "phrase"])
+
+SIGNALS = [
+    Signal("strength", "profit_margin", ">", 0.2, "healthy profit margins"),
+    Signal("risk", "profit_margin", "<", 0.05, "weak margins"),
+    Signal("strength", "ltv_cac_ratio", ">", 3, "strong customer economics (high LTV/CAC)"),
+    Signal("risk", "ltv_cac_ratio", "<", 1, "unsustainable acquisition costs"),
+    Signal("strength", "churn_rate", "<", 5, "excellent customer retention"),
+    Signal("risk", "churn_rate", ">", 10, "high churn risk"),
+    Signal("risk", "runway_months", "<", 6, "limited cash runway"),
+    Signal("strength", "runway_months", ">", 12, "solid financial stability"),
+]
+
+_OPS = {
+    "<": operator.lt,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+# A style's sections, concatenated in this order. ``marketing`` is rendered
+# only for rows with a marketing_efficiency value, ``strengths`` and
+# ``risks`` only for rows where some signal of that kind fired.
+Style = namedtuple("Style", ["head", "marketing", "body", "strengths", "risks", "tail"])
+
+STYLES = {}
+
+# Template fields computed from columns rather than read directly.
+DERIVED_FIELDS = {
+    "margin_pct": lambda get: get("profit_margin") * 100,
+    "acquisition_outlook": lambda get: np.where(
+        _OPS[">="](get("ltv_cac_ratio"), 3),
+        "efficient customer acquisition", "room to optimize customer acquisition costs"),
+    "ltv_cac_strength": lambda get: np.where(_OPS[">="](get("ltv_cac_ratio"), 3), "strong", "weak"),
+}
+
+NO_RECOMMENDATIONS = "No specific recommendations."
+CHUNKSIZE = 4096
+
+
+def _phrase_table(kind):
+    """Bit positions of ``kind``'s signals and the joined phrase for every combination of them."""
+    signals = [(i, s) for i, s in enumerate(SIGNALS) if s.kind == kind]
+    table = np.empty(2 ** len(signals), dtype=object)
+    for code in range(len(table)):
+        table[code] = ", ".join(s.phrase for bit, (_, s) in enumerate(signals) if code >> bit & 1)
+    return [i for i, _ in signals], table
+
+
+_STRENGTHS = _phrase_table("strength")
+_RISKS = _phrase_table("risk")
+
+
+def _template_fields(template):
+    return {field.split(".")[0].split("[")[0]
+            for _, field, _, _ in string.Formatter().parse(template) if field}
+
+
+class _CompiledStyle:
+    """One full template per (marketing, strengths, risks) combination, plus the fields they use."""
+
+    def __init__(self, style):
+        self.variants = {}
+        for marketing, strengths, risks in product((False, True), repeat=3):
+            self.variants[marketing, strengths, risks] = "".join([
+                style.head,
+                style.marketing if marketing else "",
+                style.body,
+                style.strengths if strengths else "",
+                style.risks if risks else "",
+                style.tail,
+            ])
+        self.fields = set().union(*(_template_fields(t) for t in self.variants.values()))
+
+
+def register_style(name, style):
+    """Add (or replace) a summary style; ``style`` is a ``Style`` of format templates."""
+    STYLES[name] = _CompiledStyle(style)
+
+
+register_style("founder", Style(
+    head=(
+        "🚀 {name} is currently in the {stage} stage "
+        "within the {industry} industry.\n\n"
+        "You’re generating about ${revenue:,.0f} in monthly revenue with costs of ${costs:,.0f}, "
+        "leaving a profit of ${profit:,.0f} (margin: {margin_pct:.1f}%). "
+    ),
+    marketing="Marketing spend is ${marketing_spend:,.0f}, with an efficiency of {marketing_efficiency:.2f}.\n\n",
+    body=(
+        "Your LTV/CAC ratio is {ltv_cac_ratio:.2f}, which shows {acquisition_outlook}. "
+        "Churn is at {churn_rate:.1f}%, and with a burn of ${burn_rate:,.0f}/month, "
+        "you’ve got about {runway_months:.1f} months of runway.\n\n"
+        "Growth-wise, you’re placed in cluster {cluster} and categorized as '{growth_category}'. "
+        "Predicted growth is ${predicted_growth:,.0f} in the upcoming period.\n\n"
+    ),
+    strengths="💡 What’s going well: {strengths}.\n\n",
+    risks="⚠️ Watch out for: {risks}.\n\n",
+    tail="✅ Next steps: {recommendations}",
+))
+
+register_style("investor", Style(
+    head=(
+        "📊 {name} – {industry} ({stage} stage)\n\n"
+        "- Financials: ${revenue:,.0f} MRR, ${costs:,.0f} costs, ${profit:,.0f} net "
+        "({margin_pct:.1f}% margin).\n"
+    ),
+    marketing="- Marketing Efficiency: {marketing_efficiency:.2f} (spend: ${marketing_spend:,.0f}).\n",
+    body=(
+        "- Unit Economics: LTV/CAC = {ltv_cac_ratio:.2f} ({ltv_cac_strength})\n"
+        "- Churn: {churn_rate:.1f}% | Runway: {runway_months:.1f} months (burn ${burn_rate:,.0f}/mo)\n"
+        "- Cluster: {cluster} | Growth Category: {growth_category}\n"
+        "- Predicted Growth: ${predicted_growth:,.0f}\n\n"
+    ),
+    strengths="✅ Strengths: {strengths}.\n",
+    risks="⚠️ Risks: {risks}.\n",
+    tail="\n📌 Strategic Recommendations: {recommendations}",
+))
+
+
+def _style(style):
+    try:
+        return STYLES[style]
+    except KeyError:
+        raise ValueError(f"Style must be one of: {', '.join(repr(s) for s in STYLES)}.") from None
+
+
+def _signal_codes(get, n, bits):
+    codes = np.zeros(n, dtype=np.int64)
+    for bit, i in enumerate(bits):
+        signal = SIGNALS[i]
+        fired = np.asarray(_OPS[signal.op](get(signal.column), signal.threshold), dtype=bool)
+        codes |= fired.astype(np.int64) << bit
+    return codes
+
+
+def _render(compiled, get, names, recommendations, has_marketing):
+    """
+    Summaries for the rows behind ``get`` (column name -> 1-D array).
+    ``has_marketing`` says whether there is a marketing_efficiency column.
+    """
+    n = len(names)
+    strengths = _signal_codes(get, n, _STRENGTHS[0])
+    risks = _signal_codes(get, n, _RISKS[0])
+
+    columns = {"name": names}
+    marketing = [False] * n
+    if has_marketing:
+        columns["marketing_efficiency"] = get("marketing_efficiency").tolist()
+        marketing = [value is not None for value in columns["marketing_efficiency"]]
+    for field in compiled.fields - {"name", "strengths", "risks", "recommendations", *columns}:
+        if field in DERIVED_FIELDS:
+            columns[field] = DERIVED_FIELDS[field](get).tolist()
+        elif has_marketing or field not in ("marketing_efficiency", "marketing_spend"):
+            columns[field] = get(field).tolist()
+        else:
+            columns[field] = [None] * n
+    columns["strengths"] = _STRENGTHS[1][strengths].tolist()
+    columns["risks"] = _RISKS[1][risks].tolist()
+    columns["recommendations"] = [
+        "; ".join(recs) if recs else NO_RECOMMENDATIONS for recs in recommendations
+    ]
+
+    fields = list(columns)
+    variants = compiled.variants
+    for i, values in enumerate(zip(*columns.values())):
+        template = variants[marketing[i], bool(strengths[i]), bool(risks[i])]
+        yield template.format_map(dict(zip(fields, values)))
+
+
+def iter_summaries(df, style="founder", names=None, chunksize=CHUNKSIZE):
+    """
+    Lazily yield one summary per row of ``df`` (preprocessed and scored), in order.
+
+    ``names`` defaults to ``df["name"]``. Rows are classified and rendered
+    ``chunksize`` at a time, so memory stays flat for any frame size.
+    """
+    compiled = _style(style)
+    names = df["name"].tolist() if names is None else list(names)
+    has_marketing = "marketing_efficiency" in df.columns
+    has_recommendations = "recommendations" in df.columns
+    for start in range(0, len(df), chunksize):
+        chunk = df.iloc[start:start + chunksize]
+        recommendations = chunk["recommendations"].tolist() if has_recommendations else [[]] * len(chunk)
+        yield from _render(compiled, lambda column: chunk[column].to_numpy(),
+                           names[start:start + chunksize], recommendations, has_marketing)
+
+
 def summarize_insights(startup_name, df_row, style="founder"):
     """
     Summarizes startup metrics with two modes:
       - 'founder': plain, motivational, actionable
       - 'investor': analytical, risk/opportunity framing
+    (or any style added with ``register_style``).
     """
-
-    # Extract metrics
-    revenue = df_row["revenue"]
-    costs = df_row["costs"]
-    profit = df_row["profit"]
-    margin = df_row["profit_margin"]
-    churn = df_row["churn_rate"]
-    burn = df_row["burn_rate"]
-    runway = df_row["runway_months"]
-    ltv_cac = df_row["ltv_cac_ratio"]
-    growth = df_row["predicted_growth"]
-    cluster = df_row["cluster"]
-    category = df_row["growth_category"]
-    m_eff = df_row.get("marketing_efficiency", None)
-
-    recs = df_row.get("recommendations", [])
-    rec_text = "; ".join(recs) if recs else "No specific recommendations."
-
-    # Quick health signals
-    strengths, risks = [], []
-    if margin > 0.2: strengths.append("healthy profit margins")
-    if margin < 0.05: risks.append("weak margins")
-    if ltv_cac > 3: strengths.append("strong customer economics (high LTV/CAC)")
-    if ltv_cac < 1: risks.append("unsustainable acquisition costs")
-    if churn < 5: strengths.append("excellent customer retention")
-    if churn > 10: risks.append("high churn risk")
-    if runway < 6: risks.append("limited cash runway")
-    if runway > 12: strengths.append("solid financial stability")
-
-    # ========================
-    # Founder-Friendly Summary
-    # ========================
-    if style == "founder":
-        summary = (
-            f"🚀 {startup_name} is currently in the {df_row['stage']} stage "
-            f"within the {df_row['industry']} industry.\n\n"
-            f"You’re generating about ${revenue:,.0f} in monthly revenue with costs of ${costs:,.0f}, "
-            f"leaving a profit of ${profit:,.0f} (margin: {margin*100:.1f}%). "
-        )
-
-        if m_eff is not None:
-            summary += f"Marketing spend is ${df_row['marketing_spend']:,.0f}, with an efficiency of {m_eff:.2f}.\n\n"
-
-        summary += (
-            f"Your LTV/CAC ratio is {ltv_cac:.2f}, which shows "
-            f"{'efficient customer acquisition' if ltv_cac >= 3 else 'room to optimize customer acquisition costs'}. "
-            f"Churn is at {churn:.1f}%, and with a burn of ${burn:,.0f}/month, "
-            f"you’ve got about {runway:.1f} months of runway.\n\n"
-        )
-
-        summary += (
-            f"Growth-wise, you’re placed in cluster {cluster} and categorized as '{category}'. "
-            f"Predicted growth is ${growth:,.0f} in the upcoming period.\n\n"
-        )
-
-        if strengths: summary += f"💡 What’s going well: {', '.join(strengths)}.\n\n"
-        if risks: summary += f"⚠️ Watch out for: {', '.join(risks)}.\n\n"
-
-        summary += f"✅ Next steps: {rec_text}"
-        return summary
-
-    # ========================
-    # Investor-Style Summary
-    # ========================
-    elif style == "investor":
-        summary = (
-            f"📊 {startup_name} – {df_row['industry']} ({df_row['stage']} stage)\n\n"
-            f"- Financials: ${revenue:,.0f} MRR, ${costs:,.0f} costs, ${profit:,.0f} net "
-            f"({margin*100:.1f}% margin).\n"
-        )
-        if m_eff is not None:
-            summary += f"- Marketing Efficiency: {m_eff:.2f} (spend: ${df_row['marketing_spend']:,.0f}).\n"
-
-        summary += (
-            f"- Unit Economics: LTV/CAC = {ltv_cac:.2f} "
-            f"({'strong' if ltv_cac >= 3 else 'weak'})\n"
-            f"- Churn: {churn:.1f}% | Runway: {runway:.1f} months (burn ${burn:,.0f}/mo)\n"
-            f"- Cluster: {cluster} | Growth Category: {category}\n"
-            f"- Predicted Growth: ${growth:,.0f}\n\n"
-        )
-
-        if strengths:
-            summary += f"✅ Strengths: {', '.join(strengths)}.\n"
-        if risks:
-            summary += f"⚠️ Risks: {', '.join(risks)}.\n"
-
-        summary += f"\n📌 Strategic Recommendations: {rec_text}"
-        return summary
-
-    else:
-        raise ValueError("Style must be 'founder' or 'investor'.")
+    compiled = _style(style)
+    has_marketing = "marketing_efficiency" in df_row
+    recommendations = [df_row.get("recommendations", [])]
+    get = lambda column: np.asarray([df_row[column]])  # noqa: E731
+    return next(_render(compiled, get, [startup_name], recommendations, has_marketing))
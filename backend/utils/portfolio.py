@@ -0,0 +1,387 @@
+"""
+Scored-portfolio cache.
+
+Predictions for every row of ``startup_info`` are persisted in
+``startup_scores`` keyed by ``(startup_id, model_version)``. The in-process
+frame only reads rows it hasn't seen yet, so a submit scores just the new
+startup and appends it; the whole table is only rescored when the model
+version changes.
+
+Dashboard reads go through ``query``, which pushes filters and column
+projection down to SQL (see ``utils.db_utils.query_startups``) instead of
+filtering the whole frame in pandas. Read methods only see stored scores:
+callers run ``score_missing`` once per rerun or submit, which only looks at
+rows past the highest id it has already covered.
+
+Rows are scored with their ``utils.timeseries`` features. When new
+``operational_metrics`` months arrive, the startups they belong to are
+rescored on the next ``score_missing`` call. ``score_watermarks``
+records the newest metrics row each model version's scores include, so
+months written while no process was running are rescored on first load.
+``data_version``
+tells callers that cache query results (``utils.dashboard_data``) when
+to drop them.
+
+``similar`` looks up the nearest startups in ``models.similarity``'s index,
+which follows inserts by id like the scores do.
+"""
+import threading
+
+import pandas as pd
+from sqlalchemy import bindparam, text
+
+from models.inference import get_engine
+from models.similarity import DEFAULT_K, get_similarity_index
+from utils.db_utils import SCORE_COLUMNS, distinct_values, query_startups, startup_info
+from utils.metrics import span
+from utils.preprocessing import REQUIRED_COLUMNS, preprocess_startup_data
+from utils.timeseries import TimeSeriesFeatures
+
+_SELECT_NEW_ROWS = text("""
+    SELECT i.*,
+           s.predicted_growth AS score_predicted_growth,
+           s.growth_category AS score_growth_category,
+           s.cluster AS score_cluster
+    FROM startup_info i
+    LEFT JOIN startup_scores s
+           ON s.startup_id = i.id AND s.model_version = :version
+    WHERE i.id > :after
+    ORDER BY i.id
+""")
+
+_SELECT_UNSCORED = text("""
+    SELECT i.*
+    FROM startup_info i
+    LEFT JOIN startup_scores s
+           ON s.startup_id = i.id AND s.model_version = :version
+    WHERE s.startup_id IS NULL AND i.id > :after AND i.id <= :through
+    ORDER BY i.id
+    LIMIT :limit
+""")
+
+_MAX_STARTUP_ID = text("SELECT MAX(id) FROM startup_info")
+
+_SELECT_BY_ID = text(
+    "SELECT * FROM startup_info WHERE id IN :ids ORDER BY id"
+).bindparams(bindparam("ids", expanding=True))
+
+_SCORES_VERSION = text("""
+    SELECT MAX(startup_id) AS last_id, COUNT(*) AS scored, MAX(scored_at) AS scored_at,
+           (SELECT metrics_id FROM score_watermarks WHERE model_version = :version) AS metrics_id
+    FROM startup_scores
+    WHERE model_version = :version
+""")
+
+# Several sessions or processes can score the same new row at once; for one
+# model version they compute the same score, so the first write wins.
+_INSERT_SCORE = text("""
+    INSERT INTO startup_scores (startup_id, model_version, predicted_growth, growth_category, cluster)
+    VALUES (:startup_id, :model_version, :predicted_growth, :growth_category, :cluster)
+    ON CONFLICT (startup_id, model_version) DO NOTHING
+""")
+
+# Rescoring for new operational metrics replaces the stored score.
+_UPSERT_SCORE = text("""
+    INSERT INTO startup_scores (startup_id, model_version, predicted_growth, growth_category, cluster)
+    VALUES (:startup_id, :model_version, :predicted_growth, :growth_category, :cluster)
+    ON CONFLICT (startup_id, model_version) DO UPDATE SET
+        predicted_growth = excluded.predicted_growth,
+        growth_category = excluded.growth_category,
+        cluster = excluded.cluster,
+        scored_at = CURRENT_TIMESTAMP
+""")
+
+_SELECT_WATERMARK = text(
+    "SELECT metrics_id FROM score_watermarks WHERE model_version = :version"
+)
+
+# Only ever moves forward, whichever process gets there first.
+_ADVANCE_WATERMARK = text("""
+    INSERT INTO score_watermarks (model_version, metrics_id)
+    VALUES (:version, :metrics_id)
+    ON CONFLICT (model_version) DO UPDATE SET
+        metrics_id = excluded.metrics_id,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE score_watermarks.metrics_id < excluded.metrics_id
+""")
+
+SIMILAR_COLUMNS = ["revenue", "profit_margin", "churn_rate", "ltv_cac_ratio"]
+
+FORM_COLUMNS = [
+    "name", "industry", "stage", "revenue", "costs", "churn_rate", "marketing_spend",
+    "burn_rate", "cash_reserves", "cac", "ltv", "monthly_growth_rate", "market_share",
+]
+
+
+def _score_records(df, version):
+    return [
+        {
+            "startup_id": int(startup_id),
+            "model_version": version,
+            "predicted_growth": float(growth),
+            "growth_category": str(category),
+            "cluster": int(cluster),
+        }
+        for startup_id, growth, category, cluster in zip(
+            df["id"], df["predicted_growth"], df["growth_category"], df["cluster"]
+        )
+    ]
+
+
+class ScoredPortfolio:
+    """Preprocessed, scored view of ``startup_info`` for one model version."""
+
+    def __init__(self, engine, models, timeseries=None, similarity=None):
+        self.engine = engine
+        self.models = models
+        self.version = models.version
+        self.timeseries = timeseries if timeseries is not None else TimeSeriesFeatures(engine)
+        self._similarity = similarity
+        self._timeseries_loaded = False
+        self._watermark = 0
+        self._parts = []
+        self._frame = None
+        self._last_id = 0
+        self._scored_through = 0
+        self._lock = threading.Lock()
+
+    def _append(self, df):
+        if df.empty:
+            return
+        self._parts.append(df)
+        self._frame = None
+        self._last_id = max(self._last_id, int(df["id"].max()))
+
+    def _score_rows(self, df_raw, conn):
+        """Preprocess rows read from the DB, reusing stored scores and scoring the rest."""
+        stored = {col: df_raw.pop(f"score_{col}") for col in SCORE_COLUMNS}
+        df = preprocess_startup_data(self.timeseries.attach(df_raw))
+        for col in SCORE_COLUMNS:
+            df[col] = stored[col].to_numpy()
+
+        missing = stored["predicted_growth"].isna().to_numpy()
+        if missing.any():
+            scored = self.models.score(df.loc[missing].copy())
+            conn.execute(_INSERT_SCORE, _score_records(scored, self.version))
+            for col in SCORE_COLUMNS:
+                df.loc[missing, col] = scored[col].to_numpy()
+
+        df["predicted_growth"] = df["predicted_growth"].astype(float)
+        df["cluster"] = df["cluster"].astype(int)
+        df["archetype"] = self.models.clustering.archetype(df["cluster"])
+        return df
+
+    def _with_scores(self, df_raw):
+        """Preprocess rows returned by ``query_startups`` and attach their stored scores."""
+        stored = {col: df_raw.pop(f"score_{col}") for col in SCORE_COLUMNS}
+        # preprocess_startup_data derives growth_category, so scores go on afterwards.
+        df = preprocess_startup_data(df_raw)
+        for col in SCORE_COLUMNS:
+            df[col] = stored[col].to_numpy()
+        df["predicted_growth"] = df["predicted_growth"].astype(float)
+        df["cluster"] = df["cluster"].astype(int)
+        df["archetype"] = self.models.clustering.archetype(df["cluster"])
+        return df
+
+    def _refresh_locked(self):
+        with self.engine.begin() as conn:
+            with span("portfolio.read_sql"):
+                df_new = pd.read_sql(_SELECT_NEW_ROWS, conn, params={
+                    "version": self.version, "after": self._last_id,
+                })
+            if not df_new.empty:
+                self._append(self._score_rows(df_new, conn))
+
+    def refresh(self):
+        """Pull rows inserted since the last read (by any session or process)."""
+        self.refresh_timeseries()
+        with self._lock:
+            self._refresh_locked()
+        return self
+
+    def _rescore_locked(self, startup_ids, chunksize):
+        ids = sorted(startup_ids)
+        for start in range(0, len(ids), chunksize):
+            batch = ids[start:start + chunksize]
+            with self.engine.begin() as conn:
+                df_raw = pd.read_sql(_SELECT_BY_ID, conn, params={"ids": batch})
+                if df_raw.empty:
+                    continue
+                scored = self.models.score(preprocess_startup_data(self.timeseries.attach(df_raw)))
+                conn.execute(_UPSERT_SCORE, _score_records(scored, self.version))
+        # Stored scores changed under the in-process frame; rebuild it on next load.
+        self._parts, self._frame, self._last_id = [], None, 0
+
+    def refresh_timeseries(self, chunksize=50_000) -> set:
+        """
+        Fold new operational-metrics months into the features and rescore the
+        startups they belong to. Returns the startup ids that were updated.
+
+        The first call rescores the startups with metric rows past the stored
+        watermark instead: months that arrived while no process was serving
+        this model version.
+        """
+        with self._lock:
+            updated = self.timeseries.refresh()
+            if not self._timeseries_loaded:
+                with self.engine.connect() as conn:
+                    self._watermark = conn.execute(_SELECT_WATERMARK, {"version": self.version}).scalar() or 0
+                updated = self.timeseries.startups_since(self._watermark)
+                self._timeseries_loaded = True
+            if updated:
+                self._rescore_locked(updated, chunksize)
+            if self.timeseries.last_id > self._watermark:
+                with self.engine.begin() as conn:
+                    conn.execute(_ADVANCE_WATERMARK, {"version": self.version,
+                                                      "metrics_id": self.timeseries.last_id})
+                self._watermark = self.timeseries.last_id
+        return updated
+
+    def score_missing(self, chunksize=50_000) -> int:
+        """
+        Score and store rows that have no score for this model version yet.
+
+        Works in ``chunksize`` batches so a model upgrade on a large table
+        never holds the whole table in memory. Only ids past the ones earlier
+        calls covered are examined, so a call that finds nothing is cheap.
+        Returns the number scored.
+        """
+        self.refresh_timeseries(chunksize)
+        scored_rows = 0
+        with self._lock:
+            with self.engine.connect() as conn:
+                through = conn.execute(_MAX_STARTUP_ID).scalar() or 0
+            while self._scored_through < through:
+                with self.engine.begin() as conn:
+                    df_raw = pd.read_sql(_SELECT_UNSCORED, conn, params={
+                        "version": self.version, "after": self._scored_through, "through": through,
+                        "limit": chunksize,
+                    })
+                    if df_raw.empty:
+                        break
+                    scored = self.models.score(preprocess_startup_data(self.timeseries.attach(df_raw)))
+                    conn.execute(_INSERT_SCORE, _score_records(scored, self.version))
+                self._scored_through = int(df_raw["id"].max())
+                scored_rows += len(df_raw)
+                if len(df_raw) < chunksize:
+                    break
+            # Everything up to ``through`` has a score now, including rows that already had one.
+            self._scored_through = max(self._scored_through, through)
+        return scored_rows
+
+    def query(self, industries=None, stages=None, growth_categories=None, clusters=None,
+              columns=None, limit=None, ids=None) -> pd.DataFrame:
+        """
+        Scored, preprocessed startups matching the filters, read straight from SQL.
+
+        ``columns`` limits the ``startup_info`` columns read; ``id``, ``name``,
+        ``industry``, ``stage`` and the preprocessing inputs are always included
+        so engineered features stay correct. Rows without a stored score
+        (see ``score_missing``) are left out.
+        """
+        if columns is not None:
+            wanted = ["id", "name", "industry", "stage", *REQUIRED_COLUMNS, *columns]
+            available = set(startup_info.columns.keys())
+            columns = [c for c in dict.fromkeys(wanted) if c in available]
+        with span("portfolio.read_sql"):
+            df_raw = query_startups(
+                self.engine, self.version, columns=columns, industries=industries, stages=stages,
+                growth_categories=growth_categories, clusters=clusters, limit=limit, ids=ids,
+            )
+        return self._with_scores(df_raw)
+
+    def data_version(self) -> tuple:
+        """
+        Changes whenever ``query`` results could: rows scored, or startups
+        rescored for new operational metrics, by any session or process.
+        Read from ``startup_scores`` (``scored_at`` moves on every rescore)
+        and the metrics watermark in one query.
+        """
+        with self.engine.connect() as conn:
+            row = conn.execute(_SCORES_VERSION, {"version": self.version}).one()
+        return (self.version, *row)
+
+    @property
+    def similarity(self):
+        if self._similarity is None:
+            self._similarity = get_similarity_index(self.engine)
+        return self._similarity
+
+    def similar(self, startup: pd.DataFrame, k=DEFAULT_K) -> pd.DataFrame:
+        """
+        The ``k`` portfolio startups nearest to the first row of ``startup``
+        (preprocessed), with their scores and a ``distance`` column, nearest first.
+        The row itself is skipped when it has an ``id``.
+        """
+        exclude = [int(startup["id"].iloc[0])] if "id" in startup.columns else []
+        with span("similarity.query"):
+            ids, distances = self.similarity.query(startup, k, exclude)
+        if len(ids) == 0:
+            return pd.DataFrame(columns=["id", "name", "industry", "stage", *SIMILAR_COLUMNS, *SCORE_COLUMNS,
+                                         "distance"])
+        df = self.query(columns=SIMILAR_COLUMNS, ids=ids.tolist())
+        df["distance"] = df["id"].map(dict(zip(ids.tolist(), distances.tolist())))
+        return df.sort_values("distance", kind="stable").reset_index(drop=True)
+
+    def filter_options(self) -> dict:
+        """Distinct industry/stage/growth_category/cluster values for filter widgets."""
+        options = distinct_values(self.engine, self.version)
+        return {name: sorted(values) for name, values in options.items()}
+
+    def score_record(self, record: dict) -> pd.DataFrame:
+        """One form record scored (with recommendations) as a one-row frame, without storing it."""
+        values = {col: record.get(col) for col in FORM_COLUMNS}
+        # Compiled single-row path: same scores as models.score, without pandas overhead.
+        return pd.DataFrame([get_engine(self.models).predict(values)])
+
+    def add(self, record: dict, scored: pd.DataFrame = None) -> pd.DataFrame:
+        """
+        Insert one startup, score only that row, and append it to the portfolio.
+        ``scored`` is ``score_record(record)`` if the caller already has it; it is not modified.
+        """
+        values = {col: record.get(col) for col in FORM_COLUMNS}
+        insert = text(
+            f"INSERT INTO startup_info ({', '.join(FORM_COLUMNS)}) "
+            f"VALUES ({', '.join(':' + col for col in FORM_COLUMNS)}) RETURNING id"
+        )
+
+        df = self.score_record(record) if scored is None else scored.copy()
+        with self._lock:
+            with span("portfolio.insert"), self.engine.begin() as conn:
+                startup_id = conn.execute(insert, values).scalar_one()
+                df.insert(0, "id", startup_id)
+                conn.execute(_INSERT_SCORE, _score_records(df, self.version))
+            # Keep score_missing's cursor contiguous: rows other writers left
+            # unscored below this id must still be found.
+            if startup_id == self._scored_through + 1:
+                self._scored_through = startup_id
+            # The new row's score is already stored, so this only reads it back
+            # (plus anything other sessions inserted meanwhile) without rescoring.
+            # Sessions that only use ``query`` never build the in-process frame.
+            if self._parts:
+                self._refresh_locked()
+        return df
+
+    def frame(self) -> pd.DataFrame:
+        """The whole scored portfolio as one DataFrame."""
+        with self._lock:
+            if self._frame is None:
+                self._frame = pd.concat(self._parts, ignore_index=True) if self._parts else pd.DataFrame()
+                self._parts = [self._frame] if self._parts else []
+            return self._frame
+
+    def load(self) -> pd.DataFrame:
+        return self.refresh().frame()
+
+
+# --- Process-wide cache, one portfolio per model version ---
+_portfolios = {}
+_portfolios_lock = threading.Lock()
+
+
+def get_portfolio(engine, models) -> ScoredPortfolio:
+    with _portfolios_lock:
+        key = (id(engine), models.version)
+        if key not in _portfolios:
+            _portfolios[key] = ScoredPortfolio(engine, models)
+        return _portfolios[key]
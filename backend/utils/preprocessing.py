@@ -1,44 +1,182 @@
+from functools import lru_cache
+
+import numpy as np
 import pandas as pd
+from pandas.api.types import is_numeric_dtype
+from sklearn.base import BaseEstimator, TransformerMixin
+
+from utils.metrics import timed
+
+# Model inputs shared by GrowthPredictor, GrowthClassifier and StartupClustering.
+FEATURES = [
+    'revenue', 'costs', 'marketing_spend', 'churn_rate',
+    'burn_rate', 'cash_reserves', 'cac',
+    'ltv', 'profit_margin', 'marketing_efficiency', 'ltv_cac_ratio'
+]
+
+COLUMN_ALIASES = {
+    "customer_acquisition_cost": "cac",
+    "lifetime_value": "ltv",
+}
+
+# Required inputs; missing columns/values are treated as 0.
+REQUIRED_COLUMNS = [
+    'revenue', 'costs', 'burn_rate', 'cash_reserves',
+    'cac', 'ltv',
+    'marketing_spend', 'monthly_growth_rate', 'market_share', 'churn_rate'
+]
+
+GROWTH_CATEGORIES = ["Low", "Medium", "High"]
+
+ENGINEERED_COLUMNS = [
+    'profit', 'profit_margin', 'marketing_efficiency', 'ltv_cac_ratio',
+    'runway_months', 'monthly_growth_rate', 'growth_category'
+]
+
+
+@lru_cache(maxsize=64)
+def _column_plan(columns):
+    """
+    Map source column labels to normalized names.
+
+    Returns ``(passthrough, sources)``: the ``(label, name)`` pairs copied through
+    unchanged, and for each required column the source label (or None).
+    """
+    names = [COLUMN_ALIASES.get(str(c).strip().lower(), str(c).strip().lower()) for c in columns]
+    sources = {}
+    passthrough = []
+    for label, name in zip(columns, names):
+        if name in REQUIRED_COLUMNS:
+            sources.setdefault(name, label)
+        if name not in sources or sources[name] == label:
+            passthrough.append((label, name))
+    return tuple(passthrough), tuple(sources.get(col) for col in REQUIRED_COLUMNS)
+
+
+def _nonzero(values):
+    """``values`` with zeros replaced by 1, matching ``Series.replace(0, 1)``."""
+    return np.where(values == 0, values.dtype.type(1), values)
+
+
+class StartupFeatureTransformer(TransformerMixin, BaseEstimator):
+    """
+    Turn raw startup rows (form, CSV or DB) into the engineered feature frame.
+
+    The input frame is never modified: numeric columns are read straight into
+    NumPy arrays and the result is a new frame that shares the untouched
+    columns. The engineered features are computed in ``dtype``; the required
+    input columns are returned as float64 so user-entered values are never
+    rounded. ``fit`` compiles the column plan for a schema once; ``transform``
+    reuses it for every frame with the same columns.
+    """
+
+    def __init__(self, dtype="float32"):
+        self.dtype = dtype
+
+    def fit(self, X, y=None):
+        self.feature_names_in_ = np.asarray(X.columns, dtype=object)
+        self.n_features_in_ = len(self.feature_names_in_)
+        self.plan_ = _column_plan(tuple(X.columns))
+        return self
+
+    def _plan_for(self, X):
+        columns = tuple(X.columns)
+        if getattr(self, "plan_", None) is not None and columns == tuple(self.feature_names_in_):
+            return self.plan_
+        return _column_plan(columns)
+
+    def transform(self, X: pd.DataFrame) -> pd.DataFrame:
+        dtype = np.dtype(self.dtype)
+        passthrough, sources = self._plan_for(X)
+        n = len(X)
+
+        inputs = {}
+        for name, label in zip(REQUIRED_COLUMNS, sources):
+            # A missing growth rate is filled in below, so keep it as NaN for now.
+            na_value = np.nan if name == 'monthly_growth_rate' else 0
+            if label is None:
+                inputs[name] = np.full(n, na_value, dtype=np.float64)
+            else:
+                column = X[label]
+                if not is_numeric_dtype(column):
+                    column = pd.to_numeric(column, errors="coerce")
+                inputs[name] = column.to_numpy(dtype=np.float64, na_value=na_value)
+        values = {name: column.astype(dtype) for name, column in inputs.items()}
+
+        revenue, costs = values['revenue'], values['costs']
+        with np.errstate(divide="ignore", invalid="ignore"):
+            profit = revenue - costs
+            engineered = {
+                'profit': profit,
+                'profit_margin': profit / _nonzero(revenue),
+                'marketing_efficiency': revenue / _nonzero(values['marketing_spend']),
+                'ltv_cac_ratio': values['ltv'] / _nonzero(values['cac']),
+                'runway_months': values['cash_reserves'] / _nonzero(values['burn_rate']),
+            }
+
+        # Rows are separate startups, so growth comes from each row itself: the
+        # reported monthly_growth_rate, else user growth from its operational
+        # metrics (utils.timeseries), else 0.
+        labels = {name: label for label, name in passthrough}
+        growth = inputs['monthly_growth_rate']
+        missing = np.isnan(growth)
+        if missing.any():
+            fallback = 0.0
+            if 'ts_user_growth' in labels:
+                fallback = X[labels['ts_user_growth']].to_numpy(dtype=np.float64, na_value=0)
+            growth = np.where(missing, fallback, growth)
+        inputs['monthly_growth_rate'] = engineered['monthly_growth_rate'] = growth
+        growth = growth.astype(dtype)
+
+        # --- Growth Category label (for classifier); labelled rows keep theirs ---
+        category = np.select(
+            [(growth > 0.15) & (engineered['profit_margin'] > 0.1), growth > 0.05],
+            ["High", "Medium"],
+            default="Low",
+        ).astype(object)
+        if 'growth_category' in labels:
+            given = X[labels['growth_category']].to_numpy(dtype=object)
+            category = np.where(np.isin(given, GROWTH_CATEGORIES), given, category)
+        engineered['growth_category'] = category
+
+        out = {}
+        for label, name in passthrough:
+            if name in inputs:
+                out[name] = inputs[name]
+            elif name in engineered:
+                out[name] = engineered[name]
+            else:
+                out[name] = X[label].to_numpy()
+        for name in REQUIRED_COLUMNS:
+            out.setdefault(name, inputs[name])
+        out.update(engineered)
+        return pd.DataFrame(out, index=X.index, copy=False)
+
+    def get_feature_names_out(self, input_features=None):
+        passthrough, _ = self.plan_
+        names = [name for _, name in passthrough]
+        names += [c for c in REQUIRED_COLUMNS + ENGINEERED_COLUMNS if c not in names]
+        return np.asarray(names, dtype=object)
+
+    def feature_matrix(self, df: pd.DataFrame, features=FEATURES) -> np.ndarray:
+        """C-contiguous ``(n, len(features))`` model input from a transformed frame."""
+        X = np.empty((len(df), len(features)), dtype=np.dtype(self.dtype))
+        for j, col in enumerate(features):
+            if col in df.columns:
+                X[:, j] = df[col].to_numpy(dtype=X.dtype, na_value=0)
+            else:
+                X[:, j] = 0
+        return X
+
+
+# Shared, stateless pipeline used by the app and the model classes.
+FEATURE_PIPELINE = StartupFeatureTransformer()
+
+
+def feature_matrix(df: pd.DataFrame, features=FEATURES) -> np.ndarray:
+    return FEATURE_PIPELINE.feature_matrix(df, features)
+
 
+@timed("preprocess")
 def preprocess_startup_data(df: pd.DataFrame) -> pd.DataFrame:
-    # --- Normalize column names ---
-    df.columns = df.columns.str.strip().str.lower()
-    df = df.rename(columns={
-        "customer_acquisition_cost": "cac",
-        "lifetime_value": "ltv"
-    })
-
-    # --- Ensure required columns exist (if missing, add with 0) ---
-    required_cols = [
-        'revenue', 'costs', 'burn_rate', 'cash_reserves',
-        'cac', 'ltv',
-        'marketing_spend', 'monthly_growth_rate', 'market_share', 'churn_rate'
-    ]
-    for col in required_cols:
-        if col not in df.columns:
-            df[col] = 0
-
-    # --- Fill missing financials ---
-    for col in required_cols:
-        df[col] = df[col].fillna(0)
-
-    # --- Feature engineering ---
-    df['profit'] = df['revenue'] - df['costs']
-    df['profit_margin'] = df['profit'] / df['revenue'].replace(0, 1)
-    df['marketing_efficiency'] = df['revenue'] / df['marketing_spend'].replace(0, 1)
-    df['ltv_cac_ratio'] = df['ltv'] / df['cac'].replace(0, 1)
-    df['runway_months'] = df['cash_reserves'] / df['burn_rate'].replace(0, 1)
-    df['monthly_growth_rate'] = df['revenue'].pct_change().fillna(0)
-
-    # --- Growth Category label (for classifier) ---
-    def growth_category(row):
-        if row['monthly_growth_rate'] > 0.15 and row['profit_margin'] > 0.1:
-            return "High"
-        elif row['monthly_growth_rate'] > 0.05:
-            return "Medium"
-        else:
-            return "Low"
-
-    df['growth_category'] = df.apply(growth_category, axis=1)
-
-    return df
+    return FEATURE_PIPELINE.transform(df)
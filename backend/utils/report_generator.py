@@ -1,13 +1,37 @@
-from jinja2 import Environment, FileSystemLoader
-import pdfkit
 from pathlib import Path
 import streamlit as st
+from utils.metrics import span
 from utils.strategy_engine import generate_strategy
 
 import base64
-import matplotlib.pyplot as plt
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 import io
 
+TEMPLATES_DIR = Path(__file__).resolve().parent / "templates"
+CHART_CACHE_DIR = Path(os.getenv("CHART_CACHE_DIR", Path(__file__).resolve().parent.parent / ".cache" / "charts"))
+CHART_CACHE_MB = float(os.getenv("CHART_CACHE_MB", 256))
+
+# Chart type -> startup fields it depends on (also the chart cache key).
+CHART_INPUTS = {
+    "financial": ["name", "revenue", "costs", "marketing_spend", "profit"],
+    "growth": ["revenue", "predicted_growth"],
+    "marketing_vs_churn": ["marketing_efficiency", "churn_rate"],
+    "profit_margin_vs_growth": ["profit_margin", "predicted_growth"],
+    "ltv_cac_vs_churn": ["ltv_cac_ratio", "churn_rate"],
+    "runway_vs_growth": ["runway_months", "predicted_growth"],
+}
+
+CHART_MIME = {"png": "png", "svg": "svg+xml"}
+
 def ensure_required_columns(df, required_cols):
     """Ensure all required columns exist in the dataframe.
     If missing, create them with default values (zeros or NaN)."""
@@ -17,90 +41,309 @@ def ensure_required_columns(df, required_cols):
     return df
 
 # ---------------- Utility ----------------
-def fig_to_base64(fig):
+# matplotlib, jinja2 and pdfkit are imported on first render, not when the
+# Reports page (or anything else importing this module) loads.
+_plt = None
+
+def _pyplot():
+    """matplotlib.pyplot on the headless Agg backend (no GUI in workers or the Streamlit server)."""
+    global _plt
+    if _plt is None:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+        _plt = plt
+    return _plt
+
+def fig_to_base64(fig, fmt="png", close=True):
     """Convert matplotlib figure to base64 string."""
     buf = io.BytesIO()
-    fig.savefig(buf, format="png", bbox_inches="tight")
+    fig.savefig(buf, format=fmt, bbox_inches="tight")
     buf.seek(0)
-    plt.close(fig)
+    if close:
+        _pyplot().close(fig)
     return base64.b64encode(buf.read()).decode("utf-8")
 
-def generate_startup_charts(startup):
+def draw_chart(kind, startup, ax):
+    """Draw one chart type for a single startup onto ``ax``."""
+    if kind == "financial":
+        # 1. Financial Breakdown
+        ax.bar(
+            ["Revenue", "Costs", "Marketing Spend", "Profit"],
+            [startup["revenue"], startup["costs"], startup["marketing_spend"], startup["profit"]],
+            color=["#1a73e8", "#e74c3c", "#2ecc71", "#f1c40f"]
+        )
+        ax.set_title(f"Financial Overview - {startup['name']}")
+    elif kind == "growth":
+        # 2. Growth Projection
+        ax.bar(
+            ["Current Revenue", "Predicted Growth"],
+            [startup["revenue"], startup["predicted_growth"]],
+            color=["#1a73e8", "#f1c40f"]
+        )
+        ax.set_title("Growth Projection")
+    elif kind == "marketing_vs_churn":
+        # 3. Marketing Efficiency vs Churn
+        ax.scatter([startup["marketing_efficiency"]], [startup["churn_rate"]], s=150, color="purple")
+        ax.set_xlabel("Marketing Efficiency")
+        ax.set_ylabel("Churn Rate (%)")
+        ax.set_title("Marketing Efficiency vs Churn")
+    elif kind == "profit_margin_vs_growth":
+        # 4. Profit Margin vs Predicted Growth
+        ax.scatter([startup["profit_margin"]], [startup["predicted_growth"]], s=150, color="#ff7f0e")
+        ax.set_xlabel("Profit Margin")
+        ax.set_ylabel("Predicted Growth")
+        ax.set_title("Profit Margin vs Growth")
+    elif kind == "ltv_cac_vs_churn":
+        # 5. LTV/CAC vs Churn Rate
+        ax.scatter([startup["ltv_cac_ratio"]], [startup["churn_rate"]], s=150, color="#2ca02c")
+        ax.set_xlabel("LTV/CAC Ratio")
+        ax.set_ylabel("Churn Rate (%)")
+        ax.set_title("LTV/CAC vs Churn")
+    elif kind == "runway_vs_growth":
+        # 6. Runway Months vs Predicted Growth
+        ax.bar(["Runway Months", "Predicted Growth"], [startup["runway_months"], startup["predicted_growth"]],
+               color=["#9467bd", "#f1c40f"])
+        ax.set_title("Runway vs Growth")
+    else:
+        raise ValueError(f"Unknown chart type: {kind}")
+
+# ---------------- Chart cache ----------------
+def _chart_inputs(kind, startup):
+    return {
+        field: startup[field] if isinstance(startup[field], str) else float(startup[field])
+        for field in CHART_INPUTS[kind]
+    }
+
+def chart_key(kind, startup, fmt="png"):
+    """Hash of the chart type, output format and the metrics the chart uses."""
+    payload = json.dumps([kind, fmt, _chart_inputs(kind, startup)], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class ChartCache:
+    """
+    In-memory LRU of base64 charts backed by one file per chart on disk.
+
+    The directory is capped at ``max_bytes``: a ``put`` that takes it over
+    deletes the least recently used files until it is back under 90% of the cap.
+    """
+
+    def __init__(self, max_entries=512, directory=CHART_CACHE_DIR, max_bytes=int(CHART_CACHE_MB * 2 ** 20)):
+        self.max_entries = max_entries
+        self.directory = Path(directory) if directory else None
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._disk_bytes = None  # measured by the first prune
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        if self.directory:
+            path = self.directory / key
+            try:
+                value = path.read_text()
+                os.utime(path)  # recently used: pruned last
+            except OSError:
+                return None
+            self._remember(key, value)
+            return value
+        return None
+
+    def put(self, key, value):
+        self._remember(key, value)
+        if self.directory:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            tmp = self.directory / f".{key}.tmp"
+            tmp.write_text(value)
+            os.replace(tmp, self.directory / key)
+            with self._lock:
+                known = self._disk_bytes
+                if known is not None:
+                    self._disk_bytes = known + len(value)
+            if known is None:
+                self.prune(self.max_bytes)
+            elif known + len(value) > self.max_bytes:
+                self.prune()
+
+    def prune(self, target=None):
+        """
+        Delete the least recently used chart files until the directory holds at
+        most ``target`` bytes (default 90% of ``max_bytes``). Other processes
+        sharing the directory are counted too.
+        """
+        target = int(self.max_bytes * 0.9) if target is None else target
+        files = []
+        for path in self.directory.iterdir():
+            if path.name.startswith("."):
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= target:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+        with self._lock:
+            self._disk_bytes = total
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+chart_cache = ChartCache()
+
+# ---------------- Rendering (in-process or pool worker) ----------------
+# One reusable figure per worker process (per thread when rendering in-process).
+_local = threading.local()
+
+def _init_worker():
+    _pyplot()
+
+def render_chart(kind, startup, fmt="png", reuse_figure=True):
+    """Render one chart to base64. With ``reuse_figure`` the worker keeps one figure/axes."""
+    plt = _pyplot()
+    if not reuse_figure:
+        fig, ax = plt.subplots()
+        draw_chart(kind, startup, ax)
+        return fig_to_base64(fig, fmt)
+
+    if getattr(_local, "figure", None) is None:
+        _local.figure = plt.subplots()
+    fig, ax = _local.figure
+    ax.clear()
+    draw_chart(kind, startup, ax)
+    return fig_to_base64(fig, fmt, close=False)
+
+def _render_many(tasks, fmt, reuse_figure):
+    return [render_chart(kind, inputs, fmt, reuse_figure) for kind, inputs in tasks]
+
+class ChartRenderer:
+    """
+    Render charts for many startups, in parallel when ``workers > 1``.
+
+    Cached charts are returned without rendering; misses for one startup are
+    sent to the pool as a single task.
+    """
+
+    def __init__(self, fmt="png", workers=None, reuse_figure=True, cache=None):
+        if fmt not in CHART_MIME:
+            raise ValueError(f"Chart format must be one of {sorted(CHART_MIME)}")
+        self.fmt = fmt
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        self.reuse_figure = reuse_figure
+        self.cache = cache if cache is not None else chart_cache
+        self._pool = None
+
+    def __enter__(self):
+        if self.workers > 1:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+        return self
+
+    def __exit__(self, *exc):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def submit(self, startup):
+        """Start rendering all charts for ``startup``; returns a callable that yields the dict."""
+        charts, missing = {}, []
+        for kind in CHART_INPUTS:
+            key = chart_key(kind, startup, self.fmt)
+            cached = self.cache.get(key)
+            if cached is None:
+                missing.append((kind, key, _chart_inputs(kind, startup)))
+            else:
+                charts[kind] = cached
+
+        if not missing:
+            return lambda: charts
+
+        tasks = [(kind, inputs) for kind, _, inputs in missing]
+        if self._pool is not None:
+            future = self._pool.submit(_render_many, tasks, self.fmt, self.reuse_figure)
+        else:
+            with span("report.render_charts"):
+                rendered = _render_many(tasks, self.fmt, self.reuse_figure)
+
+        def result():
+            if self._pool is not None:
+                # Rendering runs in the pool; this is how long the report waited for it.
+                with span("report.chart_wait"):
+                    images = future.result()
+            else:
+                images = rendered
+            for (kind, key, _), image in zip(missing, images):
+                self.cache.put(key, image)
+                charts[kind] = image
+            return charts
+        return result
+
+    def iter_charts(self, startups, lookahead=None):
+        """Yield ``(startup, charts)`` in order, keeping at most ``lookahead`` startups in flight."""
+        lookahead = lookahead or 2 * max(self.workers, 1)
+        pending = deque()
+        for startup in startups:
+            pending.append((startup, self.submit(startup)))
+            while len(pending) >= lookahead:
+                s, result = pending.popleft()
+                yield s, result()
+        while pending:
+            s, result = pending.popleft()
+            yield s, result()
+
+def generate_startup_charts(startup, fmt="png"):
     """Generate multiple charts for a single startup with new metrics."""
-    charts = {}
-
-    # 1. Financial Breakdown
-    fig, ax = plt.subplots()
-    ax.bar(
-        ["Revenue", "Costs", "Marketing Spend", "Profit"], 
-        [startup["revenue"], startup["costs"], startup["marketing_spend"], startup["profit"]],
-        color=["#1a73e8", "#e74c3c", "#2ecc71", "#f1c40f"]
-    )
-    ax.set_title(f"Financial Overview - {startup['name']}")
-    charts["financial"] = fig_to_base64(fig)
-
-    # 2. Growth Projection
-    fig, ax = plt.subplots()
-    ax.bar(
-        ["Current Revenue", "Predicted Growth"], 
-        [startup["revenue"], startup["predicted_growth"]],
-        color=["#1a73e8", "#f1c40f"]
-    )
-    ax.set_title("Growth Projection")
-    charts["growth"] = fig_to_base64(fig)
-
-    # 3. Marketing Efficiency vs Churn
-    fig, ax = plt.subplots()
-    ax.scatter([startup["marketing_efficiency"]], [startup["churn_rate"]], s=150, color="purple")
-    ax.set_xlabel("Marketing Efficiency")
-    ax.set_ylabel("Churn Rate (%)")
-    ax.set_title("Marketing Efficiency vs Churn")
-    charts["marketing_vs_churn"] = fig_to_base64(fig)
-
-    # 4. Profit Margin vs Predicted Growth
-    fig, ax = plt.subplots()
-    ax.scatter([startup["profit_margin"]], [startup["predicted_growth"]], s=150, color="#ff7f0e")
-    ax.set_xlabel("Profit Margin")
-    ax.set_ylabel("Predicted Growth")
-    ax.set_title("Profit Margin vs Growth")
-    charts["profit_margin_vs_growth"] = fig_to_base64(fig)
-
-    # 5. LTV/CAC vs Churn Rate
-    fig, ax = plt.subplots()
-    ax.scatter([startup["ltv_cac_ratio"]], [startup["churn_rate"]], s=150, color="#2ca02c")
-    ax.set_xlabel("LTV/CAC Ratio")
-    ax.set_ylabel("Churn Rate (%)")
-    ax.set_title("LTV/CAC vs Churn")
-    charts["ltv_cac_vs_churn"] = fig_to_base64(fig)
-
-    # 6. Runway Months vs Predicted Growth
-    fig, ax = plt.subplots()
-    ax.bar(["Runway Months", "Predicted Growth"], [startup["runway_months"], startup["predicted_growth"]],
-           color=["#9467bd", "#f1c40f"])
-    ax.set_title("Runway vs Growth")
-    charts["runway_vs_growth"] = fig_to_base64(fig)
-
-    return charts
+    with ChartRenderer(fmt=fmt, workers=1) as renderer:
+        return renderer.submit(startup)()
 
 # ---------------- PDF Generator ----------------
-def generate_pdf_report(df):
-    """Generate a PDF report with charts and recommendations."""
-    BASE_DIR = Path(__file__).resolve().parent  # backend/
-    templates_dir = BASE_DIR / "templates"
-
-    # Add charts per startup
+def iter_report_html(df, fmt="png", workers=None, progress=None, cache=None):
+    """Stream the report HTML, rendering each startup's charts just before its section."""
     startups = df.to_dict(orient="records")
-    for s in startups:
-        charts = generate_startup_charts(s)
-        s["charts"] = charts
+    total = len(startups)
+
+    from jinja2 import Environment, FileSystemLoader
 
-    # Load template
-    env = Environment(loader=FileSystemLoader(templates_dir))
+    env = Environment(loader=FileSystemLoader(TEMPLATES_DIR))
     template = env.get_template("report_template.html")
-    html_content = template.render(startups=startups)
 
-    # Generate PDF in memory
-    pdf_bytes = pdfkit.from_string(html_content, False)
+    workers = min(workers or os.cpu_count() or 1, max(total, 1))
+    with ChartRenderer(fmt=fmt, workers=workers, cache=cache) as renderer:
+        def sections():
+            for done, (s, charts) in enumerate(renderer.iter_charts(startups), start=1):
+                s["charts"] = charts
+                s["chart_mime"] = CHART_MIME[fmt]
+                yield s
+                if progress:
+                    progress(done, total)
+
+        yield from template.generate(startups=sections())
+
+def generate_pdf_report(df, fmt="png", workers=None, progress=None, cache=None):
+    """Generate a PDF report with charts and recommendations."""
+    import pdfkit
+
+    # Stream sections to a temp file instead of building one giant HTML string.
+    with span("report.html"), tempfile.NamedTemporaryFile("w", suffix=".html", encoding="utf-8", delete=False) as f:
+        html_path = f.name
+        for chunk in iter_report_html(df, fmt, workers, progress, cache):
+            f.write(chunk)
+    try:
+        # Generate PDF in memory
+        with span("report.pdfkit"):
+            pdf_bytes = pdfkit.from_file(html_path, False)
+    finally:
+        os.unlink(html_path)
     return pdf_bytes
 
 # ---------------- Streamlit Reports Page ----------------
@@ -122,23 +365,42 @@ def show_reports(regressor, classifier, clustering, cluster_features):
 
     # 🔹 Ensure regression features exist
     regression_features = ["revenue", "costs", "marketing_spend", "churn_rate",
-                       "burn_rate", "cash_reserves", "cac", "ltv", 
+                       "burn_rate", "cash_reserves", "cac", "ltv",
                        "profit_margin", "marketing_efficiency", "ltv_cac_ratio"]
-    
+
     df = ensure_required_columns(df, regression_features)
 
     # Enrich data
-    df["predicted_growth"] = regressor.predict(df[regression_features])
-    df["cluster"] = clustering.model.predict(df[cluster_features])
+    with span("report.enrich"):
+        df["predicted_growth"] = regressor.predict(df[regression_features])
+        df["cluster"] = clustering.predict(df)
+        df["archetype"] = clustering.archetype(df["cluster"])
+        df_with_strategies = generate_strategy(df)
 
-    df_with_strategies = generate_strategy(df)
+    # Reports render in a background job, so leaving the page doesn't lose the work
+    from utils.report_jobs import DONE, FAILED, get_report_jobs
+    jobs = get_report_jobs()
 
     if st.button("Generate PDF Report"):
-        pdf_bytes = generate_pdf_report(df_with_strategies)
+        st.session_state["report_job"] = jobs.submit(df_with_strategies)
+
+    job_id = st.session_state.get("report_job")
+    job = jobs.status(job_id) if job_id else None
+    pdf = jobs.result(job_id) if job and job["status"] == DONE else None
+    if job is None or (job["status"] == DONE and pdf is None):  # expired meanwhile
+        return
+
+    if job["status"] == DONE:
         st.download_button(
             "📥 Download Report",
-            pdf_bytes,
+            pdf,
             file_name="startup_report.pdf",
             mime="application/pdf"
         )
-
+    elif job["status"] == FAILED:
+        st.error(f"Report generation failed: {job['error']}")
+    else:
+        total = max(job["total"], 1)
+        st.progress(job["done"] / total, text=f"Rendering report: {job['done']}/{job['total']} startups")
+        time.sleep(1)
+        st.rerun()
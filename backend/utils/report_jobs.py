@@ -0,0 +1,203 @@
+"""
+Background PDF report jobs.
+
+Report requests go into a SQLite job table and are rendered by a small thread
+pool, so the Streamlit session isn't blocked and the work survives the user
+navigating away. Finished PDFs are stored content-addressed by a hash of the
+report input, so an identical request is served from disk immediately.
+Jobs left queued or running by a previous process are picked up again on
+start; charts they already rendered come back from the chart cache.
+Finished jobs expire after ``REPORT_RETENTION_DAYS``, together with PDFs no
+remaining job refers to.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from utils.report_generator import TEMPLATES_DIR, generate_pdf_report
+
+REPORT_DIR = Path(os.getenv("REPORT_DIR", Path(__file__).resolve().parent.parent / ".cache" / "reports"))
+REPORT_RETENTION_DAYS = float(os.getenv("REPORT_RETENTION_DAYS", 7))
+PRUNE_INTERVAL = 3600  # seconds between expiry passes while the process runs
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS report_jobs (
+    id TEXT PRIMARY KEY,
+    content_key TEXT NOT NULL,
+    status TEXT NOT NULL,
+    done INTEGER NOT NULL DEFAULT 0,
+    total INTEGER NOT NULL DEFAULT 0,
+    payload TEXT NOT NULL,
+    fmt TEXT NOT NULL,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS report_jobs_content_key ON report_jobs (content_key);
+"""
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return str(value)
+
+
+def _template_digest():
+    h = hashlib.sha256()
+    for path in sorted(TEMPLATES_DIR.glob("*.html")):
+        h.update(path.read_bytes())
+    return h.hexdigest()
+
+
+class ReportJobs:
+    def __init__(self, directory=REPORT_DIR, workers=2, render=generate_pdf_report,
+                 retention=REPORT_RETENTION_DAYS * 86400):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.db_path = self.directory / "jobs.db"
+        self.render = render
+        self.retention = retention
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="report-job")
+        self._template_digest = _template_digest()
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+        self.prune()
+        self._resume()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _pdf_path(self, content_key):
+        return self.directory / f"{content_key}.pdf"
+
+    def _update(self, job_id, **fields):
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._connect() as conn:
+            conn.execute(f"UPDATE report_jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def prune(self):
+        """Delete finished jobs older than ``retention`` seconds and PDFs no remaining job refers to."""
+        cutoff = time.time() - self.retention
+        with self._connect() as conn:
+            conn.execute("DELETE FROM report_jobs WHERE status IN (?, ?) AND updated_at < ?", (DONE, FAILED, cutoff))
+            keep = {row["content_key"] for row in conn.execute("SELECT DISTINCT content_key FROM report_jobs")}
+        for path in self.directory.glob("*.pdf"):
+            if path.stem not in keep:
+                path.unlink(missing_ok=True)
+        # Partial writes left by a crashed render.
+        for path in self.directory.glob("*.tmp"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+            except OSError:
+                pass
+        self._pruned_at = time.time()
+
+    def submit(self, df: pd.DataFrame, fmt="png") -> str:
+        """Queue a report for ``df`` and return the job id (an existing one if identical)."""
+        if time.time() - self._pruned_at > PRUNE_INTERVAL:
+            self.prune()
+        payload = json.dumps(df.to_dict(orient="records"), default=_json_default, sort_keys=True)
+        content_key = hashlib.sha256(
+            f"{self._template_digest}:{fmt}:{payload}".encode("utf-8")
+        ).hexdigest()
+
+        with self._connect() as conn:
+            existing = conn.execute(
+                "SELECT id, status FROM report_jobs WHERE content_key = ? AND status != ? "
+                "ORDER BY created_at DESC LIMIT 1",
+                (content_key, FAILED),
+            ).fetchone()
+            if existing and (existing["status"] != DONE or self._pdf_path(content_key).exists()):
+                return existing["id"]
+
+            job_id = uuid.uuid4().hex
+            now = time.time()
+            done = self._pdf_path(content_key).exists()
+            conn.execute(
+                "INSERT INTO report_jobs (id, content_key, status, done, total, payload, fmt, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, content_key, DONE if done else QUEUED, len(df) if done else 0, len(df),
+                 payload, fmt, now, now),
+            )
+        if not done:
+            self._pool.submit(self._run, job_id)
+        return job_id
+
+    def _run(self, job_id):
+        with self._connect() as conn:
+            job = conn.execute("SELECT * FROM report_jobs WHERE id = ?", (job_id,)).fetchone()
+        if job is None or job["status"] == DONE:
+            return
+
+        self._update(job_id, status=RUNNING, done=0)
+        try:
+            df = pd.DataFrame(json.loads(job["payload"]))
+            pdf_bytes = self.render(
+                df, fmt=job["fmt"],
+                progress=lambda done, total: self._update(job_id, done=done, total=total),
+            )
+            path = self._pdf_path(job["content_key"])
+            tmp = path.with_suffix(f".{job_id}.tmp")
+            tmp.write_bytes(pdf_bytes)
+            os.replace(tmp, path)
+            self._update(job_id, status=DONE)
+        except Exception as exc:
+            self._update(job_id, status=FAILED, error=f"{type(exc).__name__}: {exc}")
+
+    def _resume(self):
+        with self._connect() as conn:
+            unfinished = conn.execute(
+                "SELECT id FROM report_jobs WHERE status IN (?, ?) ORDER BY created_at", (QUEUED, RUNNING)
+            ).fetchall()
+        for row in unfinished:
+            self._pool.submit(self._run, row["id"])
+
+    def status(self, job_id):
+        """``{id, status, done, total, error}`` for a job, or None if unknown."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, status, done, total, error FROM report_jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def result(self, job_id):
+        """The finished PDF's bytes, or None if the job isn't done."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT content_key, status FROM report_jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None or row["status"] != DONE:
+            return None
+        path = self._pdf_path(row["content_key"])
+        return path.read_bytes() if path.exists() else None
+
+
+_jobs = None
+_jobs_lock = threading.Lock()
+
+
+def get_report_jobs() -> ReportJobs:
+    global _jobs
+    with _jobs_lock:
+        if _jobs is None:
+            _jobs = ReportJobs()
+        return _jobs
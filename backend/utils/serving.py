@@ -0,0 +1,170 @@
+"""
+Serving state shared by every session of one process.
+
+Streamlit runs all browser sessions in one process, so the models, the
+scored portfolio and whatever is derived from a submitted form are kept
+here once instead of per ``st.session_state``:
+
+- ``load_models`` returns one bundle per process, with its arrays
+  memory-mapped from the artifact (``MODEL_MMAP``), so several server
+  processes on a host share them; ``models.inference`` does the same for
+  the compiled engine.
+- ``ResultCache`` is a thread-safe LRU bounded in bytes (``RESULT_CACHE_MB``)
+  holding scored startups with their strategies and summaries, keyed by
+  model version and the submitted form values.
+- ``SharedServing.submit`` is the Form Input submit path. Sessions keep
+  references to cached results rather than their own copies; treat them
+  as read-only.
+
+Simulate concurrent sessions with ``python -m benchmarks.load_test``.
+"""
+import hashlib
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from utils.metrics import span
+from utils.nlp_summarizer import iter_summaries
+from utils.portfolio import FORM_COLUMNS, get_portfolio
+
+RESULT_CACHE_BYTES = int(float(os.getenv("RESULT_CACHE_MB", 64)) * (1 << 20))
+
+
+def sizeof(value) -> int:
+    """Approximate memory held by ``value`` (frames, arrays and plain containers)."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(sizeof(k) + sizeof(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(sizeof(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class ResultCache:
+    """Thread-safe LRU cache whose values together stay under ``max_bytes``."""
+
+    def __init__(self, max_bytes=RESULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()  # key -> (value, size)
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key, value):
+        """Store ``value`` (unless it alone exceeds the budget), evicting least recently used entries."""
+        size = sizeof(value)
+        if size > self.max_bytes:
+            return value
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._items[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._items.popitem(last=False)
+                self._bytes -= evicted
+        return value
+
+    def get_or_compute(self, key, compute):
+        # Computed outside the lock: concurrent misses on one key may both compute, never block others.
+        missing = object()
+        value = self.get(key, missing)
+        return self.put(key, compute()) if value is missing else value
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._items), "bytes": self._bytes, "max_bytes": self.max_bytes,
+                    "hits": self.hits, "misses": self.misses}
+
+
+def record_key(record: dict) -> str:
+    """Digest of the form values that determine a startup's scores and summaries."""
+    values = json.dumps([record.get(col) for col in FORM_COLUMNS], default=str)
+    return hashlib.sha256(values.encode()).hexdigest()
+
+
+class SharedServing:
+    """The submit path over this process's shared models, portfolio and result cache."""
+
+    def __init__(self, engine, models, cache=None, portfolio=None):
+        self.models = models
+        self.portfolio = portfolio if portfolio is not None else get_portfolio(engine, models)
+        self.cache = cache if cache is not None else get_result_cache()
+
+    def analyze(self, record: dict) -> dict:
+        """Scored row (with recommendations) and summaries for a form record, cached by its values."""
+        def compute():
+            scored = self.portfolio.score_record(record)
+            with span("summaries"):
+                summaries = dict(zip(scored["name"], iter_summaries(scored)))
+            return {"scored": scored, "summaries": summaries}
+        return self.cache.get_or_compute(("analysis", self.models.version, record_key(record)), compute)
+
+    def submit(self, record: dict):
+        """
+        Store a submitted startup; returns ``(current_startup, insights)`` for
+        the session, as the Form Input page shows them.
+        """
+        with span("submit"):
+            with span("submit.analyze"):
+                analysis = self.analyze(record)
+            with span("submit.store"):
+                df = self.portfolio.add(record, scored=analysis["scored"])
+            with span("portfolio.score_missing"):
+                self.portfolio.score_missing()
+            with span("submit.similar"):
+                similar = self.portfolio.similar(df)
+        insights = {
+            "strategies": df,
+            "summaries": analysis["summaries"],
+            "similar": similar,
+        }
+        return df, insights
+
+
+# --- Process-wide instances ---
+_result_cache = None
+_servings = {}
+_servings_lock = threading.Lock()
+
+
+def get_result_cache() -> ResultCache:
+    global _result_cache
+    with _servings_lock:
+        if _result_cache is None:
+            _result_cache = ResultCache()
+        return _result_cache
+
+
+def get_serving(engine, models) -> SharedServing:
+    cache = get_result_cache()
+    with _servings_lock:
+        key = (id(engine), models.version)
+        if key not in _servings:
+            _servings[key] = SharedServing(engine, models, cache)
+        return _servings[key]
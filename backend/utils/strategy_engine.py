@@ -1,72 +1,199 @@
+import operator
+from collections import namedtuple
+
+import numpy as np
+
+from utils.metrics import timed
+
+# A rule fires when ``df[column] <op> threshold``. ``threshold`` is either a
+# scalar or a ``(column, factor)`` pair meaning ``factor * df[column]``.
+# Rules in the same group form an if/elif chain: the lowest ``priority`` that
+# matches wins, and an ``"else"`` rule fires when nothing above it did.
+Rule = namedtuple("Rule", ["group", "priority", "column", "op", "threshold", "message"])
+
+# Startup archetypes, smallest first; the ``archetype`` column holds an index
+# into this. StartupClustering maps its revenue-ordered clusters onto them,
+# whatever the number of clusters.
+ARCHETYPES = ("early", "growth", "mature")
+
+RULES = [
+    # Growth-based recommendations
+    Rule("growth", 0, "predicted_growth", "<", 0,
+         "Focus on cost reduction, improve cash flow, and retain existing customers."),
+    Rule("growth", 1, "predicted_growth", "<", ("revenue", 0.1),
+         "Optimize marketing campaigns, refine sales funnels, and analyze customer behavior."),
+    Rule("growth", 2, "predicted_growth", "<", ("revenue", 0.3),
+         "Consider strategic partnerships or explore adjacent markets for moderate growth."),
+    Rule("growth", 3, None, "else", None,
+         "High growth potential: expand product lines, scale team, and invest in R&D."),
+
+    # Archetype (cluster) recommendations, one per entry of ARCHETYPES
+    Rule("cluster", 0, "archetype", "==", ARCHETYPES.index("early"),
+         "Early-stage archetype: validate product-market fit and prioritize MVP improvements."),
+    Rule("cluster", 1, "archetype", "==", ARCHETYPES.index("growth"),
+         "Growth-stage archetype: invest in customer acquisition and optimize internal processes."),
+    Rule("cluster", 2, "archetype", "==", ARCHETYPES.index("mature"),
+         "Mature archetype: focus on strategic expansion, operational efficiency, and diversification."),
+
+    # Churn-based recommendation
+    Rule("churn", 0, "churn_rate", ">", 20,
+         "High churn detected: implement customer retention programs, loyalty incentives, or feedback loops."),
+    Rule("churn", 1, "churn_rate", ">", 10,
+         "Moderate churn: monitor customer satisfaction and address pain points."),
+
+    # Marketing efficiency
+    Rule("marketing", 0, "marketing_efficiency", "<", 0.8,
+         "Marketing efficiency is low: reallocate budget or test new channels."),
+    Rule("marketing", 1, "marketing_efficiency", "<", 1.2,
+         "Moderate marketing efficiency: optimize campaigns for higher ROI."),
+
+    # Profit margin check
+    Rule("margin", 0, "profit_margin", "<", 0.1,
+         "Profit margin is low: review pricing strategy and reduce unnecessary expenses."),
+    Rule("margin", 1, "profit_margin", ">", 0.25,
+         "Healthy profit margin: consider reinvesting for growth or product development."),
+
+    # LTV/CAC ratio
+    Rule("ltv_cac", 0, "ltv_cac_ratio", "<", 1,
+         "Customer acquisition is expensive relative to value: improve retention or optimize acquisition costs."),
+    Rule("ltv_cac", 1, "ltv_cac_ratio", ">", 3,
+         "Strong LTV/CAC ratio: scaling customer acquisition could be profitable."),
+
+    # Runway and cash reserves
+    Rule("runway", 0, "runway_months", "<", 3,
+         "Low runway: secure funding or cut non-essential costs to extend runway."),
+    Rule("runway", 1, "runway_months", ">", 12,
+         "Healthy cash reserves: opportunity to invest in growth initiatives."),
+
+    # Industry-specific recommendations
+    Rule("industry", 0, "industry", "==", "SaaS",
+         "SaaS-specific: prioritize onboarding, reduce churn, and monitor subscription metrics."),
+    Rule("industry", 1, "industry", "==", "Retail",
+         "Retail-specific: analyze inventory turnover, optimize pricing, and enhance customer experience."),
+    Rule("industry", 2, "industry", "==", "Services",
+         "Services-specific: improve service delivery, client satisfaction, and repeat business strategies."),
+]
+
+NO_RULE = -1
+
+_OPS = {
+    "<": np.less,
+    ">": np.greater,
+    "==": np.equal,
+}
+
+_SCALAR_OPS = {
+    "<": operator.lt,
+    ">": operator.gt,
+    "==": operator.eq,
+}
+
+
+def _compile(rules):
+    groups = []
+    for rule_id, rule in enumerate(rules):
+        if not groups or groups[-1][0] != rule.group:
+            groups.append((rule.group, []))
+        groups[-1][1].append(rule_id)
+    return [
+        (name, sorted(ids, key=lambda rule_id: rules[rule_id].priority))
+        for name, ids in groups
+    ]
+
+
+def _check_archetype_rules(rules):
+    """Every archetype must have exactly one rule, so every cluster gets exactly one archetype message."""
+    for code, name in enumerate(ARCHETYPES):
+        matching = [r for r in rules if r.column == "archetype" and r.threshold == code]
+        if len(matching) != 1:
+            raise ValueError(f"Archetype {name!r} has {len(matching)} rules; expected exactly one.")
+
+
+_check_archetype_rules(RULES)
+GROUPS = _compile(RULES)
+MESSAGES = np.array([rule.message for rule in RULES], dtype=object)
+
+
+def _mask(df, rule, n):
+    if rule.op == "else":
+        return np.ones(n, dtype=bool)
+    values = df[rule.column].to_numpy()
+    threshold = rule.threshold
+    if isinstance(threshold, tuple):
+        column, factor = threshold
+        threshold = factor * df[column].to_numpy()
+    return _OPS[rule.op](values, threshold)
+
+
+def strategy_rule_ids(df):
+    """
+    Evaluate every rule over whole columns at once.
+
+    Returns an ``(len(df), len(GROUPS))`` int16 matrix holding, per group, the
+    id (index into ``RULES``) of the rule that fired, or ``NO_RULE``.
+    """
+    n = len(df)
+    rule_ids = np.full((n, len(GROUPS)), NO_RULE, dtype=np.int16)
+    for g, (_, ids) in enumerate(GROUPS):
+        masks = [_mask(df, RULES[rule_id], n) for rule_id in ids]
+        rule_ids[:, g] = np.select(masks, ids, default=NO_RULE)
+    return rule_ids
+
+
+def recommendations_for(rule_ids, rows=None):
+    """Materialize message lists, only for ``rows`` of the rule-id matrix if given."""
+    if rows is not None:
+        rule_ids = rule_ids[rows]
+    return [MESSAGES[row[row != NO_RULE]].tolist() for row in np.atleast_2d(rule_ids)]
+
+
+def _recommendation_column(rule_ids):
+    """One message list per row, built once per distinct rule combination."""
+    if len(rule_ids) == 0:
+        return np.empty(0, dtype=object)
+
+    # Pack each row into a single integer so np.unique works on a flat array.
+    codes = np.zeros(len(rule_ids), dtype=np.int64)
+    for g in range(rule_ids.shape[1]):
+        codes = codes * (len(RULES) + 1) + (rule_ids[:, g].astype(np.int64) + 1)
+    unique_codes, first_row, inverse = np.unique(codes, return_index=True, return_inverse=True)
+
+    combos = np.empty(len(unique_codes), dtype=object)
+    for i, recs in enumerate(recommendations_for(rule_ids, first_row)):
+        combos[i] = recs
+    return combos[inverse.reshape(-1)]
+
+
+def recommendations_for_row(row):
+    """
+    Recommendations for a single startup given as a mapping (e.g. a dict).
+
+    Same rules as ``generate_strategy`` without building a DataFrame; pass
+    NumPy scalars to get the same dtype semantics as the column version.
+    """
+    recs = []
+    for _, ids in GROUPS:
+        for rule_id in ids:
+            rule = RULES[rule_id]
+            if rule.op != "else":
+                threshold = rule.threshold
+                if isinstance(threshold, tuple):
+                    column, factor = threshold
+                    threshold = factor * row[column]
+                if not _SCALAR_OPS[rule.op](row[rule.column], threshold):
+                    continue
+            recs.append(rule.message)
+            break
+    return recs
+
+
+@timed("strategy.generate")
 def generate_strategy(df):
     """
     Enhanced rule-based recommendations incorporating new metrics:
-    - Uses predicted growth, cluster, churn_rate, marketing efficiency
+    - Uses predicted growth, cluster archetype, churn_rate, marketing efficiency
     - Adds financial health, LTV/CAC, runway insights
     - Industry-specific actionable next steps
     """
-    strategies = []
-
-    for _, row in df.iterrows():
-        recs = []
-
-        # Growth-based recommendations
-        if row['predicted_growth'] < 0:
-            recs.append("Focus on cost reduction, improve cash flow, and retain existing customers.")
-        elif row['predicted_growth'] < 0.1 * row['revenue']:
-            recs.append("Optimize marketing campaigns, refine sales funnels, and analyze customer behavior.")
-        elif row['predicted_growth'] < 0.3 * row['revenue']:
-            recs.append("Consider strategic partnerships or explore adjacent markets for moderate growth.")
-        else:
-            recs.append("High growth potential: expand product lines, scale team, and invest in R&D.")
-
-        # Cluster-based recommendations
-        if row['cluster'] == 0:
-            recs.append("Early-stage archetype: validate product-market fit and prioritize MVP improvements.")
-        elif row['cluster'] == 1:
-            recs.append("Growth-stage archetype: invest in customer acquisition and optimize internal processes.")
-        elif row['cluster'] == 2:
-            recs.append("Mature archetype: focus on strategic expansion, operational efficiency, and diversification.")
-
-        # Churn-based recommendation
-        if row['churn_rate'] > 20:
-            recs.append("High churn detected: implement customer retention programs, loyalty incentives, or feedback loops.")
-        elif row['churn_rate'] > 10:
-            recs.append("Moderate churn: monitor customer satisfaction and address pain points.")
-
-        # Marketing efficiency
-        if row['marketing_efficiency'] < 0.8:
-            recs.append("Marketing efficiency is low: reallocate budget or test new channels.")
-        elif row['marketing_efficiency'] < 1.2:
-            recs.append("Moderate marketing efficiency: optimize campaigns for higher ROI.")
-
-        # Profit margin check
-        if row['profit_margin'] < 0.1:
-            recs.append("Profit margin is low: review pricing strategy and reduce unnecessary expenses.")
-        elif row['profit_margin'] > 0.25:
-            recs.append("Healthy profit margin: consider reinvesting for growth or product development.")
-
-        # LTV/CAC ratio
-        if row['ltv_cac_ratio'] < 1:
-            recs.append("Customer acquisition is expensive relative to value: improve retention or optimize acquisition costs.")
-        elif row['ltv_cac_ratio'] > 3:
-            recs.append("Strong LTV/CAC ratio: scaling customer acquisition could be profitable.")
-
-        # Runway and cash reserves
-        if row['runway_months'] < 3:
-            recs.append("Low runway: secure funding or cut non-essential costs to extend runway.")
-        elif row['runway_months'] > 12:
-            recs.append("Healthy cash reserves: opportunity to invest in growth initiatives.")
-
-        # Industry-specific recommendations
-        if row['industry'] == "SaaS":
-            recs.append("SaaS-specific: prioritize onboarding, reduce churn, and monitor subscription metrics.")
-        elif row['industry'] == "Retail":
-            recs.append("Retail-specific: analyze inventory turnover, optimize pricing, and enhance customer experience.")
-        elif row['industry'] == "Services":
-            recs.append("Services-specific: improve service delivery, client satisfaction, and repeat business strategies.")
-
-        strategies.append(recs)
-
-    df['recommendations'] = strategies
+    df['recommendations'] = _recommendation_column(strategy_rule_ids(df))
     return df
@@ -0,0 +1,213 @@
+"""
+Per-startup monthly features from ``operational_metrics``.
+
+Rows are grouped by startup and ordered by month; growth is computed within
+each startup's own history (never across startups) and the rolling features
+are means over the trailing ``window`` months. ``TimeSeriesFeatures`` keeps
+only each startup's last ``window + 1`` months in memory, so new months are
+folded in by recomputing just the startups they belong to. A month that
+arrives out of order reloads that startup's full history instead.
+
+Export startups with their features to train the models on them:
+
+    python -m utils.timeseries startups_with_history.csv
+    python -m models.model_store build --csv startups_with_history.csv
+"""
+import argparse
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+
+from utils.db_utils import operational_metrics, startup_info
+
+WINDOW = 3
+
+TS_FEATURES = [
+    'ts_months',                 # months of history
+    'ts_user_growth',            # latest month-over-month active-user growth
+    'ts_user_growth_rolling',    # mean MoM user growth over the window
+    'ts_new_customers_rolling',
+    'ts_retention_rolling',
+    'ts_retention_trend',        # mean monthly change in retention over the window
+    'ts_nps_rolling',
+    'ts_infra_growth_rolling',   # mean MoM infra cost growth over the window
+]
+
+METRIC_COLUMNS = ["id", "startup_id", "month", "active_users", "new_customers",
+                  "retention_rate", "nps_score", "infra_costs"]
+
+
+def _empty_features():
+    return pd.DataFrame(columns=TS_FEATURES, dtype=float, index=pd.Index([], name="startup_id"))
+
+
+def _empty_metrics():
+    df = pd.DataFrame({c: pd.Series(dtype="float64") for c in METRIC_COLUMNS})
+    df["month"] = pd.Series(dtype="datetime64[ns]")
+    return df.astype({"id": "int64", "startup_id": "int64"})
+
+
+def _growth(values, previous):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        growth = (values - previous) / previous
+    growth[~np.isfinite(growth)] = np.nan
+    return growth
+
+
+def compute_features(metrics: pd.DataFrame, window=WINDOW) -> pd.DataFrame:
+    """One row of ``TS_FEATURES`` per startup_id in ``metrics`` (missing values are 0)."""
+    if metrics.empty:
+        return _empty_features()
+
+    m = metrics.sort_values(["startup_id", "month"], kind="stable").reset_index(drop=True)
+    by_startup = m.groupby("startup_id", sort=False)
+    for col, out in (("active_users", "user_growth"), ("infra_costs", "infra_growth")):
+        previous = by_startup[col].shift(1).to_numpy(dtype=float, na_value=np.nan)
+        m[out] = _growth(m[col].to_numpy(dtype=float, na_value=np.nan), previous)
+
+    # The trailing window is what a rolling(window) mean sees at each startup's latest month.
+    recent = m.groupby("startup_id", sort=False).tail(window)
+    agg = recent.groupby("startup_id", sort=True).agg(
+        ts_user_growth=("user_growth", "last"),
+        ts_user_growth_rolling=("user_growth", "mean"),
+        ts_new_customers_rolling=("new_customers", "mean"),
+        ts_retention_rolling=("retention_rate", "mean"),
+        retention_first=("retention_rate", "first"),
+        retention_last=("retention_rate", "last"),
+        window_months=("month", "size"),
+        ts_nps_rolling=("nps_score", "mean"),
+        ts_infra_growth_rolling=("infra_growth", "mean"),
+    )
+    steps = (agg.pop("window_months") - 1).replace(0, np.nan)
+    agg["ts_retention_trend"] = (agg.pop("retention_last") - agg.pop("retention_first")) / steps
+    agg["ts_months"] = by_startup.size()
+    return agg[TS_FEATURES].astype(float).fillna(0.0)
+
+
+def attach_features(df: pd.DataFrame, features: pd.DataFrame, id_column="id") -> pd.DataFrame:
+    """Add ``TS_FEATURES`` to ``df`` by startup id; rows without history get 0."""
+    df = df.copy()
+    if id_column in df.columns and not features.empty:
+        ids = pd.to_numeric(df[id_column], errors="coerce")
+        matched = features.reindex(ids.to_numpy())
+        for col in TS_FEATURES:
+            df[col] = matched[col].fillna(0.0).to_numpy()
+    else:
+        for col in TS_FEATURES:
+            df[col] = 0.0
+    return df
+
+
+class TimeSeriesFeatures:
+    """Incrementally maintained ``TS_FEATURES`` for every startup with metrics."""
+
+    def __init__(self, engine, window=WINDOW):
+        self.engine = engine
+        self.window = window
+        self._tails = _empty_metrics()
+        self._counts = pd.Series(dtype="int64")
+        self._features = _empty_features()
+        self._last_id = 0
+        self._lock = threading.Lock()
+
+    def _read(self, stmt):
+        with self.engine.connect() as conn:
+            df = pd.read_sql(stmt, conn)
+        df["month"] = pd.to_datetime(df["month"]).astype("datetime64[ns]")
+        return df
+
+    def refresh(self) -> set:
+        """Fold in metric rows inserted since the last call; returns the startup ids updated."""
+        table = operational_metrics
+        with self._lock:
+            new = self._read(
+                select(*(table.c[c] for c in METRIC_COLUMNS)).where(table.c.id > self._last_id)
+            )
+            if new.empty:
+                return set()
+            self._last_id = max(self._last_id, int(new["id"].max()))
+            new = new.dropna(subset=["startup_id"]).astype({"startup_id": "int64"})
+            if new.empty:
+                return set()
+            touched = new["startup_id"].unique()
+
+            known_last = self._tails.groupby("startup_id")["month"].max()
+            first_new = new.groupby("startup_id")["month"].min()
+            late = first_new.index[first_new.le(known_last.reindex(first_new.index))]
+
+            counts = self._counts.reindex(touched, fill_value=0).add(
+                new.groupby("startup_id").size(), fill_value=0
+            )
+            parts = [self._tails[self._tails["startup_id"].isin(touched)
+                                 & ~self._tails["startup_id"].isin(late)],
+                     new[~new["startup_id"].isin(late)]]
+            if len(late):
+                history = self._read(
+                    select(*(table.c[c] for c in METRIC_COLUMNS))
+                    .where(table.c.startup_id.in_([int(i) for i in late]))
+                ).astype({"startup_id": "int64"})
+                parts.append(history)
+                counts.update(history.groupby("startup_id").size())
+            rows = pd.concat([p for p in parts if not p.empty], ignore_index=True)
+
+            features = compute_features(rows, self.window)
+            features["ts_months"] = counts.reindex(features.index).astype(float)
+
+            rows = rows.sort_values(["startup_id", "month"], kind="stable")
+            tails = rows.groupby("startup_id", sort=False).tail(self.window + 1)
+            self._tails = pd.concat(
+                [self._tails[~self._tails["startup_id"].isin(touched)], tails], ignore_index=True
+            )
+            self._counts = pd.concat([self._counts.drop(touched, errors="ignore"), counts.astype("int64")])
+            self._features = pd.concat(
+                [self._features.drop(features.index, errors="ignore"), features]
+            ).sort_index()
+            return {int(i) for i in touched}
+
+    @property
+    def last_id(self) -> int:
+        """The newest ``operational_metrics`` id folded in so far."""
+        return self._last_id
+
+    def startups_since(self, metrics_id) -> set:
+        """Startups with metric rows newer than ``metrics_id`` (up to ``last_id``)."""
+        table = operational_metrics
+        stmt = (select(table.c.startup_id).distinct()
+                .where(table.c.id > metrics_id, table.c.id <= self._last_id, table.c.startup_id.isnot(None)))
+        with self.engine.connect() as conn:
+            return {int(i) for i in conn.execute(stmt).scalars()}
+
+    def features(self) -> pd.DataFrame:
+        """``TS_FEATURES`` indexed by startup_id, as of the last ``refresh``."""
+        with self._lock:
+            return self._features
+
+    def attach(self, df: pd.DataFrame, id_column="id") -> pd.DataFrame:
+        return attach_features(df, self.features(), id_column)
+
+
+def training_frame(engine) -> pd.DataFrame:
+    """``startup_info`` rows with their ``TS_FEATURES``, for training the models on DB history."""
+    store = TimeSeriesFeatures(engine)
+    store.refresh()
+    with engine.connect() as conn:
+        df = pd.read_sql(select(startup_info), conn)
+    return store.attach(df)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Operational-metrics time-series features.")
+    parser.add_argument("output", help="CSV of startups + TS features, e.g. for `model_store build --csv`.")
+    args = parser.parse_args(argv)
+
+    from config import engine
+    df = training_frame(engine)
+    df.to_csv(args.output, index=False)
+    print(f"Wrote {len(df):,} startups to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
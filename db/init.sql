@@ -10,34 +10,34 @@ CREATE TABLE startup_info (
     stage VARCHAR(50),
 
     -- Financial
-    revenue NUMERIC,
-    costs NUMERIC,
-    marketing_spend NUMERIC,
-    profit NUMERIC,
-    profit_margin NUMERIC,
-    burn_rate NUMERIC,
-    gross_margin NUMERIC,
-    cac NUMERIC,
-    ltv NUMERIC,
-    cash_flow NUMERIC,
-    cash_reserves NUMERIC,
-    monthly_growth_rate NUMERIC,
-    market_share NUMERIC,
+    revenue DOUBLE PRECISION,
+    costs DOUBLE PRECISION,
+    marketing_spend DOUBLE PRECISION,
+    profit DOUBLE PRECISION,
+    profit_margin DOUBLE PRECISION,
+    burn_rate DOUBLE PRECISION,
+    gross_margin DOUBLE PRECISION,
+    cac DOUBLE PRECISION,
+    ltv DOUBLE PRECISION,
+    cash_flow DOUBLE PRECISION,
+    cash_reserves DOUBLE PRECISION,
+    monthly_growth_rate DOUBLE PRECISION,
+    market_share DOUBLE PRECISION,
 
     -- Operational
-    churn_rate NUMERIC,
-    retention_rate NUMERIC,
+    churn_rate DOUBLE PRECISION,
+    retention_rate DOUBLE PRECISION,
     employee_count INT,
-    productivity NUMERIC,
+    productivity DOUBLE PRECISION,
     product_launches INT,
-    nps_score NUMERIC,
+    nps_score DOUBLE PRECISION,
 
     -- Market/Digital
-    market_size NUMERIC,
-    competition_index NUMERIC,
-    website_traffic NUMERIC,
-    conversion_rate NUMERIC,
-    social_engagement NUMERIC,
+    market_size DOUBLE PRECISION,
+    competition_index DOUBLE PRECISION,
+    website_traffic DOUBLE PRECISION,
+    conversion_rate DOUBLE PRECISION,
+    social_engagement DOUBLE PRECISION,
 
     -- Label
     growth_category VARCHAR(50),
@@ -45,6 +45,12 @@ CREATE TABLE startup_info (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Dashboard filters are pushed down to SQL on these columns
+CREATE INDEX IF NOT EXISTS idx_startup_info_industry ON startup_info (industry);
+CREATE INDEX IF NOT EXISTS idx_startup_info_stage ON startup_info (stage);
+CREATE INDEX IF NOT EXISTS idx_startup_info_growth_category ON startup_info (growth_category);
+CREATE INDEX IF NOT EXISTS idx_startup_info_created_at ON startup_info (created_at);
+
 
 -- ------------------------------
 -- Operational Metrics Table
@@ -55,9 +61,37 @@ CREATE TABLE IF NOT EXISTS operational_metrics (
     month DATE NOT NULL,
     active_users INT,
     new_customers INT,
-    retention_rate NUMERIC,
-    nps_score NUMERIC,
+    retention_rate DOUBLE PRECISION,
+    nps_score DOUBLE PRECISION,
     support_tickets INT,
-    infra_costs NUMERIC,
+    infra_costs DOUBLE PRECISION,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
+
+CREATE INDEX IF NOT EXISTS idx_operational_metrics_startup_month ON operational_metrics (startup_id, month);
+
+
+-- ------------------------------
+-- Scored Portfolio Cache
+-- (model predictions per startup and model version)
+-- ------------------------------
+CREATE TABLE IF NOT EXISTS startup_scores (
+    startup_id INT NOT NULL REFERENCES startup_info(id) ON DELETE CASCADE,
+    model_version VARCHAR(32) NOT NULL,
+    predicted_growth DOUBLE PRECISION,
+    growth_category VARCHAR(50),
+    cluster INT,
+    scored_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (startup_id, model_version)
+);
+
+CREATE INDEX IF NOT EXISTS idx_startup_scores_version_cluster ON startup_scores (model_version, cluster);
+CREATE INDEX IF NOT EXISTS idx_startup_scores_version_growth ON startup_scores (model_version, growth_category);
+
+-- Newest operational_metrics.id whose months the stored scores of a model
+-- version include; months past it are rescored when the app starts.
+CREATE TABLE IF NOT EXISTS score_watermarks (
+    model_version VARCHAR(32) PRIMARY KEY,
+    metrics_id INT NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
@@ -0,0 +1,51 @@
+-- ------------------------------
+-- Upgrade an existing database to the current schema
+-- (init.sql only runs on a fresh volume). Safe to run repeatedly:
+--   cd backend && python -m utils.db_utils upgrade-schema
+-- ------------------------------
+
+-- NUMERIC columns become DOUBLE PRECISION (read straight into float64 arrays)
+DO $$
+DECLARE
+    col RECORD;
+BEGIN
+    FOR col IN
+        SELECT table_name, column_name
+        FROM information_schema.columns
+        WHERE table_schema = current_schema()
+          AND table_name IN ('startup_info', 'operational_metrics')
+          AND data_type = 'numeric'
+    LOOP
+        EXECUTE 'ALTER TABLE ' || quote_ident(col.table_name)
+             || ' ALTER COLUMN ' || quote_ident(col.column_name) || ' TYPE DOUBLE PRECISION';
+    END LOOP;
+END
+$$;
+
+-- Dashboard filters are pushed down to SQL on these columns
+CREATE INDEX IF NOT EXISTS idx_startup_info_industry ON startup_info (industry);
+CREATE INDEX IF NOT EXISTS idx_startup_info_stage ON startup_info (stage);
+CREATE INDEX IF NOT EXISTS idx_startup_info_growth_category ON startup_info (growth_category);
+CREATE INDEX IF NOT EXISTS idx_startup_info_created_at ON startup_info (created_at);
+
+CREATE INDEX IF NOT EXISTS idx_operational_metrics_startup_month ON operational_metrics (startup_id, month);
+
+-- Scored portfolio cache
+CREATE TABLE IF NOT EXISTS startup_scores (
+    startup_id INT NOT NULL REFERENCES startup_info(id) ON DELETE CASCADE,
+    model_version VARCHAR(32) NOT NULL,
+    predicted_growth DOUBLE PRECISION,
+    growth_category VARCHAR(50),
+    cluster INT,
+    scored_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (startup_id, model_version)
+);
+
+CREATE INDEX IF NOT EXISTS idx_startup_scores_version_cluster ON startup_scores (model_version, cluster);
+CREATE INDEX IF NOT EXISTS idx_startup_scores_version_growth ON startup_scores (model_version, growth_category);
+
+CREATE TABLE IF NOT EXISTS score_watermarks (
+    model_version VARCHAR(32) PRIMARY KEY,
+    metrics_id INT NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);